@@ -1,11 +1,30 @@
 """Banco de dados vetorial usando ChromaDB."""
+import hashlib
+import json
+import os
+
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 from calculador_similaridade import calcular_distancia_euclidiana
+from transformacao import TransformacaoFeatures
+
+
+# Snapshot do cache local (arquivos .npy abertos com memory-map)
+PASTA_SNAPSHOT = "./banco_musicas/snapshot_cache"
+
+# Transformação ajustada no banco (ver ajustar_transformacao)
+CAMINHO_TRANSFORMACAO = "./banco_musicas/transformacao.npz"
+
+# Linhas lidas do ChromaDB por chamada ao montar o cache
+TAMANHO_PAGINA = 5000
+
+# Coleção com um vetor por segmento de música (ver adicionar_segmentos_lote)
+COLECAO_SEGMENTOS = "musicas_segmentos"
 
 
 class BancoVetorial:
-    def __init__(self):
+    def __init__(self, pasta_snapshot=PASTA_SNAPSHOT, caminho_transformacao=CAMINHO_TRANSFORMACAO):
         self.client = chromadb.PersistentClient(path="./banco_musicas")
         
         try:
@@ -13,46 +32,292 @@ class BancoVetorial:
         except:
             self.colecao = self.client.create_collection(name="musicas")
         
-        # Carrega cache do banco existente
+        # O cache local só é montado na primeira busca manual
+        self.pasta_snapshot = pasta_snapshot
+        self._cache_carregado = False
+
+        # O ChromaDB guarda as features originais; a transformação (se houver)
+        # é aplicada no cache local e nas consultas
+        self.caminho_transformacao = caminho_transformacao
+        self.transformacao = TransformacaoFeatures.carregar(caminho_transformacao)
+
+        # Coleção e cache dos segmentos, abertos só quando usados
+        self._colecao_segmentos = None
+        self._cache_segmentos_carregado = False
+
+    def _garantir_cache(self):
+        """Monta o cache local na primeira vez que ele é necessário."""
+        if self._cache_carregado:
+            return
         self._carregar_cache()
-    
+        self._cache_carregado = True
+
+    def _limpar_cache(self):
+        self.nomes = []
+        self.generos_unicos = []
+        self._id_genero = {}
+        self._matriz = np.empty((0, 0), dtype=np.float32)
+        self._normas = np.empty(0, dtype=np.float32)
+        self._generos_ids = np.empty(0, dtype=np.int32)
+        self._n = 0
+
     def _carregar_cache(self):
-        """Carrega músicas do ChromaDB para o cache."""
-        self.todas_musicas = []
-        if self.colecao.count() > 0:
-            resultados = self.colecao.get(include=['embeddings', 'metadatas'])
-            for i in range(len(resultados['ids'])):
-                self.todas_musicas.append({
-                    'nome': resultados['metadatas'][i]['nome'],
-                    'genero': resultados['metadatas'][i]['genero'],
-                    'features': resultados['embeddings'][i]
-                })
+        """
+        Carrega músicas para o cache local, do snapshot ou do ChromaDB.
+
+        As features ficam numa matriz float32 contígua (uma linha por música)
+        com as normas ao quadrado pré-calculadas, para que buscar_manual
+        resolva todas as distâncias em uma única operação vetorizada. Os
+        gêneros são guardados como ids inteiros em generos_unicos. Se o
+        snapshot em disco corresponde ao total atual da coleção, a matriz é
+        aberta com memory-map; senão o cache é lido do ChromaDB em páginas
+        e o snapshot é regravado. Com uma transformação ajustada, a matriz
+        guarda as features já transformadas.
+        """
+        self._limpar_cache()
+        total = self.colecao.count()
+        if total == 0:
+            return
+
+        if self._abrir_snapshot(total):
+            return
+
+        for nomes, generos, embeddings in self._ler_colecao(total):
+            self._adicionar_cache(nomes, generos, embeddings)
+        self._gravar_snapshot()
+
+    def _ler_colecao(self, total):
+        """Gera (nomes, gêneros, features originais) do ChromaDB em páginas."""
+        for inicio in range(0, total, TAMANHO_PAGINA):
+            resultados = self.colecao.get(
+                include=['embeddings', 'metadatas'],
+                limit=TAMANHO_PAGINA,
+                offset=inicio
+            )
+            yield (
+                [m['nome'] for m in resultados['metadatas']],
+                [m['genero'] for m in resultados['metadatas']],
+                resultados['embeddings']
+            )
+
+    def _id_transformacao(self):
+        return self.transformacao.identificador if self.transformacao is not None else None
+
+    def _transformar(self, lista_features):
+        """Aplica a transformação ajustada (se houver) a uma ou várias features (float64)."""
+        if self.transformacao is None:
+            return np.asarray(lista_features, dtype=np.float64)
+        return self.transformacao.aplicar(lista_features)
+
+    def features_originais(self):
+        """(matriz n x d float32, lista de gêneros) com as features guardadas no ChromaDB."""
+        total = self.colecao.count()
+        linhas, generos = [], []
+        for _, generos_pagina, embeddings in self._ler_colecao(total):
+            linhas.append(np.asarray(embeddings, dtype=np.float32))
+            generos.extend(generos_pagina)
+        if not linhas:
+            return np.empty((0, 0), dtype=np.float32), []
+        return np.concatenate(linhas), generos
+
+    def ajustar_transformacao(self, metodo='zscore', dimensao=None):
+        """
+        Ajusta uma TransformacaoFeatures nas músicas do banco e a salva.
+
+        A transformação fica em `caminho_transformacao`, ao lado da coleção,
+        e passa a ser aplicada ao cache local (o snapshot é refeito na
+        próxima busca), às músicas adicionadas depois e às consultas.
+        Retorna a transformação ajustada.
+        """
+        matriz, generos = self.features_originais()
+        transformacao = TransformacaoFeatures(metodo, dimensao).ajustar(matriz, generos)
+        transformacao.salvar(self.caminho_transformacao)
+        self.transformacao = transformacao
+        self._cache_carregado = False
+        self._cache_segmentos_carregado = False
+        return transformacao
+
+    def remover_transformacao(self):
+        """Volta a usar as features originais na busca."""
+        if os.path.exists(self.caminho_transformacao):
+            os.remove(self.caminho_transformacao)
+        self.transformacao = None
+        self._cache_carregado = False
+        self._cache_segmentos_carregado = False
+
+    def _abrir_snapshot(self, total_esperado):
+        """Abre o snapshot com memory-map; retorna False se ausente ou desatualizado."""
+        caminho_meta = os.path.join(self.pasta_snapshot, 'meta.json')
+        if not os.path.exists(caminho_meta):
+            return False
+
+        try:
+            with open(caminho_meta, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['total'] != total_esperado:
+                return False
+            if meta.get('transformacao') != self._id_transformacao():
+                return False
+
+            matriz = np.load(os.path.join(self.pasta_snapshot, 'matriz.npy'), mmap_mode='r')
+            normas = np.load(os.path.join(self.pasta_snapshot, 'normas.npy'), mmap_mode='r')
+            generos_ids = np.load(os.path.join(self.pasta_snapshot, 'generos.npy'), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return False
+
+        if not (len(matriz) == len(normas) == len(generos_ids) == len(meta['nomes']) == total_esperado):
+            return False
+
+        self._matriz, self._normas, self._generos_ids = matriz, normas, generos_ids
+        self._n = total_esperado
+        self.nomes = meta['nomes']
+        self.generos_unicos = meta['generos']
+        self._id_genero = {g: i for i, g in enumerate(self.generos_unicos)}
+        return True
+
+    def salvar_snapshot(self):
+        """
+        Grava o cache local em disco para ser aberto com memory-map.
+
+        Cada arquivo é escrito num temporário e trocado com os.replace; o
+        meta.json vai por último e guarda o total de músicas, que é o que
+        valida o snapshot na abertura.
+        """
+        self._garantir_cache()
+        self._gravar_snapshot()
+
+    def _gravar_arquivo_snapshot(self, nome, escrever):
+        os.makedirs(self.pasta_snapshot, exist_ok=True)
+        destino = os.path.join(self.pasta_snapshot, nome)
+        temporario = destino + '.tmp'
+        with open(temporario, 'wb') as f:
+            escrever(f)
+        os.replace(temporario, destino)
+
+    def _gravar_snapshot(self):
+        gravar = self._gravar_arquivo_snapshot
+        gravar('matriz.npy', lambda f: np.save(f, np.ascontiguousarray(self._matriz[:self._n])))
+        gravar('normas.npy', lambda f: np.save(f, self._normas[:self._n]))
+        gravar('generos.npy', lambda f: np.save(f, self._generos_ids[:self._n]))
+        meta = {
+            'total': self._n, 'nomes': self.nomes, 'generos': self.generos_unicos,
+            'transformacao': self._id_transformacao(),
+        }
+        gravar('meta.json', lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+    def _adicionar_cache(self, nomes, generos, lista_features):
+        """Acrescenta linhas (já transformadas) à matriz do cache, crescendo a capacidade em dobro."""
+        novas = self._transformar(lista_features).astype(np.float32)
+        if novas.ndim == 1:
+            novas = novas[np.newaxis, :]
+        total = self._n + len(novas)
+
+        if self._n > 0 and novas.shape[1] != self._matriz.shape[1]:
+            raise ValueError("Vetores devem ter o mesmo tamanho")
+
+        if total > len(self._matriz):
+            capacidade = max(total, 2 * len(self._matriz), 64)
+            matriz = np.empty((capacidade, novas.shape[1]), dtype=np.float32)
+            normas = np.empty(capacidade, dtype=np.float32)
+            generos_ids = np.empty(capacidade, dtype=np.int32)
+            if self._n > 0:
+                matriz[:self._n] = self._matriz[:self._n]
+                normas[:self._n] = self._normas[:self._n]
+                generos_ids[:self._n] = self._generos_ids[:self._n]
+            self._matriz, self._normas, self._generos_ids = matriz, normas, generos_ids
+
+        for genero in generos:
+            if genero not in self._id_genero:
+                self._id_genero[genero] = len(self.generos_unicos)
+                self.generos_unicos.append(genero)
+
+        self._matriz[self._n:total] = novas
+        self._normas[self._n:total] = np.einsum('ij,ij->i', novas, novas)
+        self._generos_ids[self._n:total] = [self._id_genero[g] for g in generos]
+        self._n = total
+        self.nomes.extend(nomes)
+
+    @property
+    def matriz(self):
+        """Features (transformadas, se houver transformação) do cache (view n x d, float32)."""
+        self._garantir_cache()
+        return self._matriz[:self._n]
     
     def adicionar(self, nome, genero, features):
-        import time
-        id_unico = f"{int(time.time()*1000)}_{nome}"
-        
-        # Converte para lista se necessário
-        if hasattr(features, 'tolist'):
-            features = features.tolist()
-        
-        self.colecao.add(
-            ids=[id_unico],
-            embeddings=[features],
-            metadatas=[{"nome": nome, "genero": genero}]
-        )
-        
-        # Adiciona ao cache
-        self.todas_musicas.append({
-            'nome': nome,
-            'genero': genero,
-            'features': features
-        })
+        self.adicionar_lote([nome], [genero], [features])
+    
+    @staticmethod
+    def gerar_id(nome, genero, features):
+        """
+        Gera um id determinístico a partir do conteúdo da música.
+
+        O mesmo (nome, gênero, features) sempre gera o mesmo id, e músicas
+        diferentes com o mesmo nome geram ids diferentes.
+        """
+        h = hashlib.sha1()
+        h.update(f"{genero}\0{nome}\0".encode('utf-8'))
+        h.update(np.asarray(features, dtype=np.float32).tobytes())
+        return f"{h.hexdigest()[:20]}_{nome}"
+
+    def adicionar_lote(self, nomes, generos, lista_features, tamanho_lote=1000):
+        """
+        Adiciona várias músicas ao ChromaDB em blocos de `tamanho_lote`.
+
+        Os ids vêm de gerar_id, então adicionar de novo a mesma música não
+        cria duplicata: ids repetidos no lote ou já presentes na coleção são
+        ignorados. Retorna quantas músicas foram realmente adicionadas.
+        """
+        if len(nomes) == 0:
+            return 0
+
+        # Respeita o limite de itens por chamada do ChromaDB
+        tamanho_lote = min(tamanho_lote, self.client.get_max_batch_size())
+        embeddings = [f.tolist() if hasattr(f, 'tolist') else list(f) for f in lista_features]
+
+        # Remove repetições dentro do próprio lote
+        vistos = set()
+        linhas = []
+        for nome, genero, features in zip(nomes, generos, embeddings):
+            id_unico = self.gerar_id(nome, genero, features)
+            if id_unico not in vistos:
+                vistos.add(id_unico)
+                linhas.append((id_unico, nome, genero, features))
+
+        adicionadas = 0
+        for inicio in range(0, len(linhas), tamanho_lote):
+            bloco = linhas[inicio:inicio + tamanho_lote]
+            existentes = set(self.colecao.get(ids=[l[0] for l in bloco], include=[])['ids'])
+            bloco = [l for l in bloco if l[0] not in existentes]
+            if not bloco:
+                continue
+
+            self.colecao.add(
+                ids=[l[0] for l in bloco],
+                embeddings=[l[3] for l in bloco],
+                metadatas=[{"nome": l[1], "genero": l[2]} for l in bloco]
+            )
+            adicionadas += len(bloco)
+
+            # Adiciona ao cache (se ainda não foi montado, será lido do ChromaDB)
+            if self._cache_carregado:
+                self._adicionar_cache(
+                    [l[1] for l in bloco], [l[2] for l in bloco], [l[3] for l in bloco]
+                )
+
+        return adicionadas
     
     def buscar_similares(self, features, k=5, mostrar_calculos=True):
-        """Busca músicas similares usando ChromaDB."""
+        """
+        Busca músicas similares usando ChromaDB.
+
+        O índice do ChromaDB tem as features originais; com uma
+        transformação ajustada a busca vai para o cache local.
+        """
         if self.colecao.count() == 0:
             return []
+
+        if self.transformacao is not None:
+            return self.buscar_manual(features, k)
         
         # Converte para lista se necessário
         if hasattr(features, 'tolist'):
@@ -73,36 +338,320 @@ class BancoVetorial:
         
         return vizinhos
     
-    def buscar_manual(self, features, k=5):
-        """Busca manual calculando distâncias passo a passo."""
-        if len(self.todas_musicas) == 0:
+    def buscar_manual(self, features, k=5, mostrar_calculos=False):
+        """
+        Busca exata dos k vizinhos mais próximos no cache local.
+
+        Com mostrar_calculos=True, imprime o cálculo passo a passo apenas
+        para os k vizinhos encontrados.
+        """
+        if k < 1:
+            raise ValueError(f"k deve ser positivo, recebido {k}")
+        self._garantir_cache()
+        if self._n == 0:
             return []
-        
-        # Converte para lista se necessário
-        if hasattr(features, 'tolist'):
-            features = features.tolist()
-        
-        print("\n--- CÁLCULO DE DISTÂNCIAS ---")
-        
-        # Calcula distância para cada música
-        distancias = []
-        for musica in self.todas_musicas:
-            dist = calcular_distancia_euclidiana(features, musica['features'])
-            distancias.append({
-                'nome': musica['nome'],
-                'genero': musica['genero'],
-                'distancia': dist
-            })
-            print(f"{musica['nome']}: {dist:.4f}")
-        
-        # Ordena por distância (menor primeiro) usando bubble sort
-        for i in range(len(distancias)):
-            for j in range(i + 1, len(distancias)):
-                if distancias[i]['distancia'] > distancias[j]['distancia']:
-                    distancias[i], distancias[j] = distancias[j], distancias[i]
-        
-        # Retorna os k mais próximos
-        return distancias[:k]
+
+        indices, distancias = next(self._knn_blocos([features], k))
+
+        if mostrar_calculos:
+            print(f"\n--- CÁLCULO DE DISTÂNCIAS ({indices.shape[1]} de {self._n} músicas) ---")
+            consulta = self._transformar(features)
+            for idx in indices[0]:
+                dist = calcular_distancia_euclidiana(
+                    consulta.tolist(),
+                    self.matriz[idx].astype(np.float64).tolist()
+                )
+                print(f"{self.nomes[idx]}: {dist:.4f}")
+
+        return self._montar_vizinhos(indices[0], distancias[0])
+
+    def buscar_manual_lote(self, lista_features, k=5):
+        """
+        Busca exata dos k vizinhos de várias consultas de uma vez.
+
+        Retorna uma lista de vizinhos por consulta, na mesma ordem.
+        """
+        if k < 1:
+            raise ValueError(f"k deve ser positivo, recebido {k}")
+        self._garantir_cache()
+        if self._n == 0:
+            return [[] for _ in range(len(lista_features))]
+
+        resultados = []
+        for indices, distancias in self._knn_blocos(lista_features, k):
+            for linha in range(len(indices)):
+                resultados.append(self._montar_vizinhos(indices[linha], distancias[linha]))
+        return resultados
+
+    def _knn_blocos(self, lista_features, k):
+        """
+        Gera (indices, distancias) dos k vizinhos, bloco a bloco de consultas.
+
+        Usa ||a - b||² = ||a||² + ||b||² - 2·a·b: um produto de matrizes
+        calcula as distâncias de um bloco de consultas contra o banco inteiro
+        (||a||² é constante por linha e não muda a ordem) e argpartition
+        seleciona os k menores sem ordenar tudo. As distâncias dos vencedores
+        são recalculadas em float64 para não herdar o erro de arredondamento
+        da expansão. Os blocos limitam a matriz de distâncias a ~64 MB. As
+        consultas passam pela mesma transformação do cache.
+        """
+        consultas = np.atleast_2d(self._transformar(lista_features))
+        matriz = self.matriz
+        normas = self._normas[:self._n]
+        k = min(k, self._n)
+        linhas_por_bloco = max(1, (16 * 1024 * 1024) // self._n)
+
+        for inicio in range(0, len(consultas), linhas_por_bloco):
+            bloco = consultas[inicio:inicio + linhas_por_bloco]
+
+            dist_quadrado = normas[np.newaxis, :] - 2 * (bloco.astype(np.float32) @ matriz.T)
+            if k < self._n:
+                indices = np.argpartition(dist_quadrado, k - 1, axis=1)[:, :k]
+            else:
+                indices = np.broadcast_to(np.arange(self._n), (len(bloco), self._n))
+
+            diferencas = matriz[indices].astype(np.float64) - bloco[:, np.newaxis, :]
+            distancias = np.sqrt(np.einsum('qkd,qkd->qk', diferencas, diferencas))
+            ordem = np.argsort(distancias, axis=1, kind='stable')
+
+            yield (
+                np.take_along_axis(indices, ordem, axis=1),
+                np.take_along_axis(distancias, ordem, axis=1)
+            )
+
+    def _montar_vizinhos(self, indices, distancias):
+        return [
+            {
+                'nome': self.nomes[idx],
+                'genero': self.generos_unicos[self._generos_ids[idx]],
+                'distancia': float(dist)
+            }
+            for idx, dist in zip(indices, distancias)
+        ]
     
     def total(self):
         return self.colecao.count()
+
+    # --- Segmentos ---------------------------------------------------------
+
+    @property
+    def colecao_segmentos(self):
+        if self._colecao_segmentos is None:
+            self._colecao_segmentos = self.client.get_or_create_collection(name=COLECAO_SEGMENTOS)
+        return self._colecao_segmentos
+
+    def total_segmentos(self):
+        return self.colecao_segmentos.count()
+
+    def adicionar_segmentos_lote(self, nomes, generos, lista_segmentos, tamanho_lote=1000):
+        """
+        Guarda os vetores de segmento (matriz n_segmentos x d) de cada música.
+
+        Os segmentos de uma música recebem ids "<id>#<i>", com o id de
+        gerar_id sobre todos eles, então repetir a mesma música não duplica
+        nada. Os metadados ligam cada segmento à música (nome, gênero e
+        `musica`, o id comum). Retorna quantos segmentos foram adicionados.
+        """
+        tamanho_lote = min(tamanho_lote, self.client.get_max_batch_size())
+        linhas = []
+        vistos = set()
+        for nome, genero, segmentos in zip(nomes, generos, lista_segmentos):
+            segmentos = np.atleast_2d(np.asarray(segmentos, dtype=np.float32))
+            id_musica = self.gerar_id(nome, genero, segmentos)
+            if id_musica in vistos:
+                continue
+            vistos.add(id_musica)
+            for i, vetor in enumerate(segmentos):
+                metadados = {"nome": nome, "genero": genero, "musica": id_musica, "segmento": i}
+                linhas.append((f"{id_musica}#{i}", vetor.tolist(), metadados))
+
+        adicionados = 0
+        for inicio in range(0, len(linhas), tamanho_lote):
+            bloco = linhas[inicio:inicio + tamanho_lote]
+            existentes = set(self.colecao_segmentos.get(ids=[l[0] for l in bloco], include=[])['ids'])
+            bloco = [l for l in bloco if l[0] not in existentes]
+            if not bloco:
+                continue
+            self.colecao_segmentos.add(
+                ids=[l[0] for l in bloco],
+                embeddings=[l[1] for l in bloco],
+                metadatas=[l[2] for l in bloco]
+            )
+            adicionados += len(bloco)
+
+        if adicionados:
+            # Remontado (e o snapshot regravado) na próxima busca exata
+            self._cache_segmentos_carregado = False
+        return adicionados
+
+    def _garantir_cache_segmentos(self):
+        """
+        Monta o cache local dos segmentos: matriz float16 (metade da memória
+        e do disco do float32) com a transformação aplicada, normas ao
+        quadrado e o índice da música de cada segmento. Usa o snapshot
+        `segmentos_*` quando ele corresponde ao total da coleção.
+        """
+        if self._cache_segmentos_carregado:
+            return
+        total = self.colecao_segmentos.count()
+        if not self._abrir_snapshot_segmentos(total):
+            matrizes, musicas_segmento = [], []
+            self.musicas_segmentos = []  # [nome, gênero] de cada música
+            indice_musica = {}
+            for inicio in range(0, total, TAMANHO_PAGINA):
+                resultados = self.colecao_segmentos.get(
+                    include=['embeddings', 'metadatas'], limit=TAMANHO_PAGINA, offset=inicio
+                )
+                for m in resultados['metadatas']:
+                    if m['musica'] not in indice_musica:
+                        indice_musica[m['musica']] = len(self.musicas_segmentos)
+                        self.musicas_segmentos.append([m['nome'], m['genero']])
+                    musicas_segmento.append(indice_musica[m['musica']])
+                matrizes.append(self._transformar(resultados['embeddings']).astype(np.float16))
+
+            self._seg_matriz = np.concatenate(matrizes) if matrizes else np.empty((0, 0), np.float16)
+            self._seg_musicas = np.asarray(musicas_segmento, dtype=np.int32)
+            self._seg_normas = np.einsum(
+                'ij,ij->i', self._seg_matriz.astype(np.float32), self._seg_matriz.astype(np.float32)
+            )
+            if total:
+                self._gravar_snapshot_segmentos()
+        self._cache_segmentos_carregado = True
+
+    def _abrir_snapshot_segmentos(self, total_esperado):
+        caminho_meta = os.path.join(self.pasta_snapshot, 'segmentos_meta.json')
+        if total_esperado == 0 or not os.path.exists(caminho_meta):
+            return False
+        try:
+            with open(caminho_meta, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['total'] != total_esperado or meta.get('transformacao') != self._id_transformacao():
+                return False
+            matriz = np.load(os.path.join(self.pasta_snapshot, 'segmentos.npy'), mmap_mode='r')
+            normas = np.load(os.path.join(self.pasta_snapshot, 'segmentos_normas.npy'), mmap_mode='r')
+            musicas = np.load(os.path.join(self.pasta_snapshot, 'segmentos_musicas.npy'), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return False
+        if not (len(matriz) == len(normas) == len(musicas) == total_esperado):
+            return False
+        self._seg_matriz, self._seg_normas, self._seg_musicas = matriz, normas, musicas
+        self.musicas_segmentos = meta['musicas']
+        return True
+
+    def _gravar_snapshot_segmentos(self):
+        gravar = self._gravar_arquivo_snapshot
+        gravar('segmentos.npy', lambda f: np.save(f, self._seg_matriz))
+        gravar('segmentos_normas.npy', lambda f: np.save(f, self._seg_normas))
+        gravar('segmentos_musicas.npy', lambda f: np.save(f, self._seg_musicas))
+        meta = {
+            'total': len(self._seg_matriz), 'musicas': self.musicas_segmentos,
+            'transformacao': self._id_transformacao(),
+        }
+        gravar('segmentos_meta.json', lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+    def buscar_segmentos(self, segmentos_consulta, k=5, k_segmentos=50, ann=None):
+        """
+        Busca as k músicas mais próximas de um clipe dado por seus segmentos.
+
+        Cada segmento da consulta acha seus k_segmentos vizinhos entre os
+        segmentos do banco, que são agrupados por música (top-k agrupado):
+        a distância de uma música é a média, sobre os segmentos da
+        consulta, do seu segmento mais próximo. Quando a música não aparece
+        entre os vizinhos de um segmento da consulta, conta a maior
+        distância vista para aquele segmento.
+
+        ann=True usa o índice HNSW do ChromaDB (custo sublinear); ann=False
+        usa a busca exata na matriz float16 local. O padrão é o HNSW, exceto
+        com uma transformação ajustada, já que o ChromaDB guarda as
+        features originais. Cada vizinho traz também 'segmentos': em
+        quantos segmentos da consulta a música apareceu.
+        """
+        consultas = np.atleast_2d(np.asarray(segmentos_consulta, dtype=np.float64))
+        if ann is None:
+            ann = self.transformacao is None
+        if ann and self.transformacao is not None:
+            raise ValueError("O índice HNSW tem as features originais; use ann=False com transformação")
+
+        if ann:
+            total = self.colecao_segmentos.count()
+            if total == 0:
+                return []
+            resultados = self.colecao_segmentos.query(
+                query_embeddings=consultas.tolist(), n_results=min(k_segmentos, total),
+                include=['metadatas', 'distances']
+            )
+            indice_musica, musicas = {}, []
+            for linha in resultados['metadatas']:
+                for m in linha:
+                    if m['musica'] not in indice_musica:
+                        indice_musica[m['musica']] = len(musicas)
+                        musicas.append([m['nome'], m['genero']])
+            chaves = np.array([[indice_musica[m['musica']] for m in linha] for linha in resultados['metadatas']])
+            # O ChromaDB ('l2') devolve a distância ao quadrado
+            distancias = np.sqrt(np.maximum(np.asarray(resultados['distances'], dtype=np.float64), 0))
+        else:
+            self._garantir_cache_segmentos()
+            if len(self._seg_matriz) == 0:
+                return []
+            musicas = self.musicas_segmentos
+            indices, distancias = self._knn_segmentos(self._transformar(consultas), k_segmentos)
+            chaves = np.asarray(self._seg_musicas)[indices]
+
+        return self._agrupar_por_musica(chaves, distancias, musicas, k)
+
+    def _knn_segmentos(self, consultas, k):
+        """k vizinhos exatos de cada consulta na matriz float16, em blocos de linhas do banco."""
+        n = len(self._seg_matriz)
+        k = min(k, n)
+        consultas32 = consultas.astype(np.float32)
+        melhores_idx = np.empty((len(consultas), 0), dtype=np.int64)
+        melhores_dist = np.empty((len(consultas), 0), dtype=np.float32)
+        linhas_por_bloco = max(k, (16 * 1024 * 1024) // max(1, len(consultas)))
+
+        # Converte o float16 para float32 só um bloco por vez
+        for inicio in range(0, n, linhas_por_bloco):
+            bloco = np.asarray(self._seg_matriz[inicio:inicio + linhas_por_bloco], dtype=np.float32)
+            dist = self._seg_normas[np.newaxis, inicio:inicio + len(bloco)] - 2 * (consultas32 @ bloco.T)
+            idx = np.broadcast_to(np.arange(inicio, inicio + len(bloco)), dist.shape)
+            dist = np.concatenate([melhores_dist, dist], axis=1)
+            idx = np.concatenate([melhores_idx, idx], axis=1)
+            if dist.shape[1] > k:
+                escolhidos = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                dist = np.take_along_axis(dist, escolhidos, axis=1)
+                idx = np.take_along_axis(idx, escolhidos, axis=1)
+            melhores_dist, melhores_idx = dist, idx
+
+        # Distâncias reais (a expansão omite ||consulta||²)
+        diferencas = np.asarray(self._seg_matriz[melhores_idx.ravel()], dtype=np.float64)
+        diferencas = diferencas.reshape(len(consultas), -1, consultas.shape[1]) - consultas[:, np.newaxis, :]
+        return melhores_idx, np.sqrt(np.einsum('qkd,qkd->qk', diferencas, diferencas))
+
+    @staticmethod
+    def _agrupar_por_musica(chaves, distancias, musicas, k):
+        """
+        Top-k agrupado: (consultas x vizinhos) de índices de música e
+        distâncias -> as k músicas com menor distância média.
+        """
+        unicas, posicoes = np.unique(chaves, return_inverse=True)
+        posicoes = posicoes.reshape(chaves.shape)
+        linhas = np.broadcast_to(np.arange(len(chaves))[:, np.newaxis], chaves.shape)
+
+        # Menor distância por (segmento da consulta, música); sem acerto = pior distância da linha
+        por_musica = np.repeat(distancias.max(axis=1, keepdims=True), len(unicas), axis=1)
+        np.minimum.at(por_musica, (linhas, posicoes), distancias)
+        acertos = np.zeros((len(chaves), len(unicas)), dtype=bool)
+        acertos[linhas, posicoes] = True
+
+        pontuacao = por_musica.mean(axis=0)
+        k = min(k, len(unicas))
+        melhores = np.argpartition(pontuacao, k - 1)[:k]
+        melhores = melhores[np.argsort(pontuacao[melhores], kind='stable')]
+        return [
+            {
+                'nome': musicas[unicas[i]][0],
+                'genero': musicas[unicas[i]][1],
+                'distancia': float(pontuacao[i]),
+                'segmentos': int(acertos[:, i].sum()),
+            }
+            for i in melhores
+        ]
@@ -0,0 +1,362 @@
+"""
+Benchmark do pipeline de classificação: decodificação, cada feature do
+ExtratorFeatures, BancoVetorial (inserção e buscas em vários tamanhos de
+banco), votação e gráfico.
+
+Roda sem rede e sem arquivos de música: o áudio é sintético (tom + chirp
+do librosa) e os bancos são criados com vetores aleatórios numa pasta
+temporária. O resultado vai para JSON; com --comparar, cada métrica é
+comparada com a de uma execução anterior.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import chromadb
+import librosa
+import numpy as np
+import soundfile as sf
+from chromadb.api.client import SharedSystemClient
+
+from banco_vetorial import BancoVetorial
+from benchmark_features import gerar_audio_sintetico
+from classificador import ClassificadorMusical
+from extrator_features import ExtratorFeatures
+
+ETAPAS = ('decodificacao', 'features', 'banco', 'votacao', 'grafico')
+GENEROS = ('rock', 'pop', 'jazz', 'eletronica', 'classica')
+
+
+def resumo(tempos):
+    """Mediana, p95 e mínimo (ms) de uma lista de tempos em segundos."""
+    tempos_ms = np.asarray(tempos) * 1000
+    return {
+        'mediana_ms': float(np.median(tempos_ms)),
+        'p95_ms': float(np.percentile(tempos_ms, 95)),
+        'min_ms': float(tempos_ms.min()),
+        'n': len(tempos_ms),
+    }
+
+
+def cronometrar(funcao, repeticoes, *args):
+    """Roda funcao(*args) `repeticoes` vezes; retorna (resumo, último resultado)."""
+    # Uma execução descartada aquece imports, caches do librosa e o JIT do numba
+    resultado = funcao(*args)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return resumo(tempos), resultado
+
+
+@contextlib.contextmanager
+def na_pasta(pasta):
+    """BancoVetorial usa ./banco_musicas: cada banco do benchmark roda na sua pasta."""
+    anterior = os.getcwd()
+    os.makedirs(pasta, exist_ok=True)
+    os.chdir(pasta)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+        # O ChromaDB reaproveita o cliente pelo texto do caminho ("./banco_musicas")
+        SharedSystemClient.clear_system_cache()
+
+
+def gravar_audios(pasta, duracao):
+    """Grava o sinal sintético em WAV 44,1 kHz estéreo (força resample e downmix) e, se possível, MP3."""
+    y, sr = gerar_audio_sintetico(duracao, sr=44100)
+    estereo = np.stack([y, 0.8 * y], axis=1)
+    arquivos = {'wav': os.path.join(pasta, 'sintetico.wav')}
+    sf.write(arquivos['wav'], estereo, sr)
+    try:
+        caminho_mp3 = os.path.join(pasta, 'sintetico.mp3')
+        sf.write(caminho_mp3, estereo, sr, format='MP3')
+        arquivos['mp3'] = caminho_mp3
+    except (sf.LibsndfileError, ValueError, TypeError):
+        pass  # libsndfile sem suporte a MP3
+    return arquivos
+
+
+def medir_decodificacao(arquivos, duracao, repeticoes):
+    """librosa.load (com resample para 22050 Hz) vs leitura em blocos do modo streaming."""
+    extrator = ExtratorFeatures(duracao_max=duracao)
+    resultados = {}
+    for formato, caminho in arquivos.items():
+        resultados[f'{formato}_load'], _ = cronometrar(extrator.carregar_audio, repeticoes, caminho)
+        resultados[f'{formato}_blocos'], _ = cronometrar(
+            lambda c: sum(len(bloco) for bloco, _ in extrator.ler_blocos(c)), repeticoes, caminho
+        )
+    return resultados
+
+
+def medir_features(arquivos, duracao, repeticoes):
+    """Cada feature isolada, o vetor completo nos dois motores e o modo streaming."""
+    extrator = ExtratorFeatures(duracao_max=duracao)
+    y, sr = gerar_audio_sintetico(duracao)
+
+    funcoes = {
+        'mfcc': lambda: extrator.extrair_mfcc(y, sr),
+        'spectral_centroid': lambda: extrator.extrair_spectral_centroid(y, sr),
+        'spectral_rolloff': lambda: extrator.extrair_spectral_rolloff(y, sr),
+        'zero_crossing_rate': lambda: extrator.extrair_zero_crossing_rate(y),
+        'chroma': lambda: extrator.extrair_chroma(y, sr),
+        'tempo': lambda: extrator.extrair_tempo(y, sr),
+        'separadas': lambda: extrator.extrair_features_separadas(y, sr),
+        'passagem_unica': lambda: extrator.extrair_features_sinal(y, sr),
+        'streaming_arquivo': lambda: extrator.extrair_features_streaming(arquivos['wav']),
+    }
+    return {nome: cronometrar(funcao, repeticoes)[0] for nome, funcao in funcoes.items()}
+
+
+def vetores_sinteticos(n, dimensao=29, semente=0):
+    """Vetores com as escalas das features reais (MFCC grandes, resto entre 0 e 1)."""
+    rng = np.random.default_rng(semente)
+    matriz = rng.random((n, dimensao), dtype=np.float32)
+    matriz[:, :13] = rng.standard_normal((n, 13), dtype=np.float32) * 20
+    generos = [GENEROS[i] for i in rng.integers(0, len(GENEROS), n)]
+    return matriz, generos
+
+
+def medir_banco(n, pasta, consultas, k, max_chroma):
+    """
+    Inserção e buscas num banco com `n` vetores sintéticos.
+
+    Até `max_chroma` vetores o banco é populado pelo ChromaDB
+    (adicionar_lote) e buscar_similares é medido; acima disso só a busca
+    local (buscar_manual/buscar_manual_lote) é medida, com a matriz
+    carregada direto no cache, já que a inserção no HNSW dominaria o tempo.
+    """
+    matriz, generos = vetores_sinteticos(n)
+    nomes = [f"sintetico_{i}.mp3" for i in range(n)]
+    lista_consultas = vetores_sinteticos(consultas, semente=1)[0]
+    resultado = {'n': n, 'matriz_mb': matriz.nbytes / 2**20}
+
+    with na_pasta(pasta):
+        banco = BancoVetorial()
+        if n <= max_chroma:
+            inicio = time.perf_counter()
+            banco.adicionar_lote(nomes, generos, matriz, tamanho_lote=5000)
+            duracao = time.perf_counter() - inicio
+            resultado['adicionar_lote_s'] = duracao
+            resultado['adicionar_lote_itens_por_s'] = n / duracao
+
+            extras = vetores_sinteticos(10, semente=2)[0]
+            resultado['adicionar'] = resumo([
+                _tempo(banco.adicionar, f"extra_{i}.mp3", 'rock', extras[i]) for i in range(10)
+            ])
+            resultado['buscar_similares'] = resumo([
+                _tempo(banco.buscar_similares, q, k, False) for q in lista_consultas
+            ])
+
+            inicio = time.perf_counter()
+            banco.matriz  # monta o cache local a partir do ChromaDB
+            resultado['montar_cache_s'] = time.perf_counter() - inicio
+        else:
+            banco._limpar_cache()
+            banco._adicionar_cache(nomes, generos, matriz)
+            banco._cache_carregado = True
+
+        resultado['buscar_manual'] = resumo([_tempo(banco.buscar_manual, q, k) for q in lista_consultas])
+        inicio = time.perf_counter()
+        banco.buscar_manual_lote(lista_consultas, k)
+        resultado['buscar_manual_lote_ms_por_consulta'] = (
+            (time.perf_counter() - inicio) * 1000 / len(lista_consultas)
+        )
+    return resultado
+
+
+def _tempo(funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    return time.perf_counter() - inicio
+
+
+def vizinhos_sinteticos(k, semente=0):
+    rng = np.random.default_rng(semente)
+    return [
+        {'nome': f"vizinho_{i}.mp3", 'genero': GENEROS[rng.integers(len(GENEROS))],
+         'distancia': float(d)}
+        for i, d in enumerate(np.sort(rng.random(k) * 50))
+    ]
+
+
+def medir_votacao(pasta, k, repeticoes):
+    with na_pasta(pasta):
+        classificador = ClassificadorMusical(usar_cache=False)
+    vizinhos = vizinhos_sinteticos(k)
+    return cronometrar(classificador._votar, repeticoes * 100, vizinhos, k)[0]
+
+
+def medir_grafico(pasta, k, repeticoes, dpi, formato):
+    """Montagem da figura e gravação, como num processo do RenderizadorGraficos."""
+    from visualizador import Visualizador
+
+    visualizador = Visualizador()
+    vizinhos = vizinhos_sinteticos(k)
+    votos = {}
+    for v in vizinhos:
+        votos[v['genero']] = votos.get(v['genero'], 0) + 1
+    genero = max(votos, key=votos.get)
+    caminho = os.path.join(pasta, f"grafico.{formato}")
+
+    montar, salvar = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fig = visualizador.plotar_resultados("sintetico.mp3", vizinhos, votos, genero, 60.0, k)
+        meio = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            visualizador.salvar_grafico(fig, caminho, dpi=dpi, formato=formato)
+        montar.append(meio - inicio)
+        salvar.append(time.perf_counter() - meio)
+    return {'montar': resumo(montar), 'salvar': resumo(salvar), 'dpi': dpi, 'formato': formato}
+
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'chromadb': chromadb.__version__,
+    }
+
+
+def benchmark(args):
+    relatorio = {'ambiente': ambiente(), 'parametros': vars(args).copy()}
+    pasta = tempfile.mkdtemp(prefix="benchmark_classificador_")
+    try:
+        arquivos = gravar_audios(pasta, args.duracao)
+
+        if 'decodificacao' in args.etapas:
+            print(">> Decodificação...")
+            relatorio['decodificacao'] = medir_decodificacao(arquivos, args.duracao, args.repeticoes)
+
+        if 'features' in args.etapas:
+            print(">> Features...")
+            relatorio['features'] = medir_features(arquivos, args.duracao, args.repeticoes)
+
+        if 'banco' in args.etapas:
+            relatorio['banco'] = {}
+            for n in args.tamanhos:
+                print(f">> Banco com {n} vetores...")
+                relatorio['banco'][str(n)] = medir_banco(
+                    n, os.path.join(pasta, f"banco_{n}"), args.consultas, args.k, args.max_chroma
+                )
+
+        if 'votacao' in args.etapas:
+            relatorio['votacao'] = medir_votacao(os.path.join(pasta, "votacao"), args.k, args.repeticoes)
+
+        if 'grafico' in args.etapas:
+            print(">> Gráfico...")
+            relatorio['grafico'] = medir_grafico(pasta, args.k, args.repeticoes, args.dpi, args.formato_grafico)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return relatorio
+
+
+def imprimir(relatorio):
+    print("\n" + "=" * 70)
+    for etapa in ('decodificacao', 'features'):
+        if etapa in relatorio:
+            print(f"{etapa.upper():32} {'mediana (ms)':>12} {'p95 (ms)':>10}")
+            for nome, r in relatorio[etapa].items():
+                print(f"  {nome:30} {r['mediana_ms']:12.1f} {r['p95_ms']:10.1f}")
+
+    if 'banco' in relatorio:
+        print(f"\n{'BANCO':>10} {'inserção/s':>11} {'similares':>10} {'manual':>8} {'lote/cons.':>11}  (ms)")
+        for r in relatorio['banco'].values():
+            insercao = f"{r['adicionar_lote_itens_por_s']:11.0f}" if 'adicionar_lote_s' in r else f"{'-':>11}"
+            similares = f"{r['buscar_similares']['mediana_ms']:10.2f}" if 'buscar_similares' in r else f"{'-':>10}"
+            print(f"{r['n']:>10} {insercao} {similares} {r['buscar_manual']['mediana_ms']:8.2f} "
+                  f"{r['buscar_manual_lote_ms_por_consulta']:11.3f}")
+
+    if 'votacao' in relatorio:
+        print(f"\nVotação: {relatorio['votacao']['mediana_ms'] * 1000:.1f} µs")
+    if 'grafico' in relatorio:
+        g = relatorio['grafico']
+        print(f"Gráfico ({g['formato']}, {g['dpi']} dpi): montar {g['montar']['mediana_ms']:.0f} ms, "
+              f"salvar {g['salvar']['mediana_ms']:.0f} ms")
+    print("=" * 70)
+
+
+def metricas(relatorio, prefixo=""):
+    """Achata o relatório em {caminho: valor} com as métricas comparáveis."""
+    planas = {}
+    for chave, valor in relatorio.items():
+        if chave in ('ambiente', 'parametros'):
+            continue
+        caminho = f"{prefixo}{chave}"
+        if isinstance(valor, dict):
+            planas.update(metricas(valor, caminho + "."))
+        elif isinstance(valor, (int, float)) and (
+            chave.endswith(('_ms', '_s', '_por_s', '_por_consulta')) and chave not in ('p95_ms', 'min_ms')
+        ):
+            planas[caminho] = valor
+    return planas
+
+
+def comparar(atual, anterior, tolerancia):
+    """Lista as métricas que pioraram mais que `tolerancia` (fração) em relação ao anterior."""
+    antes = metricas(anterior)
+    regressoes = []
+    for caminho, valor in metricas(atual).items():
+        if caminho not in antes or antes[caminho] <= 0:
+            continue
+        # Vazão (itens/s) é melhor quando sobe; tempos, quando descem
+        razao = antes[caminho] / valor if caminho.endswith('_por_s') else valor / antes[caminho]
+        if razao > 1 + tolerancia:
+            regressoes.append((caminho, antes[caminho], valor, razao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de classificação musical")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=list(ETAPAS))
+    parser.add_argument("--duracao", type=float, default=30,
+                        help="Duração do áudio sintético em segundos (padrão: 30)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições por medição (padrão: 3)")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Tamanhos de banco (padrão: 1000 10000 100000; até 1000000)")
+    parser.add_argument("--max-chroma", type=int, default=100000,
+                        help="Acima disso mede só a busca local, sem inserir no ChromaDB (padrão: 100000)")
+    parser.add_argument("--consultas", type=int, default=50, help="Consultas por banco (padrão: 50)")
+    parser.add_argument("-k", type=int, default=5, help="Número de vizinhos (padrão: 5)")
+    parser.add_argument("--dpi", type=int, default=100, help="Resolução do gráfico (padrão: 100)")
+    parser.add_argument("--formato-grafico", default="png", help="Formato do gráfico (padrão: png)")
+    parser.add_argument("--saida", default="benchmark_classificador.json",
+                        help="Arquivo JSON de saída (padrão: benchmark_classificador.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Piora aceita no --comparar, em fração (padrão: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    relatorio = benchmark(args)
+    imprimir(relatorio)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"✓ Resultado salvo em: {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regressoes = comparar(relatorio, anterior, args.tolerancia)
+        if not regressoes:
+            print(f"✓ Nenhuma métrica piorou mais de {args.tolerancia:.0%} em relação a {args.comparar}")
+            return
+        print(f"Regressões em relação a {args.comparar}:")
+        for caminho, antes, agora, razao in regressoes:
+            print(f"  {caminho}: {antes:.4g} -> {agora:.4g} ({razao:.2f}x pior)")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark da extração de features: cálculo separado vs passagem única."""
+import argparse
+import time
+
+import librosa
+import numpy as np
+
+from extrator_features import TOLERANCIA_PASSAGEM_UNICA, ExtratorFeatures
+
+
+def gerar_audio_sintetico(duracao, sr=22050, semente=0):
+    """Gera um sinal de teste (chirp + tom + ruído) sem precisar de arquivos."""
+    chirp = librosa.chirp(fmin=110, fmax=4000, sr=sr, duration=duracao)
+    tom = 0.5 * librosa.tone(440, sr=sr, duration=duracao)
+    ruido = 0.05 * np.random.default_rng(semente).standard_normal(len(chirp))
+    return (chirp + tom + ruido).astype(np.float32), sr
+
+
+def medir(funcao, y, sr, repeticoes):
+    """Retorna o menor tempo (s) entre as repetições e o último vetor gerado."""
+    tempos = []
+    features = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        features = funcao(y, sr)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), np.array(features)
+
+
+def benchmark(arquivos, duracao, repeticoes):
+    extrator = ExtratorFeatures(duracao_max=duracao)
+
+    if arquivos:
+        sinais = [(arquivo, *extrator.carregar_audio(arquivo)) for arquivo in arquivos]
+    else:
+        sinais = [(f"sintetico_{duracao}s", *gerar_audio_sintetico(duracao))]
+
+    # Aquece caches do librosa/numba para não contaminar a primeira medição
+    y, sr = gerar_audio_sintetico(5)
+    extrator.extrair_features_separadas(y, sr)
+    extrator.extrair_features_sinal(y, sr)
+
+    print("=" * 70)
+    print(f"{'Faixa':30} {'Antes (s)':>10} {'Depois (s)':>10} {'Ganho':>7} {'Dif. máx':>10}")
+    print("=" * 70)
+
+    total_antes = total_depois = 0.0
+    for nome, y, sr in sinais:
+        t_antes, f_antes = medir(extrator.extrair_features_separadas, y, sr, repeticoes)
+        t_depois, f_depois = medir(extrator.extrair_features_sinal, y, sr, repeticoes)
+        diferenca = float(np.max(np.abs(f_antes - f_depois)))
+        total_antes += t_antes
+        total_depois += t_depois
+
+        aviso = "" if diferenca <= TOLERANCIA_PASSAGEM_UNICA else "  (!)"
+        print(
+            f"{nome[:30]:30} {t_antes:10.3f} {t_depois:10.3f} "
+            f"{t_antes / t_depois:6.2f}x {diferenca:10.2e}{aviso}"
+        )
+
+    print("=" * 70)
+    print(
+        f"Média por faixa: {total_antes / len(sinais):.3f}s -> "
+        f"{total_depois / len(sinais):.3f}s "
+        f"(tolerância: {TOLERANCIA_PASSAGEM_UNICA:.0e})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da extração de features")
+    parser.add_argument("arquivos", nargs="*", help="Arquivos de áudio (padrão: sinal sintético)")
+    parser.add_argument("--duracao", type=float, default=210, help="Duração analisada em segundos (padrão: 210)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições por faixa (padrão: 3)")
+    args = parser.parse_args()
+
+    benchmark(args.arquivos, args.duracao, args.repeticoes)
+
+
+if __name__ == "__main__":
+    main()
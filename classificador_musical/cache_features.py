@@ -0,0 +1,125 @@
+"""Cache em disco de features, endereçado pelo conteúdo do arquivo de áudio."""
+import hashlib
+import sqlite3
+import time
+
+import numpy as np
+
+# Incrementar quando o layout/cálculo do vetor de features mudar
+VERSAO_FEATURES = 1
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do conteúdo de um arquivo, lendo em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class CacheFeatures:
+    """
+    Guarda vetores de features em um SQLite, com chave = hash do arquivo +
+    parâmetros do extrator. Quando o tamanho total passa de `tamanho_max_mb`,
+    as entradas acessadas há mais tempo são removidas (LRU).
+
+    Pode ser usado por vários processos ao mesmo tempo (ex: popular_banco
+    em modo paralelo); os contadores de acertos/falhas são por instância.
+    """
+
+    def __init__(self, caminho="./cache_features.sqlite", tamanho_max_mb=256):
+        self.caminho = caminho
+        self.tamanho_max = int(tamanho_max_mb * 1024 * 1024)
+        self.acertos = 0
+        self.falhas = 0
+
+        self.conexao = sqlite3.connect(caminho, timeout=30)
+        self.conexao.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            " chave TEXT PRIMARY KEY,"
+            " vetor BLOB NOT NULL,"
+            " tamanho INTEGER NOT NULL,"
+            " ultimo_acesso REAL NOT NULL)"
+        )
+        self.conexao.execute(
+            "CREATE INDEX IF NOT EXISTS idx_acesso ON features (ultimo_acesso)"
+        )
+        self.conexao.commit()
+
+    @staticmethod
+    def gerar_chave(caminho_arquivo, parametros):
+        """Monta a chave a partir do conteúdo do arquivo e dos parâmetros do extrator."""
+        sufixo = ":".join(f"{k}={parametros[k]}" for k in sorted(parametros))
+        return f"{hash_arquivo(caminho_arquivo)}:v{VERSAO_FEATURES}:{sufixo}"
+
+    def obter(self, chave):
+        """Retorna a lista de features em cache ou None."""
+        linha = self.conexao.execute(
+            "SELECT vetor FROM features WHERE chave = ?", (chave,)
+        ).fetchone()
+
+        if linha is None:
+            self.falhas += 1
+            return None
+
+        self.acertos += 1
+        self.conexao.execute(
+            "UPDATE features SET ultimo_acesso = ? WHERE chave = ?",
+            (time.time(), chave)
+        )
+        self.conexao.commit()
+        return np.frombuffer(linha[0], dtype=np.float64).tolist()
+
+    def salvar(self, chave, features):
+        """Guarda um vetor de features e aplica o limite de tamanho."""
+        blob = np.asarray(features, dtype=np.float64).tobytes()
+        self.conexao.execute(
+            "INSERT OR REPLACE INTO features (chave, vetor, tamanho, ultimo_acesso)"
+            " VALUES (?, ?, ?, ?)",
+            (chave, blob, len(blob), time.time())
+        )
+        self._aplicar_limite()
+        self.conexao.commit()
+
+    def _aplicar_limite(self):
+        """Remove as entradas menos usadas até caber em tamanho_max."""
+        total = self.conexao.execute(
+            "SELECT COALESCE(SUM(tamanho), 0) FROM features"
+        ).fetchone()[0]
+        if total <= self.tamanho_max:
+            return
+
+        excesso = total - self.tamanho_max
+        remover = []
+        for chave, tamanho in self.conexao.execute(
+            "SELECT chave, tamanho FROM features ORDER BY ultimo_acesso"
+        ):
+            remover.append((chave,))
+            excesso -= tamanho
+            if excesso <= 0:
+                break
+        self.conexao.executemany("DELETE FROM features WHERE chave = ?", remover)
+
+    def limpar(self):
+        """Remove todas as entradas do cache."""
+        self.conexao.execute("DELETE FROM features")
+        self.conexao.commit()
+
+    def estatisticas(self):
+        """Retorna contadores de uso e ocupação do cache."""
+        entradas, tamanho = self.conexao.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM features"
+        ).fetchone()
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            'entradas': entradas,
+            'tamanho_bytes': tamanho,
+            'tamanho_max_bytes': self.tamanho_max,
+        }
+
+    def fechar(self):
+        self.conexao.close()
@@ -3,15 +3,48 @@
 import os
 
 from banco_vetorial import BancoVetorial
-from extrator_features import ExtratorFeatures
-from visualizador import Visualizador
+from cache_features import CacheFeatures
+from extrator_features import ExtratorFeatures, extrair_em_paralelo
 
 
 class ClassificadorMusical:
-    def __init__(self):
-        self.extrator = ExtratorFeatures()
+    def __init__(self, usar_cache=True, dpi=100, formato_grafico="png", processos_graficos=1,
+                 streaming=False, trecho=None, segmentos=None):
+        # Cache em disco evita recalcular features de arquivos já processados
+        cache = CacheFeatures() if usar_cache else None
+        # streaming/trecho: ver ExtratorFeatures (o trecho deve ser o mesmo usado no banco)
+        self.extrator = ExtratorFeatures(cache=cache, streaming=streaming, trecho=trecho)
         self.banco = BancoVetorial()
-        self.visualizador = Visualizador()
+        # Duração (s) das janelas; com segmentos, adiciona e classifica por segmento
+        self.segmentos = segmentos
+        self.dpi = dpi
+        self.formato_grafico = formato_grafico
+        self.processos_graficos = processos_graficos
+        self._renderizador = None
+
+    @property
+    def renderizador(self):
+        """Pool de gráficos, criado só quando algum gráfico é pedido (importa o matplotlib)."""
+        if self._renderizador is None:
+            from visualizador import RenderizadorGraficos
+            self._renderizador = RenderizadorGraficos(
+                self.processos_graficos, self.dpi, self.formato_grafico
+            )
+        return self._renderizador
+
+    def aguardar_graficos(self):
+        """Espera os gráficos em andamento; retorna [(caminho, erro)] dos que falharam."""
+        if self._renderizador is None:
+            return []
+        return self._renderizador.aguardar()
+
+    def encerrar(self):
+        """Termina os gráficos pendentes e fecha o pool de renderização."""
+        if self._renderizador is None:
+            return []
+        erros = self._renderizador.encerrar()
+        self._renderizador = None
+        return erros
 
     def adicionar_musica(self, caminho, genero):
         """Adiciona uma música ao banco."""
@@ -23,10 +56,24 @@ class ClassificadorMusical:
         features = self.extrator.extrair_todas_features(caminho)
         nome = os.path.basename(caminho)
         self.banco.adicionar(nome, genero, features)
+        if self.segmentos:
+            segmentos = self.extrator.extrair_features_segmentos(caminho, self.segmentos)
+            self.banco.adicionar_segmentos_lote([nome], [genero], [segmentos])
+            print(f"✓ Adicionada: {nome} ({genero}, {len(segmentos)} segmentos)")
+            return
         print(f"✓ Adicionada: {nome} ({genero})")
 
-    def classificar_musica(self, caminho, k=5, mostrar_calculos=True):
-        """Classifica uma música e retorna os resultados."""
+    def classificar_musica(self, caminho, k=5, mostrar_calculos=True, plotar=False):
+        """
+        Classifica uma música e retorna os resultados.
+
+        Com plotar=True o gráfico é gerado em segundo plano e 'grafico'
+        traz o caminho do arquivo (pronto após aguardar_graficos()). Com
+        segmentos, a consulta é dividida em janelas e os vizinhos são as
+        músicas mais próximas segundo banco.buscar_segmentos (serve para
+        clipes curtos); a votação é a mesma.
+        """
+        _validar_k(k)
         if self.banco.total() == 0:
             print("Erro: Adicione músicas primeiro!")
             return None
@@ -36,14 +83,22 @@ class ClassificadorMusical:
             return None
 
         print(f"\nClassificando: {caminho}")
-        features = self.extrator.extrair_todas_features(caminho)
-
-        # Busca manual (mostra cálculos)
-        if mostrar_calculos:
-            vizinhos = self.banco.buscar_manual(features, k)
+        if self._usar_segmentos():
+            segmentos = self.extrator.extrair_features_segmentos(caminho, self.segmentos)
+            print(f"{len(segmentos)} segmentos de {self.segmentos:g} s")
+            vizinhos = self.banco.buscar_segmentos(segmentos, k)
+        # Busca manual (mostra cálculos dos k vizinhos)
+        elif mostrar_calculos:
+            features = self.extrator.extrair_todas_features(caminho)
+            vizinhos = self.banco.buscar_manual(features, k, mostrar_calculos=True)
         else:
+            features = self.extrator.extrair_todas_features(caminho)
             vizinhos = self.banco.buscar_similares(features, k)
 
+        if not vizinhos:
+            print("Erro: Nenhum vizinho encontrado")
+            return None
+
         # Mostra vizinhos
         print(f"\n--- {k} VIZINHOS MAIS PRÓXIMOS ---")
         for i, v in enumerate(vizinhos, 1):
@@ -51,41 +106,23 @@ class ClassificadorMusical:
 
         # Votação por maioria simples
         print("\n--- VOTAÇÃO ---")
-        votos = {}
-
-        for v in vizinhos:
-            genero = v["genero"]
-            votos[genero] = votos.get(genero, 0) + 1
+        votos, genero_final, confianca = self._votar(vizinhos, k)
 
         for genero, contagem in votos.items():
             print(f"{genero}: {contagem} votos")
 
-        # Escolhe o gênero com mais votos
-        genero_final = max(votos, key=votos.get)
-        confianca = (votos[genero_final] / k) * 100
-
         print(f"\n{'=' * 40}")
         print(f"RESULTADO: {genero_final}")
         print(f"Confiança: {confianca:.1f}%")
         print(f"{'=' * 40}")
 
-        # Gera visualização automaticamente
         nome_musica = os.path.basename(caminho)
-        print("\nGerando visualização...")
-
-        fig = self.visualizador.plotar_resultados(
-            nome_musica=nome_musica,
-            vizinhos=vizinhos,
-            votos=votos,
-            genero_final=genero_final,
-            confianca=confianca,
-            k=k,
-        )
-
-        # Salva o gráfico
-        nome_arquivo = os.path.splitext(nome_musica)[0]
-        caminho_saida = f"classificacao_{nome_arquivo}.png"
-        self.visualizador.salvar_grafico(fig, caminho_saida)
+        caminho_saida = None
+        if plotar:
+            caminho_saida = self.renderizador.enviar(
+                nome_musica, vizinhos, votos, genero_final, confianca, k
+            )
+            print(f"\nGerando visualização em segundo plano: {caminho_saida}")
 
         # Retorna dicionário com todos os dados
         return {
@@ -97,3 +134,116 @@ class ClassificadorMusical:
             "nome_musica": nome_musica,
             "grafico": caminho_saida,
         }
+
+    def classificar_lote(self, caminhos, k=5, processos=None, plotar=False):
+        """
+        Classifica várias músicas de uma vez, sem interação.
+
+        As features são extraídas em paralelo (processos=None usa todos os
+        núcleos) e todos os vetores vão para uma única busca kNN em lote
+        (com segmentos, uma buscar_segmentos por arquivo).
+        Os gráficos só são gerados com plotar=True, em segundo plano (ver
+        aguardar_graficos()). Retorna um dicionário
+        por arquivo, na ordem de entrada; arquivos que falharam trazem
+        'genero' None e a mensagem em 'erro'.
+        """
+        _validar_k(k)
+        if self.banco.total() == 0:
+            print("Erro: Adicione músicas primeiro!")
+            return []
+
+        features = {}
+        erros = {}
+        existentes = [c for c in caminhos if os.path.exists(c)]
+        for caminho in caminhos:
+            if not os.path.exists(caminho):
+                erros[caminho] = "Arquivo não encontrado"
+
+        usar_segmentos = self._usar_segmentos()
+        extraidos = extrair_em_paralelo(
+            existentes, self.extrator, processos,
+            segundos_segmento=self.segmentos if usar_segmentos else None
+        )
+        for caminho, vetor, erro in extraidos:
+            if erro is None:
+                features[caminho] = vetor
+            else:
+                erros[caminho] = erro
+
+        ordem = [c for c in caminhos if c in features]
+        if usar_segmentos:
+            todos_vizinhos = [self.banco.buscar_segmentos(features[c], k) for c in ordem]
+        else:
+            todos_vizinhos = self.banco.buscar_manual_lote([features[c] for c in ordem], k)
+        vizinhos_por_caminho = {}
+        for caminho, vizinhos in zip(ordem, todos_vizinhos):
+            if vizinhos:
+                vizinhos_por_caminho[caminho] = vizinhos
+            else:
+                erros[caminho] = "Nenhum vizinho encontrado"
+
+        resultados = []
+        for caminho in caminhos:
+            nome_musica = os.path.basename(caminho)
+            if caminho not in vizinhos_por_caminho:
+                resultados.append({
+                    "caminho": caminho,
+                    "nome_musica": nome_musica,
+                    "genero": None,
+                    "erro": erros.get(caminho),
+                })
+                continue
+
+            vizinhos = vizinhos_por_caminho[caminho]
+            votos, genero_final, confianca = self._votar(vizinhos, k)
+            resultado = {
+                "caminho": caminho,
+                "nome_musica": nome_musica,
+                "genero": genero_final,
+                "confianca": confianca,
+                "vizinhos": vizinhos,
+                "votos": votos,
+                "k": k,
+            }
+
+            if plotar:
+                resultado["grafico"] = self.renderizador.enviar(
+                    nome_musica, vizinhos, votos, genero_final, confianca, k
+                )
+
+            resultados.append(resultado)
+
+        return resultados
+
+    def _usar_segmentos(self):
+        """
+        Segmentos só valem se o banco tiver segmentos (populado com
+        --segmentos); senão a busca volta para a música inteira.
+        """
+        if not self.segmentos:
+            return False
+        if self.banco.total_segmentos() == 0:
+            print("Aviso: o banco não tem segmentos (popule com --segmentos); "
+                  "usando a busca pela música inteira")
+            return False
+        return True
+
+    def _votar(self, vizinhos, k):
+        """Votação por maioria simples; retorna (votos, gênero, confiança %)."""
+        if not vizinhos:
+            return {}, None, 0.0
+        votos = {}
+        for v in vizinhos:
+            genero = v["genero"]
+            votos[genero] = votos.get(genero, 0) + 1
+
+        # Escolhe o gênero com mais votos
+        genero_final = max(votos, key=votos.get)
+        confianca = (votos[genero_final] / k) * 100
+        return votos, genero_final, confianca
+
+
+def _validar_k(k):
+    """k é o número de vizinhos e o divisor da confiança: precisa ser >= 1."""
+    if k < 1:
+        raise ValueError(f"k deve ser positivo, recebido {k}")
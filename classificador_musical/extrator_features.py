@@ -2,24 +2,124 @@
 Extração de features de áudio.
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import librosa
 import numpy as np
+import soundfile as sf
+import soxr
+
+# Parâmetros de STFT usados por todas as features (padrões do librosa)
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# Diferença máxima esperada entre o motor de passagem única e o cálculo
+# separado por feature (ver extrair_features_sinal)
+TOLERANCIA_PASSAGEM_UNICA = 1e-4
 
 
 class ExtratorFeatures:
     """Extrai características de músicas."""
 
-    def __init__(self, duracao_max=210):
+    def __init__(self, duracao_max=210, passagem_unica=True, n_mfcc=13,
+                 sr=22050, cache=None, streaming=False, trecho=None,
+                 segundos_bloco=10, qualidade_resample='HQ'):
         self.duracao_max = duracao_max
+        self.passagem_unica = passagem_unica
+        self.n_mfcc = n_mfcc
+        # None mantém a taxa nativa de cada arquivo (sem resample)
+        self.sr = sr
+        # CacheFeatures opcional; evita decodificar arquivos já vistos
+        self.cache = cache
+        # Decodificação em blocos (ver extrair_features_streaming)
+        self.streaming = streaming
+        self.segundos_bloco = segundos_bloco
+        # Analisa só `trecho` segundos do meio da música (None = desde o início)
+        self.trecho = trecho
+        # Qualidade do soxr: 'VHQ', 'HQ' (padrão do librosa), 'MQ', 'LQ' ou 'QQ'
+        self.qualidade_resample = qualidade_resample
+
+    def parametros(self):
+        """Parâmetros que alteram o vetor gerado (usados na chave do cache)."""
+        parametros = {
+            'duracao_max': self.duracao_max,
+            'n_mfcc': self.n_mfcc,
+            'sr': self.sr,
+        }
+        # Só entram na chave quando diferem do padrão, para não invalidar o cache
+        # existente. O streaming fica de fora, como passagem_unica: o vetor é o
+        # mesmo do modo normal (mesma afinação no chroma; só o ZCR dos quadros
+        # das bordas difere), com ou sem trecho e sr.
+        if self.trecho is not None:
+            parametros['trecho'] = self.trecho
+        if self.qualidade_resample != 'HQ':
+            parametros['qualidade_resample'] = self.qualidade_resample
+        return parametros
+
+    def _janela_analise(self, duracao_total):
+        """(offset, duração) em segundos do trecho analisado de um áudio com `duracao_total` s."""
+        offset, duracao = 0.0, duracao_total
+        if self.trecho is not None and duracao_total > self.trecho:
+            offset = (duracao_total - self.trecho) / 2
+            duracao = self.trecho
+        if self.duracao_max is not None:
+            duracao = min(duracao, self.duracao_max)
+        return offset, duracao
 
     def carregar_audio(self, caminho_arquivo):
         """Carrega um arquivo de áudio."""
-        y, sr = librosa.load(caminho_arquivo, duration=self.duracao_max)
+        offset, duracao = 0.0, self.duracao_max
+        if self.trecho is not None:
+            offset, duracao = self._janela_analise(librosa.get_duration(path=caminho_arquivo))
+        y, sr = librosa.load(
+            caminho_arquivo, sr=self.sr, offset=offset, duration=duracao,
+            res_type=f"soxr_{self.qualidade_resample.lower()}"
+        )
         return y, sr
 
+    def ler_blocos(self, caminho_arquivo, segundos_bloco=None):
+        """
+        Decodifica o áudio aos poucos, gerando (bloco mono float32, sr).
+
+        Lê `segundos_bloco` (padrão: self.segundos_bloco) por vez com o
+        soundfile e para ao fim do trecho analisado (duracao_max/trecho). O
+        resample usa o soxr em modo contínuo, sem emendas entre blocos, e é
+        pulado quando a taxa nativa já é a desejada. Formatos que o
+        soundfile não abre lançam sf.LibsndfileError.
+        """
+        with sf.SoundFile(caminho_arquivo) as arquivo:
+            sr_nativo = arquivo.samplerate
+            sr = self.sr or sr_nativo
+            offset, duracao = self._janela_analise(arquivo.frames / sr_nativo)
+            # Mesmo arredondamento do librosa.load
+            arquivo.seek(int(np.round(offset * sr_nativo)))
+            restantes = int(np.round(duracao * sr_nativo))
+            tamanho_bloco = max(1, int((segundos_bloco or self.segundos_bloco) * sr_nativo))
+
+            resampler = None
+            if sr != sr_nativo:
+                resampler = soxr.ResampleStream(
+                    sr_nativo, sr, 1, dtype='float32', quality=self.qualidade_resample
+                )
+
+            while restantes > 0:
+                bloco = arquivo.read(min(tamanho_bloco, restantes), dtype='float32', always_2d=True)
+                if len(bloco) == 0:
+                    break
+                restantes -= len(bloco)
+                bloco = bloco.mean(axis=1)  # mesmo downmix do librosa.to_mono
+                if resampler is not None:
+                    bloco = resampler.resample_chunk(bloco, last=restantes <= 0)
+                yield bloco, sr
+
+            if resampler is not None and restantes > 0:
+                # O arquivo acabou antes do esperado: esvazia o resampler
+                yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True), sr
+
     def extrair_mfcc(self, y, sr):
         """Extrai MFCCs."""
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=self.n_mfcc)
         return [float(np.mean(mfcc[i])) for i in range(len(mfcc))]
 
     def extrair_spectral_centroid(self, y, sr):
@@ -45,15 +145,99 @@ class ExtratorFeatures:
     def extrair_tempo(self, y, sr):
         """Estima o tempo (BPM)."""
         tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-        return float(tempo) if isinstance(tempo, np.ndarray) else tempo
+        return _tempo_escalar(tempo)
 
     def extrair_todas_features(self, caminho_arquivo):
         """Extrai todas as features de um arquivo com normalização."""
-        y, sr = self.carregar_audio(caminho_arquivo)
+        if self.cache is not None:
+            chave = self.cache.gerar_chave(caminho_arquivo, self.parametros())
+            features = self.cache.obter(chave)
+            if features is not None:
+                return features
+
+        features = None
+        if self.streaming:
+            try:
+                features = self.extrair_features_streaming(caminho_arquivo)
+            except sf.LibsndfileError:
+                pass  # formato sem suporte no soundfile: decodifica inteiro com o librosa
+
+        if features is None:
+            y, sr = self.carregar_audio(caminho_arquivo)
+            if self.passagem_unica:
+                features = self.extrair_features_sinal(y, sr)
+            else:
+                features = self.extrair_features_separadas(y, sr)
+
+        if self.cache is not None:
+            self.cache.salvar(chave, features)
+        return features
+
+    def extrair_features_segmentos(self, caminho_arquivo, segundos_segmento=10):
+        """
+        Extrai um vetor de features por janela de `segundos_segmento`.
+
+        Cada linha tem o layout de extrair_features_sinal. O áudio é lido
+        em blocos (só um segmento fica em memória). Formatos sem suporte no
+        soundfile são decodificados inteiros e fatiados. A sobra final vira
+        um segmento se tiver ao menos metade da janela, ou se for a única,
+        para clipes curtos (completada com silêncio até N_FFT amostras).
+        Usa o cache com o tamanho do segmento na chave. Retorna uma matriz
+        (n_segmentos, n_features).
+        """
+        if self.cache is not None:
+            parametros = dict(self.parametros(), segmento=segundos_segmento)
+            chave = self.cache.gerar_chave(caminho_arquivo, parametros)
+            em_cache = self.cache.obter(chave)
+            if em_cache is not None:
+                return np.reshape(em_cache, (-1, self.n_mfcc + 16))
+
+        segmentos = []
+        sr = self.sr or 22050
+        tamanho = int(segundos_segmento * sr)
+        pendente = np.zeros(0, dtype=np.float32)
+        try:
+            for bloco, sr in self.ler_blocos(caminho_arquivo, segundos_segmento):
+                tamanho = int(segundos_segmento * sr)
+                pendente = np.concatenate([pendente, bloco])
+                # O resample contínuo não devolve blocos do tamanho exato da janela
+                while len(pendente) >= tamanho:
+                    segmentos.append(self.extrair_features_sinal(pendente[:tamanho], sr))
+                    pendente = pendente[tamanho:]
+        except sf.LibsndfileError:
+            y, sr = self.carregar_audio(caminho_arquivo)
+            tamanho = int(segundos_segmento * sr)
+            segmentos = [
+                self.extrair_features_sinal(y[inicio:inicio + tamanho], sr)
+                for inicio in range(0, len(y) - tamanho + 1, tamanho)
+            ]
+            pendente = y[len(segmentos) * tamanho:]
+
+        if segmentos and len(pendente) >= max(N_FFT, tamanho // 2):
+            segmentos.append(self.extrair_features_sinal(pendente, sr))
+        elif not segmentos and len(pendente) > 0:
+            # Clipe mais curto que a janela: um segmento só, completado com
+            # silêncio até N_FFT se for mais curto que um quadro da STFT
+            pendente = np.pad(pendente, (0, max(0, N_FFT - len(pendente))))
+            segmentos.append(self.extrair_features_sinal(pendente, sr))
+        if not segmentos:
+            raise ValueError(f"Áudio vazio: {caminho_arquivo}")
+
+        segmentos = np.asarray(segmentos, dtype=np.float64)
+        if self.cache is not None:
+            self.cache.salvar(chave, segmentos.ravel())
+        return segmentos
 
+    def extrair_features_separadas(self, y, sr):
+        """
+        Extrai as 29 features chamando o librosa uma vez por feature.
+
+        Cada chamada recalcula sua própria STFT; mantido como referência
+        para o motor de passagem única e para o benchmark.
+        """
         features = []
 
-        # MFCCs (13 valores) - já estão em escala razoável
+        # MFCCs (n_mfcc valores, 13 por padrão) - já estão em escala razoável
         mfccs = self.extrair_mfcc(y, sr)
         features.extend(mfccs)
 
@@ -78,3 +262,290 @@ class ExtratorFeatures:
         features.append(tempo / 200.0)
 
         return features
+
+    def extrair_features_sinal(self, y, sr):
+        """
+        Extrai as 29 features calculando a STFT uma única vez.
+
+        O espectrograma de magnitude alimenta centróide e rolloff; o de
+        potência alimenta chroma e o mel, que por sua vez (em dB) serve
+        tanto para os MFCCs quanto para o envelope de onsets do beat_track.
+        O layout do vetor é o mesmo de extrair_features_separadas e os
+        valores coincidem com diferença absoluta menor que
+        TOLERANCIA_PASSAGEM_UNICA.
+        """
+        magnitude = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+        potencia = magnitude**2
+
+        mel_db = librosa.power_to_db(
+            librosa.feature.melspectrogram(S=potencia, sr=sr, n_fft=N_FFT)
+        )
+
+        features = []
+
+        # MFCCs (n_mfcc valores, 13 por padrão)
+        mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=self.n_mfcc)
+        features.extend(float(v) for v in np.mean(mfcc, axis=1))
+
+        # Spectral centroid e rolloff - normalizados por sr/2 (Nyquist)
+        centroid = librosa.feature.spectral_centroid(S=magnitude, sr=sr, n_fft=N_FFT)
+        features.append(float(np.mean(centroid)) / (sr / 2))
+
+        rolloff = librosa.feature.spectral_rolloff(S=magnitude, sr=sr, n_fft=N_FFT)
+        features.append(float(np.mean(rolloff)) / (sr / 2))
+
+        # Zero crossing rate - domínio do tempo, não usa a STFT
+        features.append(self.extrair_zero_crossing_rate(y))
+
+        # Chroma (12 valores)
+        chroma = librosa.feature.chroma_stft(S=potencia, sr=sr, n_fft=N_FFT)
+        features.extend(float(v) for v in np.mean(chroma, axis=1))
+
+        # Tempo (BPM) - envelope de onsets a partir do mesmo mel em dB
+        onsets = librosa.onset.onset_strength(
+            S=mel_db, sr=sr, hop_length=HOP_LENGTH, aggregate=np.median
+        )
+        tempo, _ = librosa.beat.beat_track(
+            onset_envelope=onsets, sr=sr, hop_length=HOP_LENGTH
+        )
+        features.append(_tempo_escalar(tempo) / 200.0)
+
+        return features
+
+    def _blocos_stft(self, caminho_arquivo):
+        """
+        Gera (magnitude, quadros de áudio, sr) por bloco lido com ler_blocos.
+
+        Os quadros são os mesmos da STFT com center=True: N_FFT/2 zeros em
+        cada ponta e a sobreposição entre blocos guardada em `resto`.
+        """
+        def completos(sinal, sr):
+            n_quadros = 1 + (len(sinal) - N_FFT) // HOP_LENGTH if len(sinal) >= N_FFT else 0
+            if n_quadros <= 0:
+                return None, sinal
+            usado = sinal[:(n_quadros - 1) * HOP_LENGTH + N_FFT]
+            magnitude = np.abs(
+                librosa.stft(usado, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)
+            )
+            return (magnitude, usado, sr), sinal[n_quadros * HOP_LENGTH:]
+
+        resto = np.zeros(N_FFT // 2, dtype=np.float32)
+        sr = self.sr
+        for bloco, sr in self.ler_blocos(caminho_arquivo):
+            saida, resto = completos(np.concatenate([resto, bloco]), sr)
+            if saida is not None:
+                yield saida
+        saida, _ = completos(np.concatenate([resto, np.zeros(N_FFT // 2, dtype=np.float32)]), sr)
+        if saida is not None:
+            yield saida
+
+    def extrair_features_streaming(self, caminho_arquivo):
+        """
+        Extrai as 29 features de extrair_features_sinal sem carregar o áudio inteiro.
+
+        Centróide, rolloff e ZCR viram somas por quadro; o mel (n_mels x
+        quadros, pequeno) é acumulado, porque MFCC e tempo precisam do dB
+        e do envelope de onsets do trecho inteiro. O chroma depende da
+        afinação do trecho inteiro (como no chroma_stft): cada bloco guarda
+        os picos do piptrack e o espectro de potência, e o chroma é somado
+        no fim, com a afinação estimada como em librosa.estimate_tuning.
+        O arquivo é decodificado uma vez só; o áudio fica limitado a um
+        bloco, mas a potência de todos os quadros (~170 KB por segundo a
+        22050 Hz) fica em memória até o fim. Única diferença em relação a
+        extrair_features_sinal: o ZCR das bordas não usa o padding 'edge'.
+        """
+        somas = {'centroid': 0.0, 'rolloff': 0.0, 'zcr': 0.0, 'chroma': 0.0}
+        mel_blocos, potencias = [], []
+        alturas, intensidades = [], []
+        quadros = 0
+        sr = self.sr
+
+        for magnitude, usado, sr in self._blocos_stft(caminho_arquivo):
+            potencia = magnitude**2
+            mel_blocos.append(librosa.feature.melspectrogram(S=potencia, sr=sr, n_fft=N_FFT))
+            somas['centroid'] += np.sum(
+                librosa.feature.spectral_centroid(S=magnitude, sr=sr, n_fft=N_FFT)
+            )
+            somas['rolloff'] += np.sum(
+                librosa.feature.spectral_rolloff(S=magnitude, sr=sr, n_fft=N_FFT)
+            )
+            somas['zcr'] += np.sum(librosa.feature.zero_crossing_rate(
+                usado, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False
+            ))
+            # O piptrack é calculado quadro a quadro: só os picos são guardados
+            altura, intensidade = librosa.piptrack(S=potencia, sr=sr, n_fft=N_FFT)
+            picos = altura > 0
+            alturas.append(altura[picos].astype(np.float32))
+            intensidades.append(intensidade[picos].astype(np.float32))
+            potencias.append(potencia)
+            quadros += magnitude.shape[1]
+
+        if quadros == 0:
+            raise ValueError(f"Áudio vazio: {caminho_arquivo}")
+
+        alturas = np.concatenate(alturas)
+        intensidades = np.concatenate(intensidades)
+        limiar = np.median(intensidades) if len(intensidades) else 0.0
+        afinacao = librosa.pitch_tuning(alturas[intensidades >= limiar], bins_per_octave=12)
+        del alturas, intensidades
+
+        while potencias:
+            somas['chroma'] = somas['chroma'] + np.sum(librosa.feature.chroma_stft(
+                S=potencias.pop(0), sr=sr, n_fft=N_FFT, tuning=afinacao
+            ), axis=1)
+
+        mel_db = librosa.power_to_db(np.concatenate(mel_blocos, axis=1))
+        features = []
+
+        # MFCCs (n_mfcc valores, 13 por padrão)
+        mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=self.n_mfcc)
+        features.extend(float(v) for v in np.mean(mfcc, axis=1))
+
+        # Spectral centroid e rolloff - normalizados por sr/2 (Nyquist)
+        features.append(float(somas['centroid'] / quadros) / (sr / 2))
+        features.append(float(somas['rolloff'] / quadros) / (sr / 2))
+
+        # Zero crossing rate
+        features.append(float(somas['zcr'] / quadros))
+
+        # Chroma (12 valores)
+        features.extend(float(v) for v in somas['chroma'] / quadros)
+
+        # Tempo (BPM) - envelope de onsets do trecho inteiro
+        onsets = librosa.onset.onset_strength(
+            S=mel_db, sr=sr, hop_length=HOP_LENGTH, aggregate=np.median
+        )
+        features.append(_estimar_tempo(onsets, sr) / 200.0)
+
+        return features
+
+
+def _estimar_tempo(onsets, sr, colunas_por_bloco=1024):
+    """
+    BPM de librosa.beat.beat_track(onset_envelope=onsets), em blocos.
+
+    O beat_track só usa a média das colunas do tempograma (janela de 8 s)
+    para estimar o tempo, mas monta o tempograma inteiro antes (~150 MB
+    para 210 s). Aqui as colunas são autocorrelacionadas e somadas em
+    blocos de `colunas_por_bloco`, e o rastreamento de batidas, que não
+    entra no vetor, é pulado.
+    """
+    if not onsets.any():
+        return 0.0  # mesmo resultado do beat_track sem nenhum onset
+
+    janela_quadros = librosa.time_to_frames(8.0, sr=sr, hop_length=HOP_LENGTH).item()
+    n = len(onsets)
+    preenchido = np.pad(onsets, janela_quadros // 2, mode="linear_ramp", end_values=[0, 0])
+    quadros = librosa.util.frame(preenchido, frame_length=janela_quadros, hop_length=1)[:, :n]
+    janela = librosa.filters.get_window("hann", janela_quadros, fftbins=True)[:, np.newaxis]
+
+    soma = np.zeros((janela_quadros, 1))
+    for inicio in range(0, n, colunas_por_bloco):
+        autocorrelacao = librosa.autocorrelate(
+            quadros[:, inicio:inicio + colunas_por_bloco] * janela, axis=0
+        )
+        soma += librosa.util.normalize(autocorrelacao, norm=np.inf, axis=0).sum(axis=1, keepdims=True)
+
+    tempo = librosa.feature.tempo(tg=soma / n, sr=sr, hop_length=HOP_LENGTH)
+    return _tempo_escalar(tempo)
+
+
+def _tempo_escalar(tempo):
+    """Converte o tempo do beat_track em float (o librosa >= 0.10 devolve array)."""
+    return float(np.ravel(tempo)[0]) if isinstance(tempo, np.ndarray) else tempo
+
+
+# Extrator de cada processo do pool (criado uma vez por worker)
+_extrator_worker = None
+
+
+def _iniciar_worker(parametros, passagem_unica, caminho_cache, aquecer=False,
+                    streaming=False, segundos_bloco=10):
+    """Cria o extrator uma única vez em cada processo do pool."""
+    global _extrator_worker
+    cache = None
+    if caminho_cache is not None:
+        from cache_features import CacheFeatures
+        cache = CacheFeatures(caminho_cache)
+    _extrator_worker = ExtratorFeatures(
+        passagem_unica=passagem_unica, cache=cache, streaming=streaming,
+        segundos_bloco=segundos_bloco, **parametros
+    )
+    if aquecer:
+        # Compila as funções numba do librosa antes da primeira requisição
+        sr = _extrator_worker.sr or 22050
+        sinal = np.random.default_rng(0).standard_normal(2 * sr)
+        _extrator_worker.extrair_features_sinal(sinal.astype(np.float32), sr)
+
+
+def extrair_no_worker(caminho):
+    """Decodifica e extrai as features de um arquivo dentro de um worker do pool."""
+    return _extrator_worker.extrair_todas_features(caminho)
+
+
+def extrair_segmentos_no_worker(caminho, segundos_segmento, incluir_musica=False):
+    """Features de cada segmento (e da música inteira, se pedido) dentro de um worker do pool."""
+    segmentos = _extrator_worker.extrair_features_segmentos(caminho, segundos_segmento)
+    if incluir_musica:
+        return _extrator_worker.extrair_todas_features(caminho), segmentos
+    return segmentos
+
+
+def criar_pool_extracao(extrator, processos=None, aquecer=False):
+    """
+    Cria um ProcessPoolExecutor cujos workers têm uma cópia de `extrator`
+    (mesmos parâmetros e arquivo de cache). Envie tarefas com
+    pool.submit(extrair_no_worker, caminho). Com aquecer=True cada worker
+    já faz uma extração de teste ao iniciar.
+    """
+    caminho_cache = extrator.cache.caminho if extrator.cache is not None else None
+    return ProcessPoolExecutor(
+        max_workers=processos or os.cpu_count(),
+        initializer=_iniciar_worker,
+        initargs=(extrator.parametros(), extrator.passagem_unica, caminho_cache, aquecer,
+                  extrator.streaming, extrator.segundos_bloco)
+    )
+
+
+def extrair_em_paralelo(caminhos, extrator, processos=None, segundos_segmento=None,
+                        incluir_musica=False):
+    """
+    Extrai features de vários arquivos em um pool de processos.
+
+    Cada worker recria um ExtratorFeatures com os mesmos parâmetros e modo (e o
+    mesmo arquivo de cache) de `extrator`. Gera tuplas (caminho, features,
+    erro) na ordem em que terminam; erro é None em caso de sucesso e uma
+    string "Tipo: mensagem" quando o arquivo falha. Com segundos_segmento,
+    features é a matriz de segmentos, ou o par (vetor da música, segmentos)
+    com incluir_musica=True. Com processos=1
+    roda no próprio processo, sem o custo de criar o pool.
+    """
+    processos = processos or os.cpu_count()
+
+    if processos == 1:
+        for caminho in caminhos:
+            try:
+                if not segundos_segmento:
+                    features = extrator.extrair_todas_features(caminho)
+                else:
+                    features = extrator.extrair_features_segmentos(caminho, segundos_segmento)
+                    if incluir_musica:
+                        features = (extrator.extrair_todas_features(caminho), features)
+                yield caminho, features, None
+            except Exception as e:
+                yield caminho, None, f"{type(e).__name__}: {e}"
+        return
+
+    with criar_pool_extracao(extrator, processos) as executor:
+        if segundos_segmento:
+            futuros = {
+                executor.submit(extrair_segmentos_no_worker, c, segundos_segmento, incluir_musica): c
+                for c in caminhos
+            }
+        else:
+            futuros = {executor.submit(extrair_no_worker, c): c for c in caminhos}
+        for futuro in as_completed(futuros):
+            try:
+                yield futuros[futuro], futuro.result(), None
+            except Exception as e:
+                yield futuros[futuro], None, f"{type(e).__name__}: {e}"
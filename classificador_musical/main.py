@@ -1,10 +1,199 @@
 """Interface CLI do classificador."""
 
+import argparse
+import csv
+import json
+import os
+
 from classificador import ClassificadorMusical
 from downloader import Downloader
 
+EXTENSOES_AUDIO = ('.mp3', '.wav', '.flac', '.ogg', '.m4a')
+
+
+def listar_arquivos(entradas, lista=None):
+    """Expande pastas (recursivamente) e listas de arquivos em caminhos de áudio."""
+    caminhos = []
+    if lista:
+        with open(lista, encoding='utf-8') as f:
+            entradas = list(entradas) + [linha.strip() for linha in f if linha.strip()]
+
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, arquivos in os.walk(entrada):
+                for arquivo in sorted(arquivos):
+                    if arquivo.lower().endswith(EXTENSOES_AUDIO):
+                        caminhos.append(os.path.join(raiz, arquivo))
+        else:
+            caminhos.append(entrada)
+    return caminhos
+
+
+def inteiro_positivo(texto):
+    """Tipo do argparse para -k: inteiro >= 1."""
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"inteiro inválido: {texto!r}")
+    if valor < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1, recebido {valor}")
+    return valor
+
+
+def salvar_resultados(resultados, caminho_saida, formato):
+    """Escreve os resultados em JSONL (um objeto por linha) ou CSV."""
+    with open(caminho_saida, 'w', encoding='utf-8', newline='') as f:
+        if formato == 'jsonl':
+            for resultado in resultados:
+                f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+            return
+
+        escritor = csv.writer(f)
+        escritor.writerow(['caminho', 'genero', 'confianca', 'votos', 'erro'])
+        for r in resultados:
+            escritor.writerow([
+                r['caminho'],
+                r['genero'] or '',
+                f"{r['confianca']:.1f}" if r['genero'] else '',
+                json.dumps(r['votos'], ensure_ascii=False) if r['genero'] else '',
+                r.get('erro') or '',
+            ])
+
+
+def classificar_lote(args):
+    """Subcomando não interativo: classifica pastas/arquivos e salva o resultado."""
+    caminhos = listar_arquivos(args.entradas, args.lista)
+    if not caminhos:
+        print("Nenhum arquivo de áudio encontrado!")
+        return
+
+    formato = args.formato or ('csv' if args.saida.endswith('.csv') else 'jsonl')
+
+    clf = ClassificadorMusical(dpi=args.dpi, formato_grafico=args.formato_grafico,
+                               processos_graficos=args.processos_graficos,
+                               streaming=args.streaming, trecho=args.trecho,
+                               segmentos=args.segmentos)
+    print(f"Classificando {len(caminhos)} arquivos...")
+    resultados = clf.classificar_lote(
+        caminhos, k=args.k, processos=args.processos or None, plotar=args.plot
+    )
+    salvar_resultados(resultados, args.saida, formato)
+
+    falhas = sum(1 for r in resultados if r['genero'] is None)
+    print(f"✓ {len(resultados) - falhas} classificadas, {falhas} com erro")
+    print(f"✓ Resultados salvos em: {args.saida}")
+
+    # Os gráficos são gerados em segundo plano; espera os que faltam
+    for caminho, erro in clf.encerrar():
+        print(f"Erro ao gerar {caminho}: {erro}")
+
+
+def ajustar_transformacao(args):
+    """Subcomando: ajusta (ou remove) a transformação das features do banco."""
+    from banco_vetorial import BancoVetorial
+    from transformacao import acuracia_knn
+
+    banco = BancoVetorial()
+    if args.remover:
+        banco.remover_transformacao()
+        print("✓ Transformação removida; a busca volta a usar as features originais")
+        return
+
+    matriz, generos = banco.features_originais()
+    if len(matriz) == 0:
+        print("O banco está vazio: rode popular_banco.py primeiro")
+        return
+
+    antes = acuracia_knn(matriz, generos, args.k)
+    transformacao = banco.ajustar_transformacao(args.metodo, args.dimensao)
+    depois = acuracia_knn(transformacao.aplicar(matriz), generos, args.k)
+
+    print(f"✓ Transformação '{transformacao.metodo}' ajustada em {len(matriz)} músicas")
+    print(f"  Dimensão: {matriz.shape[1]} -> {transformacao.dimensao_saida}")
+    if transformacao.explicado is not None:
+        print(f"  Mantido: {transformacao.explicado:.1%}")
+    print(f"  Acurácia kNN (leave-one-out, k={args.k}): {antes:.1%} -> {depois:.1%}")
+    print(f"  Salva em: {banco.caminho_transformacao}")
+
+
+def adicionar_opcoes_audio(parser):
+    """Opções de decodificação comuns aos subcomandos."""
+    parser.add_argument('--streaming', action='store_true',
+                        help='Decodifica em blocos, com memória limitada por worker')
+    parser.add_argument('--trecho', type=float,
+                        help='Analisa só N segundos do meio de cada música (use o mesmo valor do banco)')
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Classificador de gêneros musicais')
+    subparsers = parser.add_subparsers(dest='comando')
+
+    parser_lote = subparsers.add_parser(
+        'classificar-lote', help='Classifica vários arquivos sem interação'
+    )
+    parser_lote.add_argument('entradas', nargs='*', help='Arquivos ou pastas de áudio')
+    parser_lote.add_argument('--lista', type=str, help='Arquivo texto com um caminho por linha')
+    parser_lote.add_argument('--saida', type=str, default='resultados.jsonl',
+                             help='Arquivo de saída (padrão: resultados.jsonl)')
+    parser_lote.add_argument('--formato', choices=['jsonl', 'csv'],
+                             help='Formato da saída (padrão: pela extensão de --saida)')
+    parser_lote.add_argument('-k', type=inteiro_positivo, default=5, help='Número de vizinhos (padrão: 5)')
+    parser_lote.add_argument('--processos', type=int, default=0,
+                             help='Processos de extração (padrão: 0 = todos os núcleos)')
+    parser_lote.add_argument('--plot', action='store_true', help='Gera o gráfico de cada música')
+    parser_lote.add_argument('--dpi', type=int, default=100, help='Resolução dos gráficos (padrão: 100)')
+    parser_lote.add_argument('--formato-grafico', choices=['png', 'svg', 'pdf', 'jpg'], default='png',
+                             help='Formato dos gráficos (padrão: png)')
+    parser_lote.add_argument('--processos-graficos', type=int, default=1,
+                             help='Processos que geram os gráficos (padrão: 1)')
+    adicionar_opcoes_audio(parser_lote)
+    parser_lote.add_argument('--segmentos', type=float,
+                             help='Classifica por janelas de N segundos (banco populado com --segmentos)')
+
+    parser_servir = subparsers.add_parser(
+        'servir', help='Mantém o classificador carregado e responde por HTTP/JSON'
+    )
+    parser_servir.add_argument('--host', type=str, default='127.0.0.1', help='Endereço (padrão: 127.0.0.1)')
+    parser_servir.add_argument('--porta', type=int, default=8766, help='Porta (padrão: 8766)')
+    parser_servir.add_argument('--processos', type=int, default=0,
+                               help='Processos de extração (padrão: 0 = todos os núcleos)')
+    parser_servir.add_argument('--intervalo-ms', type=float, default=10,
+                               help='Janela para juntar consultas numa busca kNN (padrão: 10 ms)')
+    parser_servir.add_argument('--sem-cache', action='store_true', help='Não usa o cache de features')
+    adicionar_opcoes_audio(parser_servir)
+
+    parser_ajustar = subparsers.add_parser(
+        'ajustar', help='Ajusta a padronização/projeção das features no banco'
+    )
+    parser_ajustar.add_argument('--metodo', choices=['zscore', 'pca', 'lda'], default='zscore',
+                                help='zscore, pca (branqueada) ou lda (padrão: zscore)')
+    parser_ajustar.add_argument('--dimensao', type=int,
+                                help='Dimensão final para pca/lda (padrão: todas)')
+    parser_ajustar.add_argument('-k', type=inteiro_positivo, default=5,
+                                help='k da avaliação leave-one-out (padrão: 5)')
+    parser_ajustar.add_argument('--remover', action='store_true',
+                                help='Remove a transformação e volta às features originais')
+
+    args = parser.parse_args()
+
+    if args.comando == 'ajustar':
+        ajustar_transformacao(args)
+        return
+
+    if args.comando == 'classificar-lote':
+        classificar_lote(args)
+        return
+
+    if args.comando == 'servir':
+        from servico import servir
+        servir(args.host, args.porta, args.processos or None, args.intervalo_ms,
+               usar_cache=not args.sem_cache, streaming=args.streaming, trecho=args.trecho)
+        return
+
+    menu_interativo()
+
+
+def menu_interativo():
     clf = ClassificadorMusical()
     downloader = Downloader()
 
@@ -38,10 +227,11 @@ def main():
             caminho = input("Caminho do arquivo: ").strip()
             k = input("Número de vizinhos (padrão 5): ").strip()
             k = int(k) if k else 5
+            plotar = input("Gerar gráfico? (s/N): ").strip().lower() == "s"
 
             if caminho:
                 try:
-                    clf.classificar_musica(caminho, k=k, mostrar_calculos=True)
+                    clf.classificar_musica(caminho, k=k, mostrar_calculos=True, plotar=plotar)
                 except Exception as e:
                     print(f"Erro: {e}")
             else:
@@ -57,6 +247,8 @@ def main():
             else:
                 print("Link é obrigatório!")
         elif opcao == "4":
+            for caminho, erro in clf.encerrar():
+                print(f"Erro ao gerar {caminho}: {erro}")
             print("\nAté logo!")
             break
 
@@ -1,45 +1,158 @@
 """Script para popular o banco vetorial com músicas de treino."""
+import argparse
 import os
+
 from classificador import ClassificadorMusical
 
-def popular_banco():
-    """Adiciona todas as músicas de treino ao banco."""
-    classificador = ClassificadorMusical()
-    base_path = "./musicas_teste"
-    
-    generos = {
-        'rock': 'rock',
-        'pop': 'pop',
-        'jazz': 'jazz',
-        'eletronica': 'eletronica',
-        'classica': 'classica'
-    }
-    
-    print("="*50)
-    print("POPULANDO BANCO VETORIAL")
-    print("="*50)
-    
-    total = 0
+BASE_PATH = "./musicas_teste"
+
+GENEROS = {
+    'rock': 'rock',
+    'pop': 'pop',
+    'jazz': 'jazz',
+    'eletronica': 'eletronica',
+    'classica': 'classica'
+}
+
+def listar_musicas(base_path=BASE_PATH, generos=GENEROS):
+    """Retorna a lista de (caminho, gênero) de todas as músicas de treino."""
+    musicas = []
     for pasta, genero in generos.items():
         caminho_pasta = os.path.join(base_path, pasta)
         if not os.path.exists(caminho_pasta):
             print(f"Pasta {caminho_pasta} não encontrada!")
             continue
-        
-        print(f"\n--- Gênero: {genero.upper()} ---")
+
         arquivos = [f for f in os.listdir(caminho_pasta) if f.endswith('.mp3')]
-        
         for arquivo in sorted(arquivos):
-            caminho = os.path.join(caminho_pasta, arquivo)
-            try:
-                classificador.adicionar_musica(caminho, genero)
-                total += 1
-            except Exception as e:
-                print(f"Erro ao adicionar {arquivo}: {e}")
-    
+            musicas.append((os.path.join(caminho_pasta, arquivo), genero))
+    return musicas
+
+
+def popular_banco(usar_cache=True, streaming=False, trecho=None, segmentos=None):
+    """Adiciona todas as músicas de treino ao banco."""
+    classificador = ClassificadorMusical(
+        usar_cache=usar_cache, streaming=streaming, trecho=trecho, segmentos=segmentos
+    )
+
+    print("="*50)
+    print("POPULANDO BANCO VETORIAL")
+    print("="*50)
+
+    total = 0
+    genero_atual = None
+    for caminho, genero in listar_musicas():
+        if genero != genero_atual:
+            print(f"\n--- Gênero: {genero.upper()} ---")
+            genero_atual = genero
+
+        try:
+            classificador.adicionar_musica(caminho, genero)
+            total += 1
+        except Exception as e:
+            print(f"Erro ao adicionar {os.path.basename(caminho)}: {e}")
+
     print(f"\n{'='*50}")
     print(f"Total de músicas adicionadas: {total}")
     print(f"{'='*50}")
 
+
+def popular_banco_paralelo(processos=None, tamanho_lote=64, duracao_max=210,
+                           usar_cache=True, streaming=False, trecho=None, segmentos=None):
+    """
+    Adiciona as músicas de treino extraindo as features em um pool de processos.
+
+    Os workers apenas decodificam e extraem features; o processo principal é
+    o único que escreve no BancoVetorial, em lotes de `tamanho_lote` músicas.
+    Com `segmentos` (segundos), grava também os vetores de cada janela.
+    Falhas em arquivos individuais são reportadas no final sem interromper a
+    execução. Retorna (total_adicionadas, lista de (caminho, erro)).
+    """
+    from banco_vetorial import BancoVetorial
+    from cache_features import CacheFeatures
+    from extrator_features import ExtratorFeatures, extrair_em_paralelo
+
+    banco = BancoVetorial()
+    extrator = ExtratorFeatures(
+        duracao_max=duracao_max,
+        cache=CacheFeatures() if usar_cache else None,
+        streaming=streaming,
+        trecho=trecho
+    )
+    musicas = listar_musicas()
+    generos = dict(musicas)
+    processos = processos or os.cpu_count()
+
+    print("="*50)
+    print(f"POPULANDO BANCO VETORIAL ({processos} processos)")
+    print("="*50)
+
+    total = 0
+    falhas = []
+    lote = []
+
+    def gravar_lote():
+        nonlocal total
+        if not lote:
+            return
+        nomes = [os.path.basename(caminho) for caminho, _, _ in lote]
+        generos_lote = [genero for _, genero, _ in lote]
+        if segmentos:
+            vetores = [features[0] for _, _, features in lote]
+            banco.adicionar_segmentos_lote(nomes, generos_lote, [features[1] for _, _, features in lote])
+        else:
+            vetores = [features for _, _, features in lote]
+        total += banco.adicionar_lote(nomes, generos_lote, vetores, tamanho_lote)
+        lote.clear()
+
+    resultados = extrair_em_paralelo(
+        list(generos), extrator, processos, segundos_segmento=segmentos, incluir_musica=True
+    )
+    for i, (caminho, features, erro) in enumerate(resultados, 1):
+        genero = generos[caminho]
+        if erro is None:
+            lote.append((caminho, genero, features))
+            print(f"[{i}/{len(musicas)}] ✓ {os.path.basename(caminho)} ({genero})")
+        else:
+            falhas.append((caminho, erro))
+            print(f"[{i}/{len(musicas)}] Erro em {os.path.basename(caminho)}: {erro}")
+
+        if len(lote) >= tamanho_lote:
+            gravar_lote()
+
+    gravar_lote()
+
+    print(f"\n{'='*50}")
+    print(f"Total de músicas adicionadas: {total}")
+    if falhas:
+        print(f"Falhas: {len(falhas)}")
+        for caminho, erro in falhas:
+            print(f"  - {caminho}: {erro}")
+    print(f"{'='*50}")
+
+    return total, falhas
+
+
 if __name__ == "__main__":
-    popular_banco()
+    parser = argparse.ArgumentParser(description='Popula o banco vetorial com as músicas de treino')
+    parser.add_argument('--processos', type=int, default=1,
+                        help='Processos de extração (padrão: 1 = serial; 0 = todos os núcleos)')
+    parser.add_argument('--lote', type=int, default=64,
+                        help='Músicas por escrita no banco no modo paralelo (padrão: 64)')
+    parser.add_argument('--sem-cache', action='store_true',
+                        help='Ignora o cache de features e recalcula tudo')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Decodifica em blocos, com memória limitada por worker')
+    parser.add_argument('--trecho', type=float,
+                        help='Analisa só N segundos do meio de cada música')
+    parser.add_argument('--segmentos', type=float,
+                        help='Guarda também um vetor por janela de N segundos (ex.: 10)')
+    args = parser.parse_args()
+
+    if args.processos == 1:
+        popular_banco(usar_cache=not args.sem_cache, streaming=args.streaming, trecho=args.trecho,
+                      segmentos=args.segmentos)
+    else:
+        popular_banco_paralelo(processos=args.processos or None, tamanho_lote=args.lote,
+                               usar_cache=not args.sem_cache, streaming=args.streaming,
+                               trecho=args.trecho, segmentos=args.segmentos)
@@ -0,0 +1,202 @@
+"""
+Serviço de classificação de gêneros: mantém o banco, o cache kNN e os
+workers do librosa carregados e responde por HTTP/JSON.
+
+    POST /classificar  {"caminho": "musica.mp3", "k": 5}
+    GET  /saude
+"""
+import asyncio
+import json
+import os
+import time
+from http import HTTPStatus
+
+from classificador import ClassificadorMusical
+from extrator_features import criar_pool_extracao, extrair_no_worker
+
+PORTA_PADRAO = 8766
+
+
+class ServicoClassificacao:
+    """
+    Front end assíncrono (asyncio) com três etapas por requisição:
+
+    1. a extração de features roda num pool de processos já aquecido
+       (numba compilado, um ExtratorFeatures por worker);
+    2. o vetor entra numa fila; a cada `intervalo_ms` todas as consultas
+       acumuladas viram uma única busca kNN em lote no BancoVetorial;
+    3. a votação é feita e a resposta volta em JSON, sem gráficos.
+    """
+
+    def __init__(self, processos=None, intervalo_ms=10, usar_cache=True, streaming=False,
+                 trecho=None):
+        self.classificador = ClassificadorMusical(
+            usar_cache=usar_cache, streaming=streaming, trecho=trecho
+        )
+        self.processos = processos or os.cpu_count()
+        self.intervalo = intervalo_ms / 1000
+        self.pool = None
+        self.fila = None
+        self._tarefa_lotes = None
+        self.atendidas = 0
+        self.lotes = 0
+
+    async def iniciar(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        loop = asyncio.get_running_loop()
+        print(f">> Iniciando {self.processos} workers de extração...")
+        self.pool = criar_pool_extracao(self.classificador.extrator, self.processos, aquecer=True)
+        # Força a criação (e o aquecimento) dos workers agora, não na 1ª requisição
+        await asyncio.gather(*[
+            loop.run_in_executor(self.pool, os.getpid) for _ in range(self.processos)
+        ])
+
+        # Carrega a matriz do banco (snapshot ou ChromaDB) antes de abrir a porta
+        total = await loop.run_in_executor(None, self.classificador.banco.total)
+        await loop.run_in_executor(None, lambda: self.classificador.banco.matriz)
+
+        self.fila = asyncio.Queue()
+        self._tarefa_lotes = asyncio.create_task(self._buscar_em_lotes())
+        servidor = await asyncio.start_server(self._atender, host, porta)
+        print(f">> Serviço ouvindo em http://{host}:{porta} ({total} músicas no banco)")
+        return servidor
+
+    def encerrar(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def classificar(self, caminho, k=5):
+        """Extrai no pool, espera a busca do próximo lote e vota."""
+        if k <= 0:
+            raise ValueError(f"k deve ser positivo, recebido {k}")
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"Arquivo não encontrado: {caminho}")
+
+        inicio = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        features = await loop.run_in_executor(self.pool, extrair_no_worker, caminho)
+
+        futuro = loop.create_future()
+        await self.fila.put((features, k, futuro))
+        vizinhos = await futuro
+        if not vizinhos:
+            raise ValueError("O banco está vazio: rode popular_banco.py primeiro")
+
+        votos, genero_final, confianca = self.classificador._votar(vizinhos, k)
+        self.atendidas += 1
+        return {
+            "caminho": caminho,
+            "nome_musica": os.path.basename(caminho),
+            "genero": genero_final,
+            "confianca": confianca,
+            "votos": votos,
+            "vizinhos": vizinhos,
+            "k": k,
+            "tempo_ms": (time.perf_counter() - inicio) * 1000,
+        }
+
+    async def _buscar_em_lotes(self):
+        loop = asyncio.get_running_loop()
+        banco = self.classificador.banco
+        while True:
+            pedidos = [await self.fila.get()]
+            await asyncio.sleep(self.intervalo)
+            while not self.fila.empty():
+                pedidos.append(self.fila.get_nowait())
+
+            k_max = max(k for _, k, _ in pedidos)
+            try:
+                # Fora do loop de eventos para não travar o front end
+                resultados = await loop.run_in_executor(
+                    None, banco.buscar_manual_lote, [f for f, _, _ in pedidos], k_max
+                )
+            except Exception as e:
+                for _, _, futuro in pedidos:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            self.lotes += 1
+            for (_, k, futuro), vizinhos in zip(pedidos, resultados):
+                if not futuro.done():
+                    futuro.set_result(vizinhos[:k])
+
+    async def _atender(self, leitor, escritor):
+        try:
+            metodo, rota, corpo = await _ler_requisicao(leitor)
+            status, resposta = await self._rotear(metodo, rota, corpo)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, resposta = 400, {"erro": f"Requisição inválida: {e}"}
+
+        dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        escritor.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1') + dados
+        )
+        try:
+            await escritor.drain()
+        finally:
+            escritor.close()
+
+    async def _rotear(self, metodo, rota, corpo):
+        if metodo == 'GET' and rota == '/saude':
+            # total() é uma contagem síncrona no ChromaDB: fora do event loop
+            loop = asyncio.get_running_loop()
+            musicas = await loop.run_in_executor(None, self.classificador.banco.total)
+            return 200, {
+                "status": "ok",
+                "musicas": musicas,
+                "atendidas": self.atendidas,
+                "lotes_knn": self.lotes,
+            }
+        if metodo == 'POST' and rota == '/classificar':
+            pedido = json.loads(corpo or b'{}')
+            if not isinstance(pedido, dict) or not pedido.get('caminho'):
+                return 400, {"erro": "Informe 'caminho'"}
+            k = pedido.get('k', 5)
+            if isinstance(k, str) and k.strip().isdigit():
+                k = int(k)
+            if isinstance(k, bool) or not isinstance(k, int) or k <= 0:
+                return 400, {"erro": f"'k' deve ser um inteiro positivo, recebido {k!r}"}
+            try:
+                return 200, await self.classificar(pedido['caminho'], k)
+            except FileNotFoundError as e:
+                return 404, {"erro": str(e)}
+            except Exception as e:
+                # Mesmo formato de erro de extrair_em_paralelo
+                return 422, {"erro": f"{type(e).__name__}: {e}"}
+        return 404, {"erro": f"Rota desconhecida: {metodo} {rota}"}
+
+
+async def _ler_requisicao(leitor):
+    """Lê linha de requisição, cabeçalhos e corpo (Content-Length) de um HTTP/1.1."""
+    linha = (await leitor.readline()).decode('latin-1')
+    metodo, rota, _ = linha.split(' ', 2)
+    cabecalhos = {}
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b'\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    corpo = await leitor.readexactly(int(cabecalhos.get('content-length', 0)))
+    return metodo, rota, corpo
+
+
+def servir(host='127.0.0.1', porta=PORTA_PADRAO, processos=None, intervalo_ms=10,
+           usar_cache=True, streaming=False, trecho=None):
+    """Roda o serviço até Ctrl+C."""
+    servico = ServicoClassificacao(processos, intervalo_ms, usar_cache, streaming, trecho)
+
+    async def principal():
+        servidor = await servico.iniciar(host, porta)
+        async with servidor:
+            await servidor.serve_forever()
+
+    try:
+        asyncio.run(principal())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.encerrar()
@@ -0,0 +1,185 @@
+"""Transformação aprendida das features (padronização, PCA ou LDA) para o kNN."""
+import hashlib
+import os
+
+import numpy as np
+
+METODOS = ('zscore', 'pca', 'lda')
+
+# Somado à diagonal das matrizes de covariância para evitar singularidade
+REGULARIZACAO = 1e-6
+
+
+class TransformacaoFeatures:
+    """
+    Projeção linear y = ((x - media) / escala) @ projecao ajustada no banco.
+
+    As features do extrator têm escalas muito diferentes (médias de MFCC
+    na casa das dezenas, chroma entre 0 e 1, tempo/200), então os MFCCs
+    dominam a distância euclidiana. Métodos:
+
+    - 'zscore': só padroniza cada feature (média 0, desvio 1);
+    - 'pca': padroniza, projeta nas `dimensao` componentes principais e
+      branqueia (variância 1 em cada componente);
+    - 'lda': padroniza e projeta nas direções que melhor separam os
+      gêneros (no máximo n_generos - 1), com a covariância dentro das
+      classes virando identidade.
+
+    Com `dimensao` menor que 29 a busca faz menos contas por distância.
+    """
+
+    def __init__(self, metodo='zscore', dimensao=None):
+        if metodo not in METODOS:
+            raise ValueError(f"Método desconhecido: {metodo} (use {', '.join(METODOS)})")
+        self.metodo = metodo
+        self.dimensao = dimensao
+        self.media = None
+        self.escala = None
+        self.projecao = None
+        # Fração da variância (pca) ou da separação entre gêneros (lda) mantida
+        self.explicado = None
+
+    @property
+    def ajustada(self):
+        return self.media is not None
+
+    @property
+    def dimensao_saida(self):
+        return len(self.media) if self.projecao is None else self.projecao.shape[1]
+
+    def ajustar(self, matriz, generos=None):
+        """Ajusta a transformação em `matriz` (n x d); 'lda' precisa dos gêneros de cada linha."""
+        x = np.asarray(matriz, dtype=np.float64)
+        if len(x) < 2:
+            raise ValueError("São necessárias pelo menos 2 músicas para ajustar a transformação")
+
+        self.media = x.mean(axis=0)
+        desvio = x.std(axis=0)
+        self.escala = np.where(desvio > 0, desvio, 1.0)
+        z = (x - self.media) / self.escala
+        self.projecao = None
+        self.explicado = None
+
+        if self.metodo == 'pca':
+            self._ajustar_pca(z)
+        elif self.metodo == 'lda':
+            if generos is None:
+                raise ValueError("O método 'lda' precisa dos gêneros")
+            self._ajustar_lda(z, np.asarray(generos))
+        return self
+
+    def _ajustar_pca(self, z):
+        dimensao = min(self.dimensao or z.shape[1], z.shape[1])
+        # SVD dos dados centrados: componentes em vt, variâncias em s² / (n - 1)
+        _, s, vt = np.linalg.svd(z, full_matrices=False)
+        variancias = s**2 / (len(z) - 1)
+        dimensao = min(dimensao, len(variancias))
+        self.projecao = vt[:dimensao].T / np.sqrt(variancias[:dimensao] + REGULARIZACAO)
+        self.explicado = float(variancias[:dimensao].sum() / variancias.sum())
+
+    def _ajustar_lda(self, z, generos):
+        classes = np.unique(generos)
+        if len(classes) < 2:
+            raise ValueError("O método 'lda' precisa de pelo menos 2 gêneros")
+        d = z.shape[1]
+        dentro = np.zeros((d, d))
+        entre = np.zeros((d, d))
+        for classe in classes:
+            grupo = z[generos == classe]
+            centro = grupo.mean(axis=0)
+            dentro += (grupo - centro).T @ (grupo - centro)
+            entre += len(grupo) * np.outer(centro, centro)  # z já tem média global 0
+        dentro /= len(z)
+        entre /= len(z)
+
+        # Problema generalizado entre·v = λ·dentro·v via Cholesky de `dentro`
+        fator = np.linalg.cholesky(dentro + REGULARIZACAO * np.eye(d))
+        inverso = np.linalg.inv(fator)
+        autovalores, autovetores = np.linalg.eigh(inverso @ entre @ inverso.T)
+        ordem = np.argsort(autovalores)[::-1]
+        autovalores, autovetores = autovalores[ordem], autovetores[:, ordem]
+
+        dimensao = min(self.dimensao or len(classes) - 1, len(classes) - 1, d)
+        # inverso.T @ v dá projecao.T @ dentro @ projecao = identidade
+        self.projecao = inverso.T @ autovetores[:, :dimensao]
+        autovalores = np.clip(autovalores, 0, None)
+        self.explicado = float(autovalores[:dimensao].sum() / max(autovalores.sum(), 1e-12))
+
+    def aplicar(self, matriz):
+        """Transforma um vetor (d,) ou uma matriz (n x d); devolve float64."""
+        if not self.ajustada:
+            raise ValueError("Transformação não ajustada")
+        x = (np.asarray(matriz, dtype=np.float64) - self.media) / self.escala
+        if self.projecao is not None:
+            x = x @ self.projecao
+        return x
+
+    @property
+    def identificador(self):
+        """Hash dos parâmetros ajustados; muda a cada novo ajuste (invalida o snapshot)."""
+        h = hashlib.sha1(self.metodo.encode('utf-8'))
+        for parte in (self.media, self.escala, self.projecao):
+            if parte is not None:
+                h.update(np.ascontiguousarray(parte).tobytes())
+        return h.hexdigest()[:16]
+
+    def salvar(self, caminho):
+        """Grava em .npz (temporário + os.replace, como o snapshot)."""
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        dados = {
+            'metodo': np.array(self.metodo),
+            'media': self.media,
+            'escala': self.escala,
+            'explicado': np.array(np.nan if self.explicado is None else self.explicado),
+        }
+        if self.projecao is not None:
+            dados['projecao'] = self.projecao
+        temporario = caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            np.savez(f, **dados)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê uma transformação salva; retorna None se o arquivo não existe."""
+        if not os.path.exists(caminho):
+            return None
+        with np.load(caminho) as dados:
+            transformacao = cls(str(dados['metodo']))
+            transformacao.media = dados['media']
+            transformacao.escala = dados['escala']
+            if 'projecao' in dados:
+                transformacao.projecao = dados['projecao']
+                transformacao.dimensao = transformacao.projecao.shape[1]
+            explicado = float(dados['explicado'])
+            transformacao.explicado = None if np.isnan(explicado) else explicado
+        return transformacao
+
+
+def acuracia_knn(matriz, generos, k=5, amostra=2000, semente=0):
+    """
+    Acurácia leave-one-out do kNN (votação por maioria) em até `amostra` músicas.
+
+    Serve para comparar o espaço original com o transformado antes de
+    adotar uma transformação.
+    """
+    x = np.asarray(matriz, dtype=np.float64)
+    generos = np.asarray(generos)
+    indices = np.arange(len(x))
+    if len(x) > amostra:
+        indices = np.random.default_rng(semente).choice(len(x), amostra, replace=False)
+
+    normas = np.einsum('ij,ij->i', x, x)
+    k = min(k, len(x) - 1)
+    acertos = 0
+    for inicio in range(0, len(indices), 256):
+        bloco = indices[inicio:inicio + 256]
+        distancias = normas[np.newaxis, :] - 2 * (x[bloco] @ x.T)
+        distancias[np.arange(len(bloco)), bloco] = np.inf  # exclui a própria música
+        vizinhos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        for linha, consulta in enumerate(bloco):
+            valores, contagens = np.unique(generos[vizinhos[linha]], return_counts=True)
+            acertos += valores[np.argmax(contagens)] == generos[consulta]
+    return acertos / len(indices)
@@ -1,5 +1,13 @@
 """Visualização dos resultados da classificação musical."""
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Sem janela: os gráficos só são salvos em arquivo (funciona em servidores sem display)
+matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Rectangle
@@ -31,22 +39,22 @@ class Visualizador:
         )
 
         # 1. Gráfico de distâncias dos vizinhos
-        ax1 = plt.subplot(2, 2, 1)
+        ax1 = fig.add_subplot(2, 2, 1)
         self._plotar_distancias(ax1, vizinhos)
 
         # 2. Gráfico de votação por gênero
-        ax2 = plt.subplot(2, 2, 2)
+        ax2 = fig.add_subplot(2, 2, 2)
         self._plotar_votacao(ax2, votos, genero_final)
 
         # 3. Distribuição dos vizinhos por gênero
-        ax3 = plt.subplot(2, 2, 3)
+        ax3 = fig.add_subplot(2, 2, 3)
         self._plotar_distribuicao_vizinhos(ax3, vizinhos)
 
         # 4. Resultado final
-        ax4 = plt.subplot(2, 2, 4)
+        ax4 = fig.add_subplot(2, 2, 4)
         self._plotar_resultado_final(ax4, genero_final, confianca, k)
 
-        plt.tight_layout()
+        fig.tight_layout()
         return fig
 
     def _plotar_distancias(self, ax, vizinhos):
@@ -240,11 +248,97 @@ class Visualizador:
 
         return cores_mapa
 
-    def salvar_grafico(self, fig, caminho_saida="resultado_classificacao.png"):
-        """Salva o gráfico em arquivo."""
-        fig.savefig(caminho_saida, dpi=300, bbox_inches="tight")
+    def salvar_grafico(self, fig, caminho_saida="resultado_classificacao.png", dpi=100,
+                       formato=None):
+        """Salva o gráfico em arquivo e fecha a figura (libera a memória)."""
+        try:
+            fig.savefig(caminho_saida, dpi=dpi, format=formato, bbox_inches="tight")
+        finally:
+            plt.close(fig)
         print(f"✓ Gráfico salvo em: {caminho_saida}")
 
     def mostrar_grafico(self, fig):
-        """Exibe o gráfico na tela."""
+        """Exibe o gráfico na tela (sem efeito com o backend Agg)."""
         plt.show()
+        plt.close(fig)
+
+
+# Visualizador de cada processo do pool de gráficos (criado uma vez por worker)
+_visualizador_worker = None
+
+
+def _iniciar_worker():
+    global _visualizador_worker
+    _visualizador_worker = Visualizador()
+
+
+def renderizar_no_worker(dados, caminho_saida, dpi, formato):
+    """Monta e salva o gráfico de um resultado dentro de um worker do pool."""
+    fig = _visualizador_worker.plotar_resultados(**dados)
+    _visualizador_worker.salvar_grafico(fig, caminho_saida, dpi=dpi, formato=formato)
+    return caminho_saida
+
+
+class RenderizadorGraficos:
+    """
+    Gera os gráficos da classificação em segundo plano.
+
+    enviar() só agenda o gráfico num pool de processos e devolve o caminho
+    do arquivo, então a classificação não espera o matplotlib. O pool é
+    criado no primeiro envio; aguardar() espera os gráficos pendentes e
+    devolve os erros como (caminho, "Tipo: mensagem").
+    """
+
+    def __init__(self, processos=1, dpi=100, formato="png", pasta=""):
+        self.processos = processos
+        self.dpi = dpi
+        self.formato = formato
+        self.pasta = pasta
+        self._pool = None
+        self._pendentes = []
+
+    def caminho_grafico(self, nome_musica):
+        nome_arquivo = os.path.splitext(nome_musica)[0]
+        return os.path.join(self.pasta, f"classificacao_{nome_arquivo}.{self.formato}")
+
+    def enviar(self, nome_musica, vizinhos, votos, genero_final, confianca, k):
+        """Agenda o gráfico de um resultado e retorna o caminho onde será salvo."""
+        if self._pool is None:
+            if self.pasta:
+                os.makedirs(self.pasta, exist_ok=True)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processos, initializer=_iniciar_worker
+            )
+        dados = {
+            "nome_musica": nome_musica,
+            "vizinhos": vizinhos,
+            "votos": votos,
+            "genero_final": genero_final,
+            "confianca": confianca,
+            "k": k,
+        }
+        caminho_saida = self.caminho_grafico(nome_musica)
+        futuro = self._pool.submit(
+            renderizar_no_worker, dados, caminho_saida, self.dpi, self.formato
+        )
+        self._pendentes.append((caminho_saida, futuro))
+        return caminho_saida
+
+    def aguardar(self):
+        """Espera os gráficos agendados; retorna a lista de (caminho, erro) dos que falharam."""
+        erros = []
+        for caminho_saida, futuro in self._pendentes:
+            try:
+                futuro.result()
+            except Exception as e:
+                erros.append((caminho_saida, f"{type(e).__name__}: {e}"))
+        self._pendentes = []
+        return erros
+
+    def encerrar(self):
+        """Espera os gráficos pendentes e fecha o pool."""
+        erros = self.aguardar()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return erros
@@ -0,0 +1,104 @@
+"""Benchmark do tempo de inicialização do main.py (python -X importtime)."""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Comandos que não devem carregar nada pesado
+COMANDOS = {
+    'ajuda': ['--help'],
+    'demo': ['demo'],
+    'cliente': ['--servidor', 'http://127.0.0.1:9', 'buscar', 'nao_existe.jpg'],
+}
+
+# Módulos que só podem ser importados quando o comando precisa deles
+PROIBIDOS = ('torch', 'torchvision', 'chromadb', 'faiss', 'matplotlib', 'seaborn', 'scipy')
+
+# Tempo máximo de imports (mediana, ms) aceito para cada comando
+ORCAMENTO_MS = 250
+
+
+def ler_importtime(saida_erro):
+    """Converte as linhas de -X importtime em {módulo: (próprio_us, acumulado_us, nível)}."""
+    modulos = {}
+    for linha in saida_erro.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        nivel = (len(nome) - len(nome.lstrip())) // 2
+        modulos[nome.strip()] = (int(proprio), int(acumulado), nivel)
+    return modulos
+
+
+def medir(argumentos, repeticoes):
+    """Roda o comando `repeticoes` vezes; retorna tempos (ms) e o último perfil de imports."""
+    totais, paredes = [], []
+    modulos = {}
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, "-X", "importtime", MAIN, *argumentos],
+            capture_output=True, text=True, cwd=os.path.dirname(MAIN)
+        )
+        paredes.append((time.perf_counter() - inicio) * 1000)
+        modulos = ler_importtime(processo.stderr)
+        # Os módulos de nível 1 (sem indentação) somam todo o tempo de import
+        totais.append(sum(acumulado for _, acumulado, nivel in modulos.values() if nivel == 1) / 1000)
+    return statistics.median(totais), statistics.median(paredes), modulos
+
+
+def benchmark(comandos, repeticoes, orcamento_ms):
+    relatorio = []
+    for nome in comandos:
+        imports_ms, parede_ms, modulos = medir(COMANDOS[nome], repeticoes)
+        proibidos = sorted(m for m in modulos if m.split('.')[0] in PROIBIDOS and '.' not in m)
+        mais_lentos = sorted(modulos.items(), key=lambda item: -item[1][0])[:5]
+        relatorio.append({
+            'comando': nome,
+            'argumentos': COMANDOS[nome],
+            'imports_ms': imports_ms,
+            'parede_ms': parede_ms,
+            'orcamento_ms': orcamento_ms,
+            'modulos': len(modulos),
+            'proibidos': proibidos,
+            'mais_lentos': [(m, proprio / 1000) for m, (proprio, _, _) in mais_lentos],
+            'aprovado': imports_ms <= orcamento_ms and not proibidos,
+        })
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da inicialização do main.py")
+    parser.add_argument("--repeticoes", type=int, default=5,
+                        help="Execuções por comando; usa a mediana (padrão: 5)")
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_MS,
+                        help=f"Tempo máximo de imports por comando (padrão: {ORCAMENTO_MS} ms)")
+    parser.add_argument("--comandos", nargs="+", choices=list(COMANDOS), default=list(COMANDOS))
+    parser.add_argument("--json", type=str, help="Salva o relatório neste arquivo")
+    args = parser.parse_args()
+
+    relatorio = benchmark(args.comandos, args.repeticoes, args.orcamento_ms)
+
+    print(f"{'Comando':<10} {'Imports (ms)':>13} {'Total (ms)':>11} {'Módulos':>8}  Resultado")
+    for r in relatorio:
+        resultado = "OK" if r['aprovado'] else "ACIMA DO ORÇAMENTO"
+        if r['proibidos']:
+            resultado = f"IMPORTOU {', '.join(r['proibidos'])}"
+        print(f"{r['comando']:<10} {r['imports_ms']:>13.1f} {r['parede_ms']:>11.1f} {r['modulos']:>8}  {resultado}")
+        print("           mais lentos: " + ", ".join(f"{m} {ms:.1f}ms" for m, ms in r['mais_lentos']))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    # Código de saída != 0 para poder usar como verificação automática
+    sys.exit(0 if all(r['aprovado'] for r in relatorio) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
 import argparse
-import numpy as np
-from src.comparador import ComparadorDeImagens
-from src.utils import SimilarityCalculator
+
+# Os módulos pesados (numpy, torch, chromadb, faiss, matplotlib) são
+# importados dentro dos comandos que os usam: `--help` e o encaminhamento
+# para o servidor não pagam por eles. Ver benchmark_inicializacao.py.
 
 
 def main():
     parser = argparse.ArgumentParser(description='Sistema de Comparação de Imagens')
     parser.add_argument('--banco', choices=['chroma', 'faiss'], default='chroma',
                         help='Escolha o banco de dados vetorial (padrão: chroma)')
+    parser.add_argument('--indice', type=str,
+                        help='Tipo de índice FAISS: flat, hnsw, ivf-flat ou ivf-pq, com parâmetros '
+                             'opcionais (ex: ivf-pq:nlist=4096,m=32,nbits=8). Padrão: o já salvo, ou flat')
+    parser.add_argument('--nprobe', type=int, help='Listas visitadas por busca nos índices IVF')
+    parser.add_argument('--ef-search', type=int, help='Tamanho da fila de busca no índice HNSW')
+    parser.add_argument('--modelo', choices=['fp32', 'jit', 'int8'], default='fp32',
+                        help='Inferência da ResNet50: fp32 (padrão), jit (TorchScript) ou int8 (quantizado)')
+    parser.add_argument('--calibracao', type=str,
+                        help='Pasta de imagens para calibrar o modelo int8 na primeira execução')
+    parser.add_argument('--servidor', type=str,
+                        help='Envia indexar/buscar/comparar a um servidor já iniciado (ex: http://127.0.0.1:8765)')
     
     subparsers = parser.add_subparsers(dest='comando', help='Comandos disponíveis')
     
@@ -15,10 +27,19 @@ def main():
     parser_indexar = subparsers.add_parser('indexar', help='Indexar imagens no banco')
     parser_indexar.add_argument('--imagem', type=str, help='Caminho para uma imagem')
     parser_indexar.add_argument('--pasta', type=str, help='Caminho para uma pasta com imagens')
+    parser_indexar.add_argument('--incremental', action='store_true',
+                                help='Indexa só imagens novas/alteradas e remove as apagadas (usa um manifesto)')
+    parser_indexar.add_argument('--recursivo', action='store_true', help='Inclui as subpastas de --pasta')
+    parser_indexar.add_argument('--batch', type=int, default=32, help='Imagens por lote de inferência (padrão: 32)')
+    parser_indexar.add_argument('--lote', type=int, default=256, help='Vetores por escrita no banco (padrão: 256)')
+    parser_indexar.add_argument('--threads', type=int,
+                                help='Threads de leitura/decodificação (padrão: núcleos, até 8)')
     
     # Comando: buscar
     parser_buscar = subparsers.add_parser('buscar', help='Buscar imagens similares')
-    parser_buscar.add_argument('imagem', type=str, help='Caminho da imagem de consulta')
+    parser_buscar.add_argument('imagem', type=str, help='Caminho da imagem de consulta (pasta, com --lote)')
+    parser_buscar.add_argument('--lote', action='store_true',
+                               help='Usa todas as imagens da pasta informada como consultas, numa busca em lote')
     parser_buscar.add_argument('--top', type=int, default=3, help='Quantidade de resultados (padrão: 3)')
     parser_buscar.add_argument('--plot', action='store_true', help='Mostrar gráficos dos resultados')
     parser_buscar.add_argument('--salvar', type=str, help='Salvar gráfico em arquivo (ex: busca.png)')
@@ -34,6 +55,45 @@ def main():
     # Comando: demo
     parser_demo = subparsers.add_parser('demo', help='Executar demonstração com vetores simples')
     
+    # Comando: paridade
+    parser_paridade = subparsers.add_parser('paridade', help='Comparar os vetores de --modelo com os do fp32')
+    parser_paridade.add_argument('--pasta', type=str, required=True, help='Pasta de imagens de teste')
+    
+    # Comando: recall
+    parser_recall = subparsers.add_parser('recall', help='Medir recall@k do índice --indice contra a busca exata')
+    parser_recall.add_argument('--vetores', type=str, help='Arquivo .npy com os vetores (N x 2048)')
+    parser_recall.add_argument('--pasta', type=str, help='Pasta de imagens para gerar os vetores')
+    parser_recall.add_argument('--k', type=int, default=10, help='Vizinhos considerados (padrão: 10)')
+    parser_recall.add_argument('--consultas', type=int, default=1000, help='Consultas da amostra (padrão: 1000)')
+    
+    # Comando: bancos
+    parser_bancos = subparsers.add_parser('bancos', help='Comparar ChromaDB e FAISS (inserção, latência, memória, disco, recall)')
+    parser_bancos.add_argument('--vetores', type=str, help='Arquivo .npy com os vetores (N x 2048); sem ele, usa vetores sintéticos')
+    parser_bancos.add_argument('--n', type=int, default=10000, help='Quantidade de vetores sintéticos (padrão: 10000)')
+    parser_bancos.add_argument('--tops', type=int, nargs='+', default=[1, 10, 100],
+                               help='Valores de top_k medidos (padrão: 1 10 100)')
+    parser_bancos.add_argument('--consultas', type=int, default=200, help='Consultas por top_k (padrão: 200)')
+    parser_bancos.add_argument('--lote', type=int, default=1000, help='Vetores por chamada a adicionar_lote (padrão: 1000)')
+    parser_bancos.add_argument('--bancos', nargs='+', choices=['chroma', 'faiss'], default=['chroma', 'faiss'])
+    parser_bancos.add_argument('--json', type=str, help='Salva o relatório neste arquivo')
+    
+    # Comando: duplicados
+    parser_duplicados = subparsers.add_parser('duplicados', help='Agrupar imagens quase idênticas já indexadas')
+    parser_duplicados.add_argument('--limiar', type=float, default=0.95,
+                                   help='Similaridade cosseno mínima para um par (padrão: 0.95)')
+    parser_duplicados.add_argument('--saida', type=str, default='duplicados.jsonl',
+                                   help='Arquivo com um grupo por linha (padrão: duplicados.jsonl)')
+    parser_duplicados.add_argument('--bloco', type=int, default=2048,
+                                   help='Vetores por bloco da multiplicação (limita a memória; padrão: 2048)')
+    
+    # Comando: servir
+    parser_servir = subparsers.add_parser('servir', help='Manter modelo e índice carregados e atender consultas por HTTP')
+    parser_servir.add_argument('--host', type=str, default='127.0.0.1', help='Endereço (padrão: 127.0.0.1)')
+    parser_servir.add_argument('--porta', type=int, default=8765, help='Porta (padrão: 8765)')
+    parser_servir.add_argument('--espera-ms', type=float, default=5.0,
+                               help='Espera máxima para juntar consultas num lote (padrão: 5 ms)')
+    parser_servir.add_argument('--lote-max', type=int, default=64, help='Consultas por lote (padrão: 64)')
+    
     args = parser.parse_args()
     
     if args.comando is None:
@@ -42,6 +102,9 @@ def main():
     
     # Demonstração matemática
     if args.comando == 'demo':
+        import numpy as np
+        from src.utils import SimilarityCalculator
+
         print("--- TESTE DE CÁLCULO MANUAL (Exemplo Simples) ---")
         v_teste_a = np.array([1, 0, 1])
         v_teste_b = np.array([0, 1, 1])
@@ -50,18 +113,57 @@ def main():
         SimilarityCalculator.calcular_similaridade_cosseno(v_teste_a, v_teste_b)
         return
     
+    if args.comando == 'recall':
+        executar_recall(args)
+        return
+    
+    if args.comando == 'paridade':
+        executar_paridade(args)
+        return
+    
+    if args.comando == 'bancos':
+        executar_bancos(args)
+        return
+    
+    if args.comando == 'duplicados':
+        executar_duplicados(args)
+        return
+    
+    if args.servidor and args.comando in ('indexar', 'buscar', 'comparar'):
+        executar_no_servidor(args)
+        return
+    
     # Inicializar sistema
-    sistema = ComparadorDeImagens(usar_banco=args.banco)
+    from src.comparador import ComparadorDeImagens
+    sistema = ComparadorDeImagens(
+        usar_banco=args.banco, indice=args.indice,
+        nprobe=args.nprobe, ef_search=args.ef_search,
+        modelo=args.modelo, imagens_calibracao=listar_imagens(args.calibracao)
+    )
     
     # Executar comandos
-    if args.comando == 'indexar':
+    if args.comando == 'servir':
+        from src.servidor import servir
+        servir(sistema, host=args.host, porta=args.porta, espera_ms=args.espera_ms, lote_max=args.lote_max)
+    
+    elif args.comando == 'indexar':
         if args.imagem:
             sistema.indexar_imagem(args.imagem)
         elif args.pasta:
-            sistema.indexar_pasta(args.pasta)
+            sistema.indexar_pasta(
+                args.pasta, tamanho_lote=args.lote, batch_size=args.batch,
+                incremental=args.incremental, recursivo=args.recursivo,
+                threads_decodificacao=args.threads
+            )
         else:
             print("Erro: forneça --imagem ou --pasta")
     
+    elif args.comando == 'buscar' and args.lote:
+        for caminho, resultados in sistema.buscar_similares_lote(listar_imagens(args.imagem), top_k=args.top):
+            print(f"\n--- {caminho} ---")
+            for i, res in enumerate(resultados, 1):
+                print(f"{i}. Imagem: {res['id']} | Similaridade: {res['similaridade']:.4f}")
+
     elif args.comando == 'buscar':
         resultados = sistema.buscar_similares(
             args.imagem, 
@@ -83,5 +185,154 @@ def main():
         )
 
 
+
+def executar_no_servidor(args):
+    """Encaminha indexar/buscar/comparar ao servidor, sem carregar modelo nem banco aqui."""
+    from src.cliente import ClienteServidor
+
+    cliente = ClienteServidor(args.servidor)
+    try:
+        _encaminhar(cliente, args)
+    except (RuntimeError, OSError) as e:
+        print(f"Erro do servidor: {e}")
+
+
+def _encaminhar(cliente, args):
+    if args.comando == 'indexar':
+        if not (args.imagem or args.pasta):
+            print("Erro: forneça --imagem ou --pasta")
+            return
+        resposta = cliente.indexar(args.imagem, args.pasta, args.incremental, args.recursivo)
+        print(f"Indexadas: {resposta['indexadas']}")
+        return
+
+    if args.comando == 'comparar':
+        if args.detalhes or args.plot or args.salvar:
+            print("Aviso: --detalhes, --plot e --salvar não são usados com --servidor")
+        print(f"Similaridade: {cliente.comparar(args.imagem1, args.imagem2):.4f}")
+        return
+
+    if args.plot or args.salvar:
+        print("Aviso: --plot e --salvar não são usados com --servidor")
+    if args.lote:
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Consultas simultâneas: o servidor as junta em micro-lotes
+        imagens = listar_imagens(args.imagem)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            respostas = pool.map(lambda imagem: cliente.buscar(imagem, args.top), imagens)
+            consultas = list(zip(imagens, respostas))
+    else:
+        consultas = [(None, cliente.buscar(args.imagem, args.top))]
+
+    for caminho, resultados in consultas:
+        print(f"\n--- {caminho} ---" if caminho else "\n--- RESULTADOS ---")
+        for i, res in enumerate(resultados, 1):
+            print(f"{i}. Imagem: {res['id']} | Similaridade: {res['similaridade']:.4f}")
+
+
+def listar_imagens(pasta):
+    """descobrir_imagens(pasta) em lista (None se a pasta não foi informada)."""
+    if not pasta:
+        return None
+    from src.comparador import descobrir_imagens
+    return list(descobrir_imagens(pasta))
+
+
+def executar_paridade(args):
+    """Confere se o modelo otimizado mantém as similaridades do fp32."""
+    from src.models import ExtratorDeFeatures
+
+    imagens = listar_imagens(args.pasta)
+    extrator = ExtratorDeFeatures(
+        modo=args.modelo, imagens_calibracao=listar_imagens(args.calibracao) or imagens
+    )
+    resultado = extrator.verificar_paridade(imagens)
+
+    print(f"\n--- PARIDADE {resultado['modo'].upper()} x FP32 ({resultado['imagens']} imagens) ---")
+    print(f"Maior diferença de similaridade entre pares: {resultado['max_diferenca_cosseno']:.6f}")
+    print(f"Menor cosseno entre vetores da mesma imagem: {resultado['min_cosseno_mesma_imagem']:.6f}")
+    print(f"Tolerância: {resultado['tolerancia']} -> {'APROVADO' if resultado['aprovado'] else 'REPROVADO'}")
+
+
+def executar_recall(args):
+    """Compara o índice aproximado escolhido em --indice com a busca exata."""
+    from src.database.faiss_adapter import avaliar_recall
+
+    if args.vetores:
+        import numpy as np
+        vetores = np.load(args.vetores)
+    elif args.pasta:
+        from src.models import ExtratorDeFeatures
+        extrator = ExtratorDeFeatures(modo=args.modelo, imagens_calibracao=listar_imagens(args.calibracao))
+        vetores = extrator.gerar_vetores(listar_imagens(args.pasta))
+    else:
+        print("Erro: forneça --vetores ou --pasta")
+        return
+
+    indice = args.indice or 'flat'
+    print(f"Avaliando '{indice}' com {len(vetores)} vetores...")
+    relatorio = avaliar_recall(vetores, indice, k=args.k, n_consultas=args.consultas)
+
+    print(f"\n{'Configuração':<20} {'Recall@' + str(args.k):>10} {'ms/consulta':>12}")
+    for linha in relatorio:
+        config = ', '.join(f"{c}={linha[c]}" for c in ('nprobe', 'ef_search') if c in linha) or '-'
+        print(f"{config:<20} {linha[f'recall@{args.k}']:>10.4f} {linha['latencia_ms']:>12.3f}")
+
+
+def executar_bancos(args):
+    """Mede os dois bancos com os mesmos vetores; o FAISS usa --indice, --nprobe e --ef-search."""
+    import json
+
+    from src.database.benchmark import comparar_bancos, vetores_sinteticos
+
+    if args.vetores:
+        import numpy as np
+        vetores = np.load(args.vetores)
+        origem = args.vetores
+    else:
+        vetores = vetores_sinteticos(args.n)
+        origem = 'sintéticos'
+    print(f"Comparando {', '.join(args.bancos)} com {len(vetores)} vetores {origem}...")
+    relatorio = comparar_bancos(
+        vetores, bancos=args.bancos, tops=args.tops, n_consultas=args.consultas, tamanho_lote=args.lote,
+        indice=args.indice, nprobe=args.nprobe, ef_search=args.ef_search
+    )
+    relatorio['vetores'] = origem
+
+    print(f"\n{'Banco':<8} {'Índice':<32} {'Inserção/s':>11} {'Memória MB':>11} {'Disco MB':>9}")
+    for r in relatorio['resultados']:
+        print(f"{r['banco']:<8} {r['indice']:<32} {r['insercao_itens_por_s']:>11.0f} "
+              f"{r['memoria_mb']:>11.1f} {r['disco_mb']:>9.1f}")
+
+    print(f"\n{'Banco':<8} {'top_k':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lote ms':>8} {'Recall':>7}")
+    for r in relatorio['resultados']:
+        for top_k, b in r['buscas'].items():
+            print(f"{r['banco']:<8} {top_k:>5} {b['p50_ms']:>8.2f} {b['p95_ms']:>8.2f} {b['p99_ms']:>8.2f} "
+                  f"{b['lote_ms_por_consulta']:>8.3f} {b['recall']:>7.4f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\nRelatório salvo em {args.json}")
+
+
+def executar_duplicados(args):
+    """Procura pares acima do limiar entre os vetores já indexados e os agrupa."""
+    from src.comparador import criar_banco
+    from src.duplicados import agrupar_pares, encontrar_pares, salvar_grupos
+
+    db = criar_banco(args.banco, args.indice, args.nprobe, args.ef_search)
+    print(f"Comparando {db.total()} vetores (limiar {args.limiar}, blocos de {args.bloco})...")
+    grupos = agrupar_pares(encontrar_pares(db, limiar=args.limiar, tamanho_bloco=args.bloco))
+    salvar_grupos(grupos, args.saida)
+
+    print(f"{len(grupos)} grupos de duplicadas ({sum(len(g['ids']) for g in grupos)} imagens) "
+          f"salvos em {args.saida}")
+    for grupo in grupos[:10]:
+        print(f"  {len(grupo['ids'])} imagens: {', '.join(grupo['ids'][:5])}"
+              f"{' ...' if len(grupo['ids']) > 5 else ''}")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,56 @@
+import json
+import os
+import urllib.error
+import urllib.request
+
+
+class ClienteServidor:
+    """
+    Cliente do servidor de consultas (ver src/servidor.py).
+
+    Não importa torch nem abre o banco: só envia os caminhos das imagens
+    (absolutos, já que o servidor pode ter outro diretório de trabalho) e
+    devolve o JSON da resposta.
+    """
+    def __init__(self, url: str, timeout: float = 600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _enviar(self, rota, dados=None):
+        corpo = None if dados is None else json.dumps(dados).encode('utf-8')
+        requisicao = urllib.request.Request(
+            self.url + rota, data=corpo, headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(requisicao, timeout=self.timeout) as resposta:
+                return json.load(resposta)
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(self._mensagem_erro(e)) from None
+
+    @staticmethod
+    def _mensagem_erro(erro):
+        """Campo 'erro' do JSON de resposta; sem JSON (página de erro de um proxy), status e motivo."""
+        try:
+            corpo = json.load(erro)
+        except (ValueError, OSError):
+            corpo = None
+        if isinstance(corpo, dict) and corpo.get('erro'):
+            return corpo['erro']
+        return f"HTTP {erro.code}: {erro.reason}"
+
+    def saude(self):
+        return self._enviar('/saude')
+
+    def buscar(self, imagem: str, top: int = 3):
+        return self._enviar('/buscar', {'imagem': os.path.abspath(imagem), 'top': top})['resultados']
+
+    def comparar(self, imagem1: str, imagem2: str):
+        dados = {'imagem1': os.path.abspath(imagem1), 'imagem2': os.path.abspath(imagem2)}
+        return self._enviar('/comparar', dados)['similaridade']
+
+    def indexar(self, imagem: str = None, pasta: str = None, incremental: bool = False,
+                recursivo: bool = False):
+        if imagem:
+            return self._enviar('/indexar', {'imagem': os.path.abspath(imagem)})
+        return self._enviar('/indexar', {'pasta': os.path.abspath(pasta), 'incremental': incremental,
+                                         'recursivo': recursivo})
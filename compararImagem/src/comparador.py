@@ -1,59 +1,302 @@
 import numpy as np
 import os
-from .models import ExtratorDeFeatures
-from .database import AdaptadorChromaDB, AdaptadorFAISS
-from .utils import SimilarityCalculator, VisualizadorDeComparacao
+from collections import OrderedDict
+from .utils import ManifestoIndexacao, SimilarityCalculator
+from .utils.manifesto import hash_arquivo
+
+# torch, chromadb, faiss e matplotlib são importados só no primeiro uso
+# (ver src/*/__init__.py), para que comandos simples iniciem rápido
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+
+
+def descobrir_imagens(pasta: str, recursivo: bool = False):
+    """Gera, em ordem alfabética, os caminhos das imagens da pasta."""
+    if not recursivo:
+        for arquivo in sorted(os.listdir(pasta)):
+            if arquivo.lower().endswith(EXTENSOES_IMAGEM):
+                yield os.path.join(pasta, arquivo)
+        return
+    for raiz, subpastas, arquivos in os.walk(pasta):
+        subpastas.sort()
+        for arquivo in sorted(arquivos):
+            if arquivo.lower().endswith(EXTENSOES_IMAGEM):
+                yield os.path.join(raiz, arquivo)
+
+
+def criar_banco(usar_banco: str = 'chroma', indice: str = None,
+                nprobe: int = None, ef_search: int = None):
+    """Abre o banco vetorial escolhido ('chroma' ou 'faiss')."""
+    if usar_banco.lower() == 'faiss':
+        from .database import AdaptadorFAISS
+        print(">> Inicializando com FAISS")
+        # indice: "flat", "hnsw", "ivf-flat" ou "ivf-pq", com parâmetros opcionais
+        return AdaptadorFAISS(indice=indice, nprobe=nprobe, ef_search=ef_search)
+    from .database import AdaptadorChromaDB
+    print(">> Inicializando com ChromaDB")
+    return AdaptadorChromaDB()
 
 
 class ComparadorDeImagens:
-    def __init__(self, usar_banco: str = 'chroma'):
-        self.extrator = ExtratorDeFeatures()
+    """
+    Indexa, busca e compara imagens.
+
+    O vetor de uma imagem de consulta é reaproveitado quando possível, sem
+    passar pela ResNet50: primeiro um LRU em memória das últimas consultas,
+    depois o embedding já indexado do mesmo conteúdo (localizado pelo
+    manifesto e conferido pelo hash gravado nos metadados). A rede e o
+    banco só são carregados na primeira vez que são necessários.
+    """
+    def __init__(self, usar_banco: str = 'chroma', indice: str = None,
+                 nprobe: int = None, ef_search: int = None,
+                 modelo: str = 'fp32', imagens_calibracao: list = None,
+                 caminho_manifesto: str = None, tamanho_cache: int = 256):
+        # modelo: 'fp32', 'jit' ou 'int8' (ver ExtratorDeFeatures)
+        self.modelo = modelo
+        self.imagens_calibracao = imagens_calibracao
+        self._extrator = None
         
         # Aqui decidimos qual "motor" de banco de dados usar
-        if usar_banco.lower() == 'faiss':
-            print(">> Inicializando com FAISS")
-            self.db = AdaptadorFAISS()
-        else:
-            print(">> Inicializando com ChromaDB")
-            self.db = AdaptadorChromaDB()
+        self.banco = 'faiss' if usar_banco.lower() == 'faiss' else 'chroma'
+        self._parametros_banco = (indice, nprobe, ef_search)
+        self._db = None
+
+        self.caminho_manifesto = caminho_manifesto or f"./manifesto_{self.banco}.json"
+        self._manifesto = None
+        self.tamanho_cache = tamanho_cache
+        self._cache_vetores = OrderedDict() # (caminho, tamanho, mtime) -> vetor
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = criar_banco(self.banco, *self._parametros_banco)
+        return self._db
+
+    @property
+    def extrator(self):
+        if self._extrator is None:
+            from .models import ExtratorDeFeatures
+            self._extrator = ExtratorDeFeatures(modo=self.modelo, imagens_calibracao=self.imagens_calibracao)
+        return self._extrator
+
+    def carregar(self):
+        """Carrega banco e modelo já, em vez de no primeiro uso (ex: no servidor)."""
+        return self.db, self.extrator
+
+    @property
+    def manifesto(self):
+        if self._manifesto is None:
+            self._manifesto = ManifestoIndexacao(self.caminho_manifesto)
+        return self._manifesto
+
+    def obter_vetor(self, caminho: str) -> np.ndarray:
+        """Vetor da imagem: do cache, do banco (se já indexada) ou da ResNet50."""
+        chave = self._chave_cache(caminho)
+        if chave is None:
+            return np.zeros(2048, dtype=np.float32)
+        if chave in self._cache_vetores:
+            self._cache_vetores.move_to_end(chave)
+            return self._cache_vetores[chave]
+
+        vetor = self._vetor_indexado(caminho)
+        if vetor is None:
+            vetor = self.extrator.gerar_vetor(caminho)
+        self._guardar_cache(chave, vetor)
+        return vetor
+
+    def obter_vetores(self, caminhos: list, batch_size: int = 32,
+                      num_workers: int = None) -> np.ndarray:
+        """
+        Como obter_vetor para várias imagens: as que não estão no cache são
+        procuradas no banco numa única chamada a db.obter, e as que também
+        não estão no banco passam juntas pela rede, em lotes. Retorna
+        (N, 2048); imagens com erro viram linhas de zeros.
+        """
+        vetores = np.zeros((len(caminhos), 2048), dtype=np.float32)
+        chaves = [self._chave_cache(c) for c in caminhos]
+        fora_do_cache = []
+        for i, chave in enumerate(chaves):
+            if chave is None:
+                continue # Fica zerado
+            if chave in self._cache_vetores:
+                self._cache_vetores.move_to_end(chave)
+                vetores[i] = self._cache_vetores[chave]
+            else:
+                fora_do_cache.append(i)
+
+        indexados = self._vetores_indexados([caminhos[i] for i in fora_do_cache])
+        faltantes = []
+        for posicao, i in enumerate(fora_do_cache):
+            vetor = indexados.get(posicao)
+            if vetor is None:
+                faltantes.append(i)
+            else:
+                vetores[i] = vetor
+                self._guardar_cache(chaves[i], vetor)
+
+        if faltantes:
+            vetores[faltantes] = self.extrator.gerar_vetores(
+                [caminhos[i] for i in faltantes], batch_size=batch_size, num_workers=num_workers
+            )
+            for i in faltantes:
+                self._guardar_cache(chaves[i], vetores[i])
+        return vetores
+
+    def _guardar_cache(self, chave, vetor):
+        if vetor is None or not np.any(vetor):
+            return # Erro de leitura: não guarda no cache
+        self._cache_vetores[chave] = vetor
+        self._cache_vetores.move_to_end(chave)
+        if len(self._cache_vetores) > self.tamanho_cache:
+            self._cache_vetores.popitem(last=False)
+
+    @staticmethod
+    def _chave_cache(caminho):
+        try:
+            info = os.stat(caminho)
+        except OSError as e:
+            print(f"Erro ao processar imagem {caminho}: {e}")
+            return None
+        return (os.path.abspath(caminho), info.st_size, info.st_mtime)
+
+    def _vetor_indexado(self, caminho):
+        return self._vetores_indexados([caminho]).get(0)
+
+    def _vetores_indexados(self, caminhos):
+        """{posição em `caminhos`: vetor} das imagens já indexadas, com um db.obter só."""
+        # Um vetor reconstruído com perda (ivf-pq) distorceria a consulta:
+        # nesse caso a imagem passa pela rede
+        if not caminhos or not self.db.vetores_exatos:
+            return {}
+        encontrados = {}
+        for posicao, caminho in enumerate(caminhos):
+            encontrado = self.manifesto.procurar(caminho)
+            if encontrado is not None:
+                encontrados[posicao] = encontrado
+        if not encontrados:
+            return {}
+
+        itens = self.db.obter(list({id_item for id_item, _ in encontrados.values()}))
+        vetores = {}
+        for posicao, (id_item, conteudo) in encontrados.items():
+            item = itens.get(id_item)
+            # O id pode ter sido reaproveitado por outra imagem desde a indexação
+            if item is not None and (item[1] or {}).get("hash") == conteudo:
+                vetores[posicao] = item[0]
+        return vetores
 
     def indexar_imagem(self, caminho: str):
         """Adiciona uma imagem ao banco de dados vetorial"""
         print(f"Indexando: {caminho}...")
         vetor = self.extrator.gerar_vetor(caminho)
+        conteudo = hash_arquivo(caminho)
         # O ID será o nome do arquivo
         nome_arquivo = os.path.basename(caminho)
-        self.db.adicionar(id_item=nome_arquivo, vetor=vetor, metadados={"path": caminho})
+        self.db.adicionar(id_item=nome_arquivo, vetor=vetor, metadados={"path": caminho, "hash": conteudo})
+        self.db.salvar()
+        self.manifesto.registrar(caminho, conteudo, nome_arquivo)
+        self.manifesto.salvar()
+
+    def indexar_pasta(self, pasta: str, tamanho_lote: int = 256, batch_size: int = 32,
+                      incremental: bool = False, recursivo: bool = False,
+                      threads_decodificacao: int = None):
+        """
+        Indexa todas as imagens de uma pasta com o PipelineIndexacao
+        (decodificação, inferência e gravação em paralelo, em lotes).
+
+        O manifesto (caminho, tamanho, mtime, hash) registra o que foi
+        indexado. Com incremental=True, só imagens novas ou alteradas passam
+        pela rede, as alteradas substituem o vetor antigo e as que sumiram
+        da pasta são removidas do banco. recursivo=True inclui subpastas.
+        Retorna o relatório de vazão por etapa do pipeline.
+        """
+        # O ID será o nome do arquivo (com subpastas, o caminho relativo à pasta)
+        def gerar_id(caminho):
+            if recursivo:
+                return os.path.relpath(caminho, pasta).replace(os.sep, '/')
+            return os.path.basename(caminho)
+
+        manifesto = self.manifesto
+        if incremental:
+            arquivos = list(descobrir_imagens(pasta, recursivo))
+            pendentes, removidos = manifesto.planejar(arquivos, pasta, recursivo)
+            print(f"Incremental: {len(pendentes)} novas/alteradas, "
+                  f"{len(arquivos) - len(pendentes)} sem mudança, {len(removidos)} removidas")
 
-    def indexar_pasta(self, pasta: str):
-        """Indexa todas as imagens de uma pasta"""
-        extensoes = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
-        for arquivo in os.listdir(pasta):
-            if arquivo.lower().endswith(extensoes):
-                caminho_completo = os.path.join(pasta, arquivo)
-                self.indexar_imagem(caminho_completo)
+            # Vetores antigos de imagens alteradas ou apagadas saem do banco
+            antigos = [manifesto.id_de(c) for c, _ in pendentes if manifesto.id_de(c)]
+            antigos += [manifesto.id_de(c) for c in removidos]
+            if antigos:
+                self.db.remover(antigos)
+            for caminho in removidos:
+                manifesto.remover(caminho)
+
+            caminhos = [c for c, _ in pendentes]
+        else:
+            caminhos = descobrir_imagens(pasta, recursivo)
+
+        def ao_gravar(caminhos_lote, ids_lote, hashes_lote):
+            for caminho, id_item, conteudo in zip(caminhos_lote, ids_lote, hashes_lote):
+                manifesto.registrar(caminho, conteudo, id_item)
+
+        from .pipeline import PipelineIndexacao
+
+        pipeline = PipelineIndexacao(
+            self.extrator, self.db, batch_size=batch_size, tamanho_lote=tamanho_lote,
+            threads_decodificacao=threads_decodificacao, ao_gravar=ao_gravar,
+        )
+        relatorio = pipeline.executar((c, gerar_id(c)) for c in caminhos)
+
+        self.db.salvar()
+        # Só depois do banco salvo, para o manifesto nunca estar à frente dele
+        manifesto.salvar()
+
+        print(f"Indexadas {relatorio['gravacao']['itens']} imagens "
+              f"({relatorio['decodificacao']['falhas']} com erro)")
+        for etapa, dados in relatorio.items():
+            print(f"  {etapa:<14} {dados['itens']:>7} itens  {dados['itens_por_s']:>8.1f} itens/s"
+                  f"  ocupado {dados['ocupado_s']:.1f}s")
+        return relatorio
 
     def buscar_similares(self, caminho_query: str, top_k: int = 3, 
                         visualizar: bool = False, salvar_plot: str = None):
         """Busca imagens similares no banco de dados"""
         print(f"\nBuscando {top_k} imagens similares para: {caminho_query}")
-        vetor_query = self.extrator.gerar_vetor(caminho_query)
+        vetor_query = self.obter_vetor(caminho_query)
         resultados = self.db.buscar(vetor_query, top_k=top_k)
         
         # Gerar visualização se solicitado
         if visualizar or salvar_plot:
+            from .utils import VisualizadorDeComparacao
             VisualizadorDeComparacao.plotar_resultados_busca(
                 caminho_query, resultados, salvar_em=salvar_plot
             )
         
         return resultados
 
+    def buscar_similares_lote(self, caminhos_query: list, top_k: int = 3, batch_size: int = 32):
+        """
+        Busca as imagens similares de várias consultas: os vetores que não
+        estão no cache nem no banco são gerados em lotes e o banco recebe
+        todas as consultas numa única chamada a buscar_lote. Retorna uma
+        lista de (caminho, resultados); imagens que não puderam ser lidas
+        ficam de fora.
+        """
+        caminhos_query = list(caminhos_query)
+        print(f"\nBuscando {top_k} imagens similares para {len(caminhos_query)} consultas")
+        vetores = self.obter_vetores(caminhos_query, batch_size=batch_size)
+
+        validos = np.linalg.norm(vetores, axis=1) > 0
+        caminhos_query = [c for c, ok in zip(caminhos_query, validos) if ok]
+        resultados = self.db.buscar_lote(vetores[validos], top_k=top_k) if len(caminhos_query) else []
+        return list(zip(caminhos_query, resultados))
+
     def comparar_duas_imagens(self, img1: str, img2: str, mostrar_detalhes: bool = False, 
                              visualizar: bool = False, salvar_plot: str = None):
         """Compara duas imagens diretamente e retorna a similaridade"""
         print(f"\nComparando: {img1} vs {img2}")
-        v1 = self.extrator.gerar_vetor(img1)
-        v2 = self.extrator.gerar_vetor(img2)
+        v1 = self.obter_vetor(img1)
+        v2 = self.obter_vetor(img2)
         
         if mostrar_detalhes:
             similaridade = SimilarityCalculator.calcular_similaridade_cosseno(v1, v2)
@@ -63,6 +306,7 @@ class ComparadorDeImagens:
         
         # Gerar visualização se solicitado
         if visualizar or salvar_plot:
+            from .utils import VisualizadorDeComparacao
             VisualizadorDeComparacao.plotar_comparacao_detalhada(
                 img1, img2, v1, v2, similaridade, salvar_em=salvar_plot
             )
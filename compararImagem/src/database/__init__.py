@@ -1,5 +1,14 @@
 from .base import BancoVetorial
-from .chromadb_adapter import AdaptadorChromaDB
-from .faiss_adapter import AdaptadorFAISS
 
 __all__ = ['BancoVetorial', 'AdaptadorChromaDB', 'AdaptadorFAISS']
+
+
+def __getattr__(nome):
+    # chromadb e faiss são importados só quando o adaptador é usado
+    if nome == 'AdaptadorChromaDB':
+        from .chromadb_adapter import AdaptadorChromaDB
+        return AdaptadorChromaDB
+    if nome == 'AdaptadorFAISS':
+        from .faiss_adapter import AdaptadorFAISS
+        return AdaptadorFAISS
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
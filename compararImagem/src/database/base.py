@@ -4,12 +4,60 @@ import numpy as np
 
 class BancoVetorial(ABC):
     """
-    Contrato que obriga qualquer banco de dados a ter os métodos adicionar e buscar.
+    Contrato que obriga qualquer banco de dados a ter os métodos adicionar,
+    adicionar_lote, remover, buscar e buscar_lote, além de obter,
+    total e ler_bloco para ler de volta os vetores armazenados.
     """
+    # obter/ler_bloco devolvem exatamente os vetores gravados? Índices com
+    # compressão (ivf-pq) devolvem aproximações
+    vetores_exatos = True
+
     @abstractmethod
     def adicionar(self, id_item: str, vetor: np.ndarray, metadados: dict):
         pass
 
+    @abstractmethod
+    def adicionar_lote(self, ids: list, vetores: np.ndarray, metadados: list,
+                       tamanho_lote: int = 1000):
+        """Adiciona vários vetores (matriz N x D) em blocos de `tamanho_lote`."""
+        pass
+
+    @abstractmethod
+    def remover(self, ids: list):
+        """Remove do banco os vetores com esses ids (ids inexistentes são ignorados)."""
+        pass
+
     @abstractmethod
     def buscar(self, vetor_query: np.ndarray, top_k: int):
         pass
+
+    @abstractmethod
+    def buscar_lote(self, matriz_queries: np.ndarray, top_k: int):
+        """
+        Busca várias consultas (matriz N x D) de uma vez.
+        Retorna uma lista com N listas de resultados, no formato de buscar().
+        """
+        pass
+
+    @abstractmethod
+    def obter(self, ids: list) -> dict:
+        """Retorna {id: (vetor, metadados)} dos ids encontrados (os ausentes ficam de fora)."""
+        pass
+
+    @abstractmethod
+    def total(self) -> int:
+        """Quantidade de itens armazenados, sem os removidos (ver ler_bloco)."""
+        pass
+
+    @abstractmethod
+    def ler_bloco(self, inicio: int, quantidade: int):
+        """
+        Lê os itens [inicio, inicio + quantidade), contados na ordem de
+        armazenamento e sem os removidos (de 0 a total()). Retorna (ids,
+        matriz); no fim do banco a matriz tem menos linhas que `quantidade`.
+        """
+        pass
+
+    def salvar(self):
+        """Persiste o banco em disco. Bancos que já gravam a cada inserção não precisam."""
+        pass
@@ -0,0 +1,192 @@
+import contextlib
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BANCOS = ('chroma', 'faiss')
+
+
+def vetores_sinteticos(n, dimensao=2048, semente=0):
+    """Vetores aleatórios de norma 1 (float32), no formato dos gerados pela ResNet50."""
+    rng = np.random.default_rng(semente)
+    vetores = rng.standard_normal((n, dimensao), dtype=np.float32)
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    return vetores
+
+
+def memoria_residente_mb():
+    """Memória residente do processo (Linux: VmRSS; demais sistemas: pico via resource)."""
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em bytes no macOS e em KiB nos demais
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 1024
+
+
+def tamanho_pasta_mb(pasta):
+    total = 0
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            total += os.path.getsize(os.path.join(raiz, nome))
+    return total / 2**20
+
+
+def vizinhos_exatos(vetores, consultas, k, bloco=4096):
+    """Top-k exato por produto interno (= cosseno com vetores normalizados), em blocos e ordenado."""
+    melhores_scores = np.full((len(consultas), 0), -np.inf, dtype=np.float32)
+    melhores = np.empty((len(consultas), 0), dtype=np.int64)
+    for inicio in range(0, len(vetores), bloco):
+        scores = consultas @ vetores[inicio:inicio + bloco].T
+        melhores_scores = np.hstack([melhores_scores, scores])
+        melhores = np.hstack([melhores, np.broadcast_to(
+            np.arange(inicio, inicio + scores.shape[1]), scores.shape)])
+        if melhores.shape[1] > k:
+            manter = np.argpartition(-melhores_scores, k - 1, axis=1)[:, :k]
+            melhores_scores = np.take_along_axis(melhores_scores, manter, axis=1)
+            melhores = np.take_along_axis(melhores, manter, axis=1)
+    ordem = np.argsort(-melhores_scores, axis=1)
+    return np.take_along_axis(melhores, ordem, axis=1)
+
+
+@contextlib.contextmanager
+def _na_pasta(pasta):
+    # O AdaptadorChromaDB grava no diretório atual (./chroma)
+    anterior = os.getcwd()
+    os.chdir(pasta)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def _percentis(tempos):
+    tempos_ms = np.asarray(tempos) * 1000
+    return {f'p{p}_ms': float(np.percentile(tempos_ms, p)) for p in (50, 95, 99)}
+
+
+def medir_banco(banco, vetores, consultas, verdade, tops, pasta, tamanho_lote=1000,
+                indice=None, nprobe=None, ef_search=None):
+    """
+    Insere `vetores` num adaptador novo em `pasta` e mede inserção, latência
+    de buscar() e buscar_lote() para cada top_k, memória, disco e recall@k.
+
+    `consultas` são posições de `vetores`; `verdade` traz os max(tops)
+    vizinhos exatos de cada consulta. A memória é a diferença da memória
+    residente do processo antes de criar o adaptador e depois das buscas
+    (aproximada: inclui buffers temporários que o alocador não devolveu).
+    """
+    ids = [str(i) for i in range(len(vetores))]
+    metadados = [{'origem': 'benchmark'} for _ in ids]
+    gc.collect()
+    memoria_inicial = memoria_residente_mb()
+
+    with _na_pasta(pasta):
+        if banco == 'chroma':
+            from .chromadb_adapter import AdaptadorChromaDB
+            db = AdaptadorChromaDB()
+            pasta_dados = os.path.join(pasta, 'chroma')
+        else:
+            from .faiss_adapter import AdaptadorFAISS
+            pasta_dados = os.path.join(pasta, 'faiss_index')
+            db = AdaptadorFAISS(dimensao_vetor=vetores.shape[1], pasta=pasta_dados, indice=indice,
+                                nprobe=nprobe, ef_search=ef_search)
+
+        inicio = time.perf_counter()
+        db.adicionar_lote(ids, vetores, metadados, tamanho_lote=tamanho_lote)
+        insercao = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        db.salvar()
+        salvar = time.perf_counter() - inicio
+
+        if banco == 'faiss':
+            parametros = ','.join(f"{c}={v}" for c, v in db.parametros.items())
+            descricao = f"{db.tipo}:{parametros}" if parametros else db.tipo
+        else:
+            descricao = 'hnsw (cosine)'
+        resultado = {
+            'banco': banco,
+            'indice': descricao,
+            'n': len(vetores),
+            'insercao_s': insercao,
+            'insercao_itens_por_s': len(vetores) / insercao,
+            'salvar_s': salvar,
+            'buscas': {},
+        }
+
+        matriz_consultas = vetores[consultas]
+        for top_k in tops:
+            tempos = []
+            acertos = 0
+            for consulta, exatos in zip(matriz_consultas, verdade):
+                inicio = time.perf_counter()
+                encontrados = db.buscar(consulta, top_k)
+                tempos.append(time.perf_counter() - inicio)
+                acertos += len({int(r['id']) for r in encontrados} & set(exatos[:top_k].tolist()))
+
+            inicio = time.perf_counter()
+            db.buscar_lote(matriz_consultas, top_k)
+            lote_ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+
+            resultado['buscas'][str(top_k)] = {
+                **_percentis(tempos),
+                'lote_ms_por_consulta': lote_ms,
+                'recall': acertos / (len(consultas) * min(top_k, len(vetores))),
+            }
+
+        resultado['memoria_mb'] = memoria_residente_mb() - memoria_inicial
+        resultado['disco_mb'] = tamanho_pasta_mb(pasta_dados)
+
+    del db
+    if banco == 'chroma':
+        # Libera o cliente (o Chroma o reaproveita pelo caminho) e os arquivos
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+    gc.collect()
+    return resultado
+
+
+def comparar_bancos(vetores, bancos=BANCOS, tops=(1, 10, 100), n_consultas=200, tamanho_lote=1000,
+                    indice=None, nprobe=None, ef_search=None, semente=0):
+    """
+    Roda medir_banco() para cada banco com os mesmos vetores e consultas.
+
+    As consultas são uma amostra dos próprios vetores (como em
+    avaliar_recall) e o recall@k é medido contra a busca exata em numpy.
+    Cada banco é criado numa pasta temporária, apagada ao final. `indice`,
+    `nprobe` e `ef_search` valem só para o FAISS.
+    """
+    vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+    tops = sorted({min(k, len(vetores)) for k in tops})
+    rng = np.random.default_rng(semente)
+    consultas = rng.choice(len(vetores), min(n_consultas, len(vetores)), replace=False)
+    verdade = vizinhos_exatos(vetores, vetores[consultas], max(tops))
+
+    relatorio = {
+        'n': len(vetores),
+        'dimensao': vetores.shape[1],
+        'consultas': len(consultas),
+        'tops': tops,
+        'resultados': [],
+    }
+    for banco in bancos:
+        pasta = tempfile.mkdtemp(prefix=f"benchmark_{banco}_")
+        try:
+            print(f">> {banco}: inserindo {len(vetores)} vetores...")
+            relatorio['resultados'].append(medir_banco(
+                banco, vetores, consultas, verdade, tops, pasta, tamanho_lote=tamanho_lote,
+                indice=indice, nprobe=nprobe, ef_search=ef_search
+            ))
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+    return relatorio
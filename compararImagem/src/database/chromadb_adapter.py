@@ -18,19 +18,62 @@ class AdaptadorChromaDB(BancoVetorial):
             ids=[id_item], embeddings=[vetor.tolist()], metadatas=[metadados]
         )
 
+    def adicionar_lote(self, ids, vetores, metadados, tamanho_lote=1000):
+        if len(ids) != len(set(ids)):
+            raise ValueError("Os ids do lote devem ser únicos")
+
+        # O Chroma limita quantos itens cabem em uma única chamada
+        tamanho_lote = min(tamanho_lote, self.client.get_max_batch_size())
+        vetores = np.asarray(vetores, dtype=np.float32)
+
+        for inicio in range(0, len(ids), tamanho_lote):
+            fim = inicio + tamanho_lote
+            self.collection.add(
+                ids=list(ids[inicio:fim]),
+                embeddings=vetores[inicio:fim].tolist(),
+                metadatas=list(metadados[inicio:fim]),
+            )
+
+    def remover(self, ids):
+        tamanho_lote = self.client.get_max_batch_size()
+        ids = list(ids)
+        for inicio in range(0, len(ids), tamanho_lote):
+            self.collection.delete(ids=ids[inicio:inicio + tamanho_lote])
+
     def buscar(self, vetor_query, top_k):
-        resultados = self.collection.query(
-            query_embeddings=[vetor_query.tolist()], n_results=top_k
-        )
-        # Simplificando a saída do Chroma
+        return self.buscar_lote(np.array([vetor_query]), top_k)[0]
+
+    def buscar_lote(self, matriz_queries, top_k):
+        matriz_queries = np.asarray(matriz_queries, dtype=np.float32)
+        tamanho_lote = self.client.get_max_batch_size()
+
         retorno = []
-        for i in range(len(resultados["ids"][0])):
-            retorno.append(
-                {
-                    "id": resultados["ids"][0][i],
-                    "distancia": resultados["distances"][0][i],
-                    # Chroma retorna distância, similaridade é 1 - distancia
-                    "similaridade": 1 - resultados["distances"][0][i],
-                }
+        for inicio in range(0, len(matriz_queries), tamanho_lote):
+            resultados = self.collection.query(
+                query_embeddings=matriz_queries[inicio:inicio + tamanho_lote].tolist(),
+                n_results=top_k,
+                include=["distances"],
             )
+            # Simplificando a saída do Chroma
+            # Chroma retorna distância, similaridade é 1 - distancia
+            for ids, distancias in zip(resultados["ids"], resultados["distances"]):
+                retorno.append([
+                    {"id": id_item, "distancia": distancia, "similaridade": 1 - distancia}
+                    for id_item, distancia in zip(ids, distancias)
+                ])
         return retorno
+
+    def obter(self, ids):
+        itens = self.collection.get(ids=list(ids), include=["embeddings", "metadatas"])
+        return {
+            id_item: (np.asarray(vetor, dtype=np.float32), metadados)
+            for id_item, vetor, metadados in zip(itens["ids"], itens["embeddings"], itens["metadatas"])
+        }
+
+    def total(self):
+        return self.collection.count()
+
+    def ler_bloco(self, inicio, quantidade):
+        itens = self.collection.get(offset=inicio, limit=quantidade, include=["embeddings"])
+        vetores = np.asarray(itens["embeddings"], dtype=np.float32)
+        return list(itens["ids"]), vetores.reshape(len(itens["ids"]), -1)
@@ -1,35 +1,560 @@
+import itertools
+import json
+import os
+import time
+
 import numpy as np
 import faiss
 from .base import BancoVetorial
 
+# Tipos de índice aceitos em --indice e seus parâmetros padrão
+TIPOS_INDICE = {
+    'flat': {},
+    'hnsw': {'M': 32, 'ef_construction': 200},
+    'ivf-flat': {'nlist': 1024},
+    'ivf-pq': {'nlist': 1024, 'm': 64, 'nbits': 8},
+}
 
-class AdaptadorFAISS(BancoVetorial):
-    def __init__(self, dimensao_vetor=2048):
+
+# Fração de posições removidas a partir da qual salvar() compacta o índice
+LIMIAR_COMPACTACAO = 0.1
+
+
+def interpretar_indice(texto):
+    """
+    Converte "tipo[:chave=valor,...]" (ex: "ivf-pq:nlist=4096,m=32") em
+    (tipo, parametros), completando com os padrões de TIPOS_INDICE.
+    """
+    tipo, _, resto = texto.partition(':')
+    tipo = tipo.strip().lower()
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"Tipo de índice desconhecido: {tipo} (opções: {', '.join(TIPOS_INDICE)})")
+
+    parametros = dict(TIPOS_INDICE[tipo])
+    for par in filter(None, resto.split(',')):
+        chave, _, valor = par.partition('=')
+        chave = chave.strip()
+        if chave not in parametros:
+            raise ValueError(f"Parâmetro '{chave}' não existe para o índice {tipo}")
+        parametros[chave] = int(valor)
+    return tipo, parametros
+
+
+def criar_indice(tipo, dimensao, parametros):
+    """Cria um índice FAISS por produto interno (= cosseno com vetores normalizados)."""
+    if tipo == 'flat':
         # IndexFlatIP = Inner Product (Produto Interno), que é igual ao Cosseno se os vetores forem normalizados
-        self.index = faiss.IndexFlatIP(dimensao_vetor)
+        return faiss.IndexFlatIP(dimensao)
+
+    if tipo == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimensao, parametros['M'], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = parametros['ef_construction']
+        return index
+
+    if tipo == 'ivf-flat':
+        descricao = f"IVF{parametros['nlist']},Flat"
+    else:
+        if dimensao % parametros['m'] != 0:
+            raise ValueError(f"m={parametros['m']} precisa dividir a dimensão {dimensao}")
+        descricao = f"IVF{parametros['nlist']},PQ{parametros['m']}x{parametros['nbits']}"
+    return faiss.index_factory(dimensao, descricao, faiss.METRIC_INNER_PRODUCT)
+
+
+def tamanho_amostra_treino(tipo, parametros):
+    """Vetores usados no treino: ~64 por lista IVF e ~40 por centróide do PQ."""
+    if not tipo.startswith('ivf'):
+        return 0
+    tamanho = 64 * parametros['nlist']
+    if tipo == 'ivf-pq':
+        tamanho = max(tamanho, 40 * 2 ** parametros['nbits'])
+    return tamanho
+
+
+def parametros_para_treino(tipo, parametros, n_vetores):
+    """
+    Reduz nlist (e nbits do PQ) para que `n_vetores` bastem para o treino:
+    o k-means precisa de ao menos um vetor por centróide.
+    """
+    parametros = dict(parametros)
+    if tipo == 'ivf-pq' and n_vetores < 2:
+        raise ValueError(
+            f"Índice ivf-pq precisa de pelo menos 2 vetores para treinar (há {n_vetores}); "
+            "indexe mais imagens ou use --indice flat"
+        )
+    parametros['nlist'] = max(1, min(parametros['nlist'], n_vetores))
+    if tipo == 'ivf-pq':
+        parametros['nbits'] = min(parametros['nbits'], int(np.log2(n_vetores)))
+    return parametros
+
+
+def ajustar_busca(index, nprobe=None, ef_search=None):
+    """Aplica os parâmetros de busca (precisão x velocidade) ao índice."""
+    if nprobe is not None and 'IVF' in type(index).__name__:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    if ef_search is not None and hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = ef_search
+
+
+class AdaptadorFAISS(BancoVetorial):
+    """
+    Índice FAISS persistido em `pasta`:
+
+    - indice.faiss: o índice, regravado de forma atômica em salvar()
+    - ids.jsonl: uma linha {"id", "metadados"} por vetor, só com acréscimos
+    - config.json: tipo e parâmetros do índice
+    - removidos.json: posições apagadas por remover()
+
+    Remoções são marcadas (nem todo índice FAISS permite apagar, e apagar
+    de um IndexFlat desloca as posições): as posições removidas ficam de
+    fora das buscas por um IDSelector do próprio FAISS. Quando passam de
+    LIMIAR_COMPACTACAO do índice, salvar() as apaga de vez (compactar()).
+
+    Na abertura o índice é mapeado em memória (sem copiar os vetores para a
+    RAM); na primeira inserção ele é lido por completo, já que um índice
+    mapeado é somente leitura. Linhas de ids.jsonl além de index.ntotal
+    (inserções não salvas antes de uma queda) são descartadas.
+
+    Índices IVF precisam de treino: os vetores ficam pendentes até somarem
+    `amostra_treino` (ou até salvar()), o índice é treinado numa amostra
+    aleatória deles e só então recebe os vetores. Enquanto isso as buscas
+    são exatas (produto interno) sobre os pendentes, sem treinar antes da
+    hora, e total/obter/ler_bloco também os enxergam.
+    """
+    def __init__(self, dimensao_vetor=2048, pasta="./faiss_index", indice=None,
+                 nprobe=None, ef_search=None):
+        self.dimensao = dimensao_vetor
+        self.pasta = pasta
+        self.caminho_indice = os.path.join(pasta, "indice.faiss")
+        self.caminho_ids = os.path.join(pasta, "ids.jsonl")
+        self.caminho_config = os.path.join(pasta, "config.json")
+        self.caminho_removidos = os.path.join(pasta, "removidos.json")
+
         self.ids_map = {} # FAISS usa inteiros como ID, precisamos mapear para nomes
+        self.posicoes = {} # id -> posição mais recente (para obter)
+        self.metadados = {}
         self.contador = 0
+        self._somente_leitura = False
+        self._pendentes = []
+        self.removidos = set()
+        self._vivas = None # posições não removidas (cache de _posicoes_vivas)
+        self._filtro = None # seletores FAISS das posições removidas
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        if os.path.exists(self.caminho_indice):
+            self._carregar()
+            if indice is not None and interpretar_indice(indice) != (self.tipo, self.parametros_pedidos):
+                raise ValueError(
+                    f"{self.pasta} já contém um índice '{self.tipo}' {self.parametros}; "
+                    "use outra pasta para criar um índice diferente"
+                )
+        else:
+            self.tipo, self.parametros = interpretar_indice(indice or 'flat')
+            self.parametros_pedidos = self.parametros
+            self.index = criar_indice(self.tipo, dimensao_vetor, self.parametros)
+
+        ajustar_busca(self.index, nprobe, ef_search)
+
+    @property
+    def vetores_exatos(self):
+        """O PQ guarda códigos: reconstruct devolve só uma aproximação do vetor."""
+        return self.tipo != 'ivf-pq'
+
+    @property
+    def amostra_treino(self):
+        """Quantos vetores acumular antes de treinar um índice IVF."""
+        return tamanho_amostra_treino(self.tipo, self.parametros)
+
+    def _carregar(self):
+        """Mapeia o índice salvo em memória e lê o mapeamento de ids."""
+        flag_mmap = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        self.index = faiss.read_index(self.caminho_indice, flag_mmap | faiss.IO_FLAG_READ_ONLY)
+        self._somente_leitura = True
+
+        config = {"tipo": 'flat', "parametros": {}}
+        if os.path.exists(self.caminho_config):
+            with open(self.caminho_config, encoding="utf-8") as f:
+                config = json.load(f)
+        self.tipo, self.parametros = config["tipo"], config["parametros"]
+        # Parâmetros de --indice, que o treino pode ter reduzido (ver _treinar)
+        self.parametros_pedidos = config.get("pedido", self.parametros)
+
+        if self.index.d != self.dimensao:
+            raise ValueError(
+                f"Índice em {self.caminho_indice} tem dimensão {self.index.d}, esperado {self.dimensao}"
+            )
+
+        linhas = []
+        if os.path.exists(self.caminho_ids):
+            with open(self.caminho_ids, encoding="utf-8") as f:
+                linhas = f.readlines()
+
+        if len(linhas) < self.index.ntotal:
+            raise ValueError(
+                f"{self.caminho_ids} tem {len(linhas)} ids para {self.index.ntotal} vetores"
+            )
+        if len(linhas) > self.index.ntotal:
+            # Descarta inserções que não chegaram a ser salvas no índice
+            linhas = linhas[:self.index.ntotal]
+            self._gravar_atomico(self.caminho_ids, "".join(linhas).encode("utf-8"))
+
+        for linha in linhas:
+            item = json.loads(linha)
+            self.ids_map[self.contador] = item["id"]
+            self.metadados[self.contador] = item["metadados"]
+            self.contador += 1
+
+        if os.path.exists(self.caminho_removidos):
+            with open(self.caminho_removidos, encoding="utf-8") as f:
+                self.removidos = {p for p in json.load(f) if p < self.contador}
+
+        for posicao, id_item in self.ids_map.items():
+            if posicao not in self.removidos:
+                self.posicoes[id_item] = posicao
+
+    def _preparar_escrita(self):
+        """Troca o índice mapeado (somente leitura) por uma cópia em memória."""
+        if self._somente_leitura:
+            self.index = faiss.read_index(self.caminho_indice)
+            self._somente_leitura = False
+            ajustar_busca(self.index, self.nprobe, self.ef_search)
+
+    @staticmethod
+    def _gravar_atomico(destino, conteudo):
+        temporario = destino + ".tmp"
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, destino)
+
+    def _registrar_ids(self, ids, metadados):
+        """Acrescenta o mapeamento dos novos vetores em ids.jsonl."""
+        os.makedirs(self.pasta, exist_ok=True)
+        with open(self.caminho_ids, "a", encoding="utf-8") as f:
+            for id_item, meta in zip(ids, metadados):
+                self.ids_map[self.contador] = id_item
+                self.metadados[self.contador] = meta
+                self.posicoes[id_item] = self.contador
+                self.contador += 1
+                f.write(json.dumps({"id": id_item, "metadados": meta}, ensure_ascii=False) + "\n")
+        self._vivas = None
+
+    def _treinar(self):
+        """Treina o índice numa amostra dos vetores pendentes e os adiciona."""
+        vetores = np.concatenate([v for _, v, _ in self._pendentes])
+        parametros = parametros_para_treino(self.tipo, self.parametros, len(vetores))
+        if parametros != self.parametros:
+            print(f"Aviso: só {len(vetores)} vetores para treinar o índice {self.tipo}; usando "
+                  f"{parametros} em vez de {self.parametros}. Para os parâmetros pedidos, "
+                  f"indexe de novo numa pasta vazia quando houver mais imagens")
+            self.parametros = parametros
+            self.index = criar_indice(self.tipo, self.dimensao, parametros)
+            ajustar_busca(self.index, self.nprobe, self.ef_search)
+
+        rng = np.random.default_rng(0)
+        tamanho = min(len(vetores), self.amostra_treino)
+        amostra = vetores[rng.choice(len(vetores), tamanho, replace=False)]
+
+        print(f">> Treinando índice {self.tipo} com {tamanho} vetores...")
+        inicio = time.perf_counter()
+        self.index.train(amostra)
+        print(f">> Treino concluído em {time.perf_counter() - inicio:.1f}s")
+
+        pendentes, self._pendentes = self._pendentes, []
+        for ids, vetores_bloco, metadados in pendentes:
+            self.index.add(vetores_bloco)
+            self._registrar_ids(ids, metadados)
+
+    def salvar(self):
+        """Grava o índice em disco (arquivo temporário + os.replace)."""
+        if self._pendentes:
+            self._treinar()
+        if self._somente_leitura:
+            return # Nada mudou desde a abertura
+        os.makedirs(self.pasta, exist_ok=True)
+
+        if len(self.removidos) > LIMIAR_COMPACTACAO * self.index.ntotal:
+            self.compactar()
+            # ids.jsonl antes do índice: uma queda no meio deixa menos ids
+            # que vetores, o que _carregar() acusa em vez de desalinhar
+            linhas = "".join(
+                json.dumps({"id": self.ids_map[p], "metadados": self.metadados[p]}, ensure_ascii=False) + "\n"
+                for p in range(self.contador)
+            )
+            self._gravar_atomico(self.caminho_ids, linhas.encode("utf-8"))
+
+        self._gravar_atomico(self.caminho_removidos, json.dumps(sorted(self.removidos)).encode("utf-8"))
+        temporario = self.caminho_indice + ".tmp"
+        faiss.write_index(self.index, temporario)
+        os.replace(temporario, self.caminho_indice)
+
+        config = {"tipo": self.tipo, "parametros": self.parametros, "pedido": self.parametros_pedidos}
+        self._gravar_atomico(self.caminho_config, json.dumps(config).encode("utf-8"))
+
+    def compactar(self):
+        """
+        Apaga do índice as posições removidas e renumera as restantes em
+        0..n-1, na mesma ordem. Flat e IVF usam remove_ids (no IVF os ids
+        das listas são renumerados depois); o HNSW não permite remover e é
+        reconstruído com os vetores vivos, que nele são exatos.
+        """
+        if not self.removidos:
+            return
+        self._preparar_escrita()
+        vivas = self._posicoes_vivas()
+        removidas = faiss.IDSelectorBatch(np.array(sorted(self.removidos), dtype='int64'))
+
+        if self.tipo == 'flat':
+            self.index.remove_ids(removidas) # Desloca as posições seguintes
+        elif self.tipo.startswith('ivf'):
+            ivf = faiss.extract_index_ivf(self.index)
+            ivf.make_direct_map(False) # remove_ids não aceita o mapa direto em array
+            self.index.remove_ids(removidas)
+            # As listas guardam os ids antigos: troca pela nova posição
+            novas = np.full(self.contador, -1, dtype='int64')
+            novas[vivas] = np.arange(len(vivas))
+            for lista in range(ivf.nlist):
+                tamanho = ivf.invlists.list_size(lista)
+                if tamanho:
+                    ids_lista = faiss.rev_swig_ptr(ivf.invlists.get_ids(lista), tamanho)
+                    ids_lista[:] = novas[ids_lista]
+        else:
+            novo = criar_indice(self.tipo, self.dimensao, self.parametros)
+            for inicio in range(0, len(vivas), 10000):
+                bloco = vivas[inicio:inicio + 10000]
+                vetores = self.index.reconstruct_n(int(bloco[0]), int(bloco[-1] - bloco[0] + 1))
+                novo.add(vetores[bloco - bloco[0]])
+            self.index = novo
+            ajustar_busca(self.index, self.nprobe, self.ef_search)
+
+        print(f">> Índice compactado: {len(self.removidos)} posições removidas apagadas")
+        ids = [self.ids_map[p] for p in vivas.tolist()]
+        metadados = [self.metadados[p] for p in vivas.tolist()]
+        self.ids_map = dict(enumerate(ids))
+        self.metadados = dict(enumerate(metadados))
+        self.posicoes = {id_item: posicao for posicao, id_item in self.ids_map.items()}
+        self.contador = len(ids)
+        self.removidos = set()
+        self._vivas = self._filtro = None
+
+    def _posicoes_vivas(self):
+        """Posições do índice que não foram removidas, em ordem (np.int64)."""
+        if self._vivas is None:
+            self._vivas = np.setdiff1d(
+                np.arange(self.index.ntotal, dtype='int64'),
+                np.fromiter(self.removidos, dtype='int64', count=len(self.removidos)),
+            )
+        return self._vivas
+
+    def _parametros_busca(self):
+        """SearchParameters que excluem as posições removidas (None se não há nenhuma)."""
+        if not self.removidos:
+            return None
+        if self._filtro is None:
+            removidas = faiss.IDSelectorBatch(np.array(sorted(self.removidos), dtype='int64'))
+            # O IDSelectorNot não guarda referência ao seletor interno
+            self._filtro = (removidas, faiss.IDSelectorNot(removidas))
+        seletor = self._filtro[1]
+        # Os parâmetros passados substituem os do índice: repete nprobe/efSearch
+        if self.tipo.startswith('ivf'):
+            return faiss.SearchParametersIVF(sel=seletor, nprobe=faiss.extract_index_ivf(self.index).nprobe)
+        if self.tipo == 'hnsw':
+            return faiss.SearchParametersHNSW(sel=seletor, efSearch=self.index.hnsw.efSearch)
+        return faiss.SearchParameters(sel=seletor)
 
     def adicionar(self, id_item, vetor, metadados):
-        # FAISS espera array float32
-        vetor_f32 = np.array([vetor], dtype='float32')
-        self.index.add(vetor_f32)
-        
-        # Mapeia o índice numérico do FAISS para o nosso ID (nome do arquivo)
-        self.ids_map[self.contador] = id_item
-        self.contador += 1
+        self.adicionar_lote([id_item], np.array([vetor]), [metadados])
+
+    def adicionar_lote(self, ids, vetores, metadados, tamanho_lote=1000):
+        self._preparar_escrita()
+
+        # FAISS espera matriz float32 contígua (N x D)
+        vetores_f32 = np.ascontiguousarray(vetores, dtype='float32')
+
+        for inicio in range(0, len(ids), tamanho_lote):
+            bloco = vetores_f32[inicio:inicio + tamanho_lote]
+            fim = inicio + tamanho_lote
+
+            if not self.index.is_trained:
+                # Acumula até ter vetores suficientes para treinar
+                self._pendentes.append((list(ids[inicio:fim]), bloco, list(metadados[inicio:fim])))
+                if sum(len(v) for _, v, _ in self._pendentes) >= self.amostra_treino:
+                    self._treinar()
+                continue
+
+            self.index.add(bloco)
+
+            # Os ids numéricos do FAISS são as posições de inserção
+            self._registrar_ids(ids[inicio:fim], metadados[inicio:fim])
+
+    def remover(self, ids):
+        alvo = set(ids)
+        posicoes = {p for p, id_item in self.ids_map.items() if id_item in alvo}
+        # Vetores que ainda aguardam o treino saem direto da fila
+        pendentes, self._pendentes = self._pendentes, []
+        for ids_bloco, vetores_bloco, metadados in pendentes:
+            manter = [id_item not in alvo for id_item in ids_bloco]
+            if any(manter):
+                self._pendentes.append((
+                    [i for i, ok in zip(ids_bloco, manter) if ok],
+                    vetores_bloco[manter],
+                    [m for m, ok in zip(metadados, manter) if ok],
+                ))
+
+        for id_item in alvo:
+            self.posicoes.pop(id_item, None)
+        if posicoes - self.removidos:
+            self._preparar_escrita() # Marca que há mudanças a salvar
+            self.removidos |= posicoes
+            self._vivas = self._filtro = None
 
     def buscar(self, vetor_query, top_k):
-        vetor_f32 = np.array([vetor_query], dtype='float32')
-        scores, indices = self.index.search(vetor_f32, top_k)
-        
+        return self.buscar_lote(np.array([vetor_query]), top_k)[0]
+
+    def buscar_lote(self, matriz_queries, top_k):
+        consultas = np.ascontiguousarray(matriz_queries, dtype='float32')
+        if not self.index.is_trained:
+            scores, indices, ids_map = self._buscar_pendentes(consultas, top_k)
+        else:
+            # As posições removidas são descartadas pelo próprio FAISS
+            scores, indices = self.index.search(consultas, top_k, params=self._parametros_busca())
+            ids_map = self.ids_map
+
         retorno = []
-        for i in range(top_k):
-            idx_faiss = indices[0][i]
-            if idx_faiss != -1: # Se encontrou algo
-                retorno.append({
-                    'id': self.ids_map.get(idx_faiss, "Desconhecido"),
-                    'similaridade': scores[0][i], # FAISS IP já retorna a similaridade direta
-                    'distancia': 1 - scores[0][i]
-                })
+        for scores_query, indices_query in zip(scores.tolist(), indices.tolist()):
+            resultados = []
+            for score, idx_faiss in zip(scores_query, indices_query):
+                if idx_faiss != -1: # Se encontrou algo
+                    resultados.append({
+                        'id': ids_map.get(idx_faiss, "Desconhecido"),
+                        'similaridade': score, # FAISS IP já retorna a similaridade direta
+                        'distancia': 1 - score
+                    })
+            retorno.append(resultados)
         return retorno
+
+    def _buscar_pendentes(self, consultas, top_k):
+        """
+        Busca exata nos vetores que aguardam o treino (o índice IVF sem
+        treino está vazio). Retorna (scores, indices, ids por índice), no formato
+        do index.search.
+        """
+        scores = [np.zeros((len(consultas), 0), dtype='float32')]
+        indices = [np.zeros((len(consultas), 0), dtype='int64')]
+        ids = []
+        for ids_bloco, vetores_bloco, _ in self._pendentes:
+            scores_bloco, indices_bloco = faiss.knn(
+                consultas, vetores_bloco, min(top_k, len(vetores_bloco)),
+                metric=faiss.METRIC_INNER_PRODUCT
+            )
+            scores.append(scores_bloco)
+            indices.append(indices_bloco + len(ids))
+            ids.extend(ids_bloco)
+        scores, indices = np.hstack(scores), np.hstack(indices)
+        melhores = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+        return (np.take_along_axis(scores, melhores, axis=1),
+                np.take_along_axis(indices, melhores, axis=1), dict(enumerate(ids)))
+
+    def _itens_pendentes(self):
+        """(id, vetor, metadados) de cada vetor que aguarda o treino, em ordem."""
+        for ids_bloco, vetores_bloco, metadados in self._pendentes:
+            yield from zip(ids_bloco, vetores_bloco, metadados)
+
+    def _habilitar_reconstrucao(self):
+        if self.tipo.startswith('ivf'):
+            # Índices IVF só reconstroem por posição com o mapa direto,
+            # que depois de criado é mantido pelo próprio add()
+            ivf = faiss.extract_index_ivf(self.index)
+            if ivf.direct_map.type == faiss.DirectMap.NoMap:
+                ivf.make_direct_map()
+
+    def obter(self, ids):
+        """Reconstrói do índice os vetores desses ids (aproximados no ivf-pq)."""
+        if self._pendentes:
+            alvo = set(ids)
+            return {
+                id_item: (vetor, meta) for id_item, vetor, meta in self._itens_pendentes()
+                if id_item in alvo
+            }
+        encontrados = [(i, self.posicoes[i]) for i in ids if i in self.posicoes]
+        if not encontrados:
+            return {}
+        self._habilitar_reconstrucao()
+        return {
+            id_item: (self.index.reconstruct(posicao), self.metadados[posicao])
+            for id_item, posicao in encontrados
+        }
+
+    def total(self):
+        """Vetores no índice, sem contar as posições removidas, mais os pendentes."""
+        pendentes = sum(len(v) for _, v, _ in self._pendentes)
+        return self.index.ntotal - len(self.removidos) + pendentes
+
+    def ler_bloco(self, inicio, quantidade):
+        """Reconstrói os vetores vivos [inicio, inicio + quantidade) (aproximados no ivf-pq)."""
+        if self._pendentes:
+            itens = list(itertools.islice(self._itens_pendentes(), inicio, inicio + quantidade))
+            if not itens:
+                return [], np.zeros((0, self.dimensao), dtype='float32')
+            return [i for i, _, _ in itens], np.stack([v for _, v, _ in itens])
+        posicoes = self._posicoes_vivas()[inicio:inicio + quantidade]
+        if len(posicoes) == 0:
+            return [], np.zeros((0, self.dimensao), dtype='float32')
+        self._habilitar_reconstrucao()
+        primeira = int(posicoes[0])
+        vetores = self.index.reconstruct_n(primeira, int(posicoes[-1]) - primeira + 1)
+        if len(vetores) > len(posicoes):
+            vetores = vetores[posicoes - primeira]
+        return [self.ids_map[p] for p in posicoes.tolist()], vetores
+
+
+def avaliar_recall(vetores, indice, k=10, n_consultas=1000, nprobes=(1, 8, 32, 128),
+                   ef_searches=(16, 64, 256)):
+    """
+    Mede o recall@k de um índice aproximado contra a busca exata (flat).
+
+    Constrói em memória o índice `indice` ("tipo[:parametros]") e um
+    IndexFlatIP com os mesmos vetores, consulta ambos com uma amostra dos
+    próprios vetores e, para cada valor de nprobe (IVF) ou efSearch (HNSW),
+    retorna a fração dos k vizinhos exatos que o índice aproximado encontrou
+    e a latência média por consulta.
+    """
+    vetores = np.ascontiguousarray(vetores, dtype='float32')
+    tipo, parametros = interpretar_indice(indice)
+    rng = np.random.default_rng(0)
+    consultas = vetores[rng.choice(len(vetores), min(n_consultas, len(vetores)), replace=False)]
+
+    exato = faiss.IndexFlatIP(vetores.shape[1])
+    exato.add(vetores)
+    _, verdade = exato.search(consultas, k)
+
+    aproximado = criar_indice(tipo, vetores.shape[1], parametros)
+    if not aproximado.is_trained:
+        tamanho = min(len(vetores), tamanho_amostra_treino(tipo, parametros))
+        amostra = vetores[rng.choice(len(vetores), tamanho, replace=False)]
+        aproximado.train(amostra)
+    aproximado.add(vetores)
+
+    if tipo.startswith('ivf'):
+        configuracoes = [{'nprobe': n} for n in nprobes if n <= parametros['nlist']]
+    elif tipo == 'hnsw':
+        configuracoes = [{'ef_search': e} for e in ef_searches]
+    else:
+        configuracoes = [{}]
+
+    relatorio = []
+    for config in configuracoes:
+        ajustar_busca(aproximado, **config)
+        inicio = time.perf_counter()
+        _, encontrados = aproximado.search(consultas, k)
+        latencia_ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+
+        acertos = sum(len(set(e) & set(v)) for e, v in zip(encontrados, verdade))
+        relatorio.append({
+            'indice': tipo,
+            **config,
+            f'recall@{k}': acertos / (len(consultas) * k),
+            'latencia_ms': latencia_ms,
+        })
+    return relatorio
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+
+def encontrar_pares(db, limiar: float = 0.95, tamanho_bloco: int = 2048):
+    """
+    Gera (id_a, id_b, similaridade) para todo par de vetores do banco com
+    similaridade cosseno >= limiar.
+
+    Os vetores são lidos em blocos de `tamanho_bloco` (db.ler_bloco) e cada
+    bloco é multiplicado pelos blocos seguintes, então só dois blocos e uma
+    matriz de similaridades tamanho_bloco x tamanho_bloco ficam em memória,
+    qualquer que seja o tamanho do banco.
+    """
+    total = db.total()
+    for inicio_a in range(0, total, tamanho_bloco):
+        ids_a, vetores_a = db.ler_bloco(inicio_a, tamanho_bloco)
+        if not ids_a:
+            continue
+        vetores_a = np.asarray(vetores_a, dtype=np.float32)
+
+        for inicio_b in range(inicio_a, total, tamanho_bloco):
+            mesmo_bloco = inicio_b == inicio_a
+            if mesmo_bloco:
+                ids_b, vetores_b = ids_a, vetores_a
+            else:
+                ids_b, vetores_b = db.ler_bloco(inicio_b, tamanho_bloco)
+                if not ids_b:
+                    continue
+                vetores_b = np.asarray(vetores_b, dtype=np.float32)
+
+            similaridades = vetores_a @ vetores_b.T
+            linhas, colunas = np.nonzero(similaridades >= limiar)
+            if mesmo_bloco:
+                # Cada par uma vez só, sem comparar o vetor com ele mesmo
+                acima = colunas > linhas
+                linhas, colunas = linhas[acima], colunas[acima]
+
+            for linha, coluna in zip(linhas.tolist(), colunas.tolist()):
+                if ids_a[linha] != ids_b[coluna]:
+                    yield ids_a[linha], ids_b[coluna], float(similaridades[linha, coluna])
+
+
+def agrupar_pares(pares):
+    """
+    Junta os pares em grupos (componentes conexas, via union-find): se A~B
+    e B~C, A, B e C ficam no mesmo grupo. Retorna a lista de grupos, do
+    maior para o menor, cada um com ids, quantidade de pares e a menor e a
+    maior similaridade entre eles.
+    """
+    pai = {}
+
+    def raiz(item):
+        pai.setdefault(item, item)
+        while pai[item] != item:
+            pai[item] = pai[pai[item]] # compressão de caminho
+            item = pai[item]
+        return item
+
+    arestas = []
+    for id_a, id_b, similaridade in pares:
+        ra, rb = raiz(id_a), raiz(id_b)
+        if ra != rb:
+            pai[rb] = ra
+        arestas.append((id_a, similaridade))
+
+    grupos = {}
+    for item in pai:
+        grupos.setdefault(raiz(item), {'ids': [], 'pares': 0, 'similaridade_min': 1.0,
+                                       'similaridade_max': -1.0})['ids'].append(item)
+    for id_a, similaridade in arestas:
+        grupo = grupos[raiz(id_a)]
+        grupo['pares'] += 1
+        grupo['similaridade_min'] = min(grupo['similaridade_min'], similaridade)
+        grupo['similaridade_max'] = max(grupo['similaridade_max'], similaridade)
+
+    for grupo in grupos.values():
+        grupo['ids'].sort()
+    return sorted(grupos.values(), key=lambda g: (-len(g['ids']), g['ids'][0]))
+
+
+def salvar_grupos(grupos, caminho: str):
+    """Grava um grupo por linha (JSON Lines)."""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for numero, grupo in enumerate(grupos, 1):
+            f.write(json.dumps({'grupo': numero, **grupo}, ensure_ascii=False) + '\n')
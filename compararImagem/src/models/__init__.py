@@ -1,3 +1,9 @@
-from .extrator import ExtratorDeFeatures
-
 __all__ = ['ExtratorDeFeatures']
+
+
+def __getattr__(nome):
+    # torch/torchvision só são importados quando o extrator é usado
+    if nome == 'ExtratorDeFeatures':
+        from .extrator import ExtratorDeFeatures
+        return ExtratorDeFeatures
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
@@ -1,23 +1,82 @@
+import os
+import warnings
+
 import numpy as np
 import torch
 import torchvision.transforms as transforms
 import torchvision.models as models
 from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+
+class _DatasetImagens(Dataset):
+    """Abre e transforma as imagens dentro dos workers do DataLoader."""
+    def __init__(self, caminhos, transformacao):
+        self.caminhos = caminhos
+        self.transformacao = transformacao
+
+    def __len__(self):
+        return len(self.caminhos)
+
+    def __getitem__(self, i):
+        try:
+            img = Image.open(self.caminhos[i]).convert('RGB')
+            return self.transformacao(img), True
+        except Exception as e:
+            print(f"Erro ao processar imagem {self.caminhos[i]}: {e}")
+            return torch.zeros(3, 224, 224), False
+
+
+def _iniciar_worker(_):
+    # Cada worker só decodifica/redimensiona; evita disputar núcleos com o modelo
+    torch.set_num_threads(1)
+
+
+# Modos de inferência e a diferença máxima aceita entre a similaridade
+# cosseno de cada par de imagens no modo otimizado e no fp32
+TOLERANCIA_PARIDADE = {
+    'fp32': 0.0,
+    'jit': 1e-4,   # mesmas contas, só reordenadas pelo TorchScript/channels_last
+    'int8': 0.02,  # pesos e ativações quantizados
+}
+
+
+def _selecionar_motor_quantizado():
+    motores = torch.backends.quantized.supported_engines
+    motor = 'x86' if 'x86' in motores else 'fbgemm'
+    torch.backends.quantized.engine = motor
+    return motor
+
+
+def _construir_resnet():
+    # Usamos ResNet50 (uma rede neural pré-treinada)
+    # weights='DEFAULT' usa os pesos mais atuais
+    resnet = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
+
+    # Removemos a última camada (que classifica se é gato, cachorro, etc)
+    # Queremos apenas os números anteriores a essa decisão (o embedding)
+    modelo = torch.nn.Sequential(*(list(resnet.children())[:-1]))
+    modelo.eval() # Modo de avaliação (não treino)
+    return modelo
 
 
 class ExtratorDeFeatures:
     """
     Responsável APENAS por transformar uma imagem em uma lista de números.
+
+    modo='fp32' usa a ResNet50 original. Os modos otimizados para CPU são
+    compilados uma vez e guardados em `pasta_modelos`; nas execuções
+    seguintes o artefato é carregado direto, sem montar a ResNet:
+
+    - 'jit': TorchScript congelado com tensores channels_last
+    - 'int8': quantização estática (FX) calibrada com `imagens_calibracao`,
+      depois exportada em TorchScript
     """
-    def __init__(self):
-        # Usamos ResNet50 (uma rede neural pré-treinada)
-        # weights='DEFAULT' usa os pesos mais atuais
-        resnet = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
-        
-        # Removemos a última camada (que classifica se é gato, cachorro, etc)
-        # Queremos apenas os números anteriores a essa decisão (o embedding)
-        self.modelo = torch.nn.Sequential(*(list(resnet.children())[:-1]))
-        self.modelo.eval() # Modo de avaliação (não treino)
+    def __init__(self, modo: str = 'fp32', pasta_modelos: str = './modelos',
+                 imagens_calibracao: list = None):
+        if modo not in TOLERANCIA_PARIDADE:
+            raise ValueError(f"Modo desconhecido: {modo} (opções: {', '.join(TOLERANCIA_PARIDADE)})")
+        self.modo = modo
 
         # Regras de transformação para a imagem entrar na rede neural
         self.transformacao = transforms.Compose([
@@ -27,6 +86,75 @@ class ExtratorDeFeatures:
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
 
+        if modo == 'fp32':
+            self.modelo = _construir_resnet()
+            return
+
+        caminho = os.path.join(pasta_modelos, f"resnet50_{modo}_torch{torch.__version__}.pt")
+        with warnings.catch_warnings():
+            # torch.jit emite FutureWarning nas versões mais novas do PyTorch
+            warnings.simplefilter("ignore", FutureWarning)
+            if modo == 'int8':
+                _selecionar_motor_quantizado()
+            if os.path.exists(caminho):
+                self.modelo = torch.jit.load(caminho)
+            else:
+                self.modelo = self._compilar(modo, imagens_calibracao)
+                os.makedirs(pasta_modelos, exist_ok=True)
+                torch.jit.save(self.modelo, caminho + ".tmp")
+                os.replace(caminho + ".tmp", caminho)
+                print(f">> Modelo {modo} salvo em {caminho}")
+
+    def _compilar(self, modo, imagens_calibracao):
+        """Gera o modelo otimizado (TorchScript, opcionalmente quantizado)."""
+        modelo = _construir_resnet()
+        exemplo = torch.zeros(1, 3, 224, 224)
+
+        if modo == 'int8':
+            from torch.ao.quantization import get_default_qconfig_mapping
+            from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+            if not imagens_calibracao:
+                raise ValueError("O modo int8 precisa de imagens de calibração (ex: --calibracao fotos/)")
+
+            motor = _selecionar_motor_quantizado()
+            modelo = prepare_fx(modelo, get_default_qconfig_mapping(motor), example_inputs=(exemplo,))
+
+            # Calibração: observa a faixa das ativações em imagens reais
+            print(f">> Calibrando int8 com {len(imagens_calibracao)} imagens...")
+            with torch.inference_mode():
+                for inicio in range(0, len(imagens_calibracao), 16):
+                    lote = [
+                        self.transformacao(Image.open(c).convert('RGB'))
+                        for c in imagens_calibracao[inicio:inicio + 16]
+                    ]
+                    modelo(torch.stack(lote))
+            modelo = convert_fx(modelo)
+        else:
+            modelo = modelo.to(memory_format=torch.channels_last)
+            exemplo = exemplo.contiguous(memory_format=torch.channels_last)
+
+        with torch.inference_mode():
+            modelo = torch.jit.freeze(torch.jit.trace(modelo, exemplo))
+        return modelo
+
+    def _executar(self, imagens):
+        """Passa um lote (N, 3, 224, 224) pela rede e devolve (N, 2048)."""
+        if self.modo == 'jit':
+            imagens = imagens.contiguous(memory_format=torch.channels_last)
+        return self.modelo(imagens).flatten(1)
+
+    def preprocessar(self, caminho_imagem) -> torch.Tensor:
+        """Abre a imagem (caminho ou arquivo binário) e devolve o tensor (3, 224, 224) da rede."""
+        img = Image.open(caminho_imagem).convert('RGB')
+        return self.transformacao(img)
+
+    def vetores_de_lote(self, imagens: torch.Tensor) -> np.ndarray:
+        """Passa tensores já pré-processados (N, 3, 224, 224) pela rede e normaliza."""
+        with torch.inference_mode():
+            features = self._executar(imagens).numpy()
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+
     def gerar_vetor(self, caminho_imagem: str) -> np.ndarray:
         try:
             # 1. Carregar imagem
@@ -35,8 +163,8 @@ class ExtratorDeFeatures:
             img_t = self.transformacao(img).unsqueeze(0)
             
             # 3. Passar pela rede neural
-            with torch.no_grad():
-                features = self.modelo(img_t)
+            with torch.inference_mode():
+                features = self._executar(img_t)
             
             # 4. Transformar em array simples do numpy (uma lista de números)
             features_np = features.flatten().numpy()
@@ -48,3 +176,70 @@ class ExtratorDeFeatures:
         except Exception as e:
             print(f"Erro ao processar imagem {caminho_imagem}: {e}")
             return np.zeros(2048) # Retorna vetor vazio em caso de erro
+
+    def gerar_vetores(self, caminhos: list, batch_size: int = 32,
+                      num_workers: int = None) -> np.ndarray:
+        """
+        Gera os vetores de várias imagens, em lotes de `batch_size`.
+
+        A abertura e o pré-processamento rodam em `num_workers` processos do
+        DataLoader enquanto o modelo processa o lote anterior. Durante a
+        chamada, as threads do PyTorch são reduzidas para deixar um núcleo
+        para cada worker. Retorna uma matriz (N, 2048) na ordem de
+        `caminhos`; imagens com erro viram linhas de zeros, como em
+        gerar_vetor.
+        """
+        if len(caminhos) == 0:
+            return np.zeros((0, 2048), dtype=np.float32)
+
+        nucleos = os.cpu_count() or 1
+        if num_workers is None:
+            num_workers = min(4, nucleos // 2)
+
+        carregador = DataLoader(
+            _DatasetImagens(list(caminhos), self.transformacao),
+            batch_size=batch_size,
+            num_workers=num_workers,
+            worker_init_fn=_iniciar_worker if num_workers > 0 else None,
+        )
+
+        threads_antes = torch.get_num_threads()
+        torch.set_num_threads(max(1, min(threads_antes, nucleos - num_workers)))
+        try:
+            vetores = []
+            with torch.inference_mode():
+                for imagens, validas in carregador:
+                    features = self._executar(imagens).numpy()
+                    features[~validas.numpy()] = 0
+                    vetores.append(features)
+        finally:
+            torch.set_num_threads(threads_antes)
+
+        vetores = np.concatenate(vetores)
+        # Normaliza cada linha (as de erro continuam zeradas)
+        normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+        return vetores / np.where(normas == 0, 1, normas)
+
+    def verificar_paridade(self, caminhos: list) -> dict:
+        """
+        Compara os vetores deste modo com os do fp32 nas mesmas imagens.
+
+        Mede a maior diferença entre as matrizes de similaridade cosseno
+        (todos os pares de imagens) dos dois modos e a menor similaridade
+        entre o vetor fp32 e o otimizado de uma mesma imagem. O resultado é
+        aprovado se a diferença fica dentro de TOLERANCIA_PARIDADE[modo].
+        """
+        referencia = ExtratorDeFeatures('fp32').gerar_vetores(caminhos, num_workers=0)
+        otimizados = self.gerar_vetores(caminhos, num_workers=0)
+
+        diferenca = float(np.max(np.abs(referencia @ referencia.T - otimizados @ otimizados.T)))
+        mesma_imagem = float(np.min(np.sum(referencia * otimizados, axis=1)))
+        tolerancia = TOLERANCIA_PARIDADE[self.modo]
+        return {
+            'modo': self.modo,
+            'imagens': len(caminhos),
+            'max_diferenca_cosseno': diferenca,
+            'min_cosseno_mesma_imagem': mesma_imagem,
+            'tolerancia': tolerancia,
+            'aprovado': diferenca <= tolerancia,
+        }
@@ -0,0 +1,225 @@
+import hashlib
+import io
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import torch
+
+# Marca o fim do fluxo em cada fila
+_FIM = object()
+
+
+class ContadorEtapa:
+    """Itens processados e tempo ocupado de uma etapa do pipeline."""
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.itens = 0
+        self.falhas = 0
+        self.ocupado = 0.0 # segundos somados de todas as threads da etapa
+        self._trava = threading.Lock()
+
+    def registrar(self, itens: int, segundos: float, falhas: int = 0):
+        with self._trava:
+            self.itens += itens
+            self.falhas += falhas
+            self.ocupado += segundos
+
+
+class PipelineIndexacao:
+    """
+    Indexação em etapas que rodam ao mesmo tempo, ligadas por filas limitadas:
+
+        descoberta -> decodificação (threads) -> inferência em lotes -> gravação em lotes
+
+    Enquanto a rede processa um lote, as threads de decodificação já abrem
+    as próximas imagens (PIL e as transformações do torch liberam o GIL) e
+    a thread de gravação escreve o lote anterior no banco. Quando uma etapa
+    fica para trás, as filas enchem e as anteriores esperam (backpressure),
+    então a memória usada não depende do tamanho da pasta.
+
+    Cada arquivo é lido uma vez só: os bytes passam pelo SHA-256 e são
+    decodificados da memória. Os metadados gravados são {"path", "hash"}.
+    `ao_gravar(caminhos, ids, hashes)` é chamado na thread de gravação
+    depois de cada adicionar_lote bem-sucedido.
+    """
+    def __init__(self, extrator, db, batch_size: int = 32, tamanho_lote: int = 256,
+                 threads_decodificacao: int = None, tamanho_fila: int = None,
+                 ao_gravar=None):
+        self.extrator = extrator
+        self.db = db
+        self.batch_size = batch_size
+        self.tamanho_lote = tamanho_lote
+        self.threads_decodificacao = threads_decodificacao or min(8, os.cpu_count() or 1)
+        self.tamanho_fila = tamanho_fila or 4 * batch_size
+        self.ao_gravar = ao_gravar
+
+        self.contadores = {
+            nome: ContadorEtapa(nome)
+            for nome in ('descoberta', 'decodificacao', 'inferencia', 'gravacao')
+        }
+        self._parar = threading.Event()
+        self._erros = []
+        self._duracao = 0.0
+
+    def _colocar(self, fila, item):
+        # put com espera limitada para não travar se outra etapa falhou
+        while not self._parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _retirar(self, fila):
+        while not self._parar.is_set():
+            try:
+                return fila.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _FIM
+
+    def _em_thread(self, alvo, *args):
+        def executar():
+            try:
+                alvo(*args)
+            except BaseException as e:
+                self._erros.append(e)
+                self._parar.set()
+        thread = threading.Thread(target=executar, daemon=True)
+        thread.start()
+        return thread
+
+    def _descobrir(self, itens, fila_arquivos):
+        contador = self.contadores['descoberta']
+        for caminho, id_item in itens:
+            if not self._colocar(fila_arquivos, (caminho, id_item)):
+                return
+            contador.registrar(1, 0.0)
+        for _ in range(self.threads_decodificacao):
+            self._colocar(fila_arquivos, _FIM)
+
+    def _decodificar(self, fila_arquivos, fila_tensores):
+        contador = self.contadores['decodificacao']
+        while True:
+            item = self._retirar(fila_arquivos)
+            if item is _FIM:
+                break
+            caminho, id_item = item
+            inicio = time.perf_counter()
+            try:
+                with open(caminho, 'rb') as f:
+                    dados = f.read()
+                conteudo = hashlib.sha256(dados).hexdigest()
+                tensor = self.extrator.preprocessar(io.BytesIO(dados))
+            except Exception as e:
+                print(f"Erro ao processar imagem {caminho}: {e}")
+                contador.registrar(0, time.perf_counter() - inicio, falhas=1)
+                continue
+            contador.registrar(1, time.perf_counter() - inicio)
+            if not self._colocar(fila_tensores, (caminho, id_item, conteudo, tensor)):
+                return
+        self._colocar(fila_tensores, _FIM)
+
+    def _inferir(self, fila_tensores, fila_vetores):
+        contador = self.contadores['inferencia']
+        ativos = self.threads_decodificacao
+        lote = []
+
+        def processar():
+            inicio = time.perf_counter()
+            vetores = self.extrator.vetores_de_lote(torch.stack([item[3] for item in lote]))
+            contador.registrar(len(lote), time.perf_counter() - inicio)
+            caminhos, ids, hashes, _ = zip(*lote)
+            self._colocar(fila_vetores, (caminhos, ids, hashes, vetores))
+            lote.clear()
+
+        while ativos:
+            item = self._retirar(fila_tensores)
+            if self._parar.is_set():
+                return
+            if item is _FIM:
+                ativos -= 1
+                continue
+            lote.append(item)
+            if len(lote) == self.batch_size:
+                processar()
+        if lote:
+            processar()
+        self._colocar(fila_vetores, _FIM)
+
+    def _gravar(self, fila_vetores):
+        contador = self.contadores['gravacao']
+        caminhos, ids, hashes, vetores = [], [], [], []
+
+        def gravar():
+            inicio = time.perf_counter()
+            metadados = [{"path": c, "hash": h} for c, h in zip(caminhos, hashes)]
+            self.db.adicionar_lote(ids, np.concatenate(vetores), metadados)
+            if self.ao_gravar:
+                self.ao_gravar(list(caminhos), list(ids), list(hashes))
+            contador.registrar(len(ids), time.perf_counter() - inicio)
+            caminhos.clear(), ids.clear(), hashes.clear(), vetores.clear()
+
+        while True:
+            item = self._retirar(fila_vetores)
+            if item is _FIM:
+                break
+            caminhos.extend(item[0])
+            ids.extend(item[1])
+            hashes.extend(item[2])
+            vetores.append(item[3])
+            if len(ids) >= self.tamanho_lote:
+                gravar()
+        if ids and not self._parar.is_set():
+            gravar()
+
+    def executar(self, itens):
+        """
+        Indexa `itens`, um iterável (pode ser um gerador) de (caminho, id).
+
+        Retorna o relatório de vazão por etapa (ver relatorio()). Se alguma
+        etapa falhar, as demais são interrompidas e o erro é relançado.
+        """
+        fila_arquivos = queue.Queue(self.tamanho_fila)
+        fila_tensores = queue.Queue(self.tamanho_fila)
+        fila_vetores = queue.Queue(max(2, self.tamanho_lote // self.batch_size))
+
+        inicio = time.perf_counter()
+        threads = [self._em_thread(self._descobrir, itens, fila_arquivos)]
+        threads += [
+            self._em_thread(self._decodificar, fila_arquivos, fila_tensores)
+            for _ in range(self.threads_decodificacao)
+        ]
+        threads.append(self._em_thread(self._gravar, fila_vetores))
+
+        # A inferência fica na thread atual, usando as threads internas do torch
+        try:
+            self._inferir(fila_tensores, fila_vetores)
+        except BaseException:
+            self._parar.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            self._duracao = time.perf_counter() - inicio
+
+        if self._erros:
+            raise self._erros[0]
+        return self.relatorio()
+
+    def relatorio(self) -> dict:
+        """Itens, falhas, itens/s (no tempo total) e ocupação de cada etapa."""
+        duracao = self._duracao or 1e-9
+        return {
+            nome: {
+                'itens': c.itens,
+                'falhas': c.falhas,
+                'itens_por_s': c.itens / duracao,
+                'ocupado_s': c.ocupado,
+            }
+            for nome, c in self.contadores.items()
+        }
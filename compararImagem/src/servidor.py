@@ -0,0 +1,243 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PORTA_PADRAO = 8765
+
+
+def validar_requisicao(tipo: str, dados: dict) -> dict:
+    """
+    Confere os campos de uma requisição antes de ela entrar na fila; um
+    campo inválido vira ValueError (400) só para ela, sem afetar o lote.
+    """
+    if not isinstance(dados, dict):
+        raise ValueError("O corpo deve ser um objeto JSON")
+    campos = {'buscar': ('imagem',), 'comparar': ('imagem1', 'imagem2')}.get(tipo, ())
+    for campo in campos:
+        if not isinstance(dados.get(campo), str) or not dados[campo]:
+            raise ValueError(f"Campo '{campo}' ausente ou inválido")
+    if tipo == 'buscar':
+        top = dados.get('top', 3)
+        try:
+            if isinstance(top, bool) or int(top) != float(top):
+                raise ValueError
+            top = int(top)
+        except (TypeError, ValueError):
+            raise ValueError(f"'top' deve ser um inteiro positivo, recebido {top!r}") from None
+        if top <= 0:
+            raise ValueError(f"'top' deve ser um inteiro positivo, recebido {top!r}")
+        dados = dict(dados, top=top)
+    if tipo == 'indexar':
+        if not any(isinstance(dados.get(c), str) and dados[c] for c in ('imagem', 'pasta')):
+            raise ValueError("Forneça 'imagem' ou 'pasta'")
+    return dados
+
+
+class _Tarefa:
+    def __init__(self, tipo: str, dados: dict):
+        self.tipo = tipo
+        self.dados = dados
+        self.futuro = Future()
+
+
+class ExecutorDeConsultas:
+    """
+    Dono único do ComparadorDeImagens dentro do servidor.
+
+    As requisições chegam de várias threads HTTP e entram numa fila; uma
+    thread só as atende, então o modelo, o índice e o cache de vetores
+    nunca são usados ao mesmo tempo por duas threads. Depois da primeira
+    tarefa da fila, espera até `espera_ms` por outras (micro-lote, até
+    `lote_max`): as imagens de todas as buscas e comparações do lote passam
+    juntas pela rede e as buscas viram uma única chamada a buscar_lote.
+    Indexações são executadas uma a uma, na ordem de chegada.
+    """
+    def __init__(self, comparador, espera_ms: float = 5.0, lote_max: int = 64):
+        self.comparador = comparador
+        self.espera = espera_ms / 1000
+        self.lote_max = lote_max
+        self.fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def enviar(self, tipo: str, dados: dict):
+        tarefa = _Tarefa(tipo, validar_requisicao(tipo, dados))
+        self.fila.put(tarefa)
+        return tarefa.futuro.result()
+
+    def encerrar(self):
+        self.fila.put(None)
+        self._thread.join()
+
+    def _executar(self):
+        while True:
+            tarefa = self.fila.get()
+            if tarefa is None:
+                return
+            lote = [tarefa]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.lote_max:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    proxima = self.fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if proxima is None:
+                    self.fila.put(None) # Encerra depois deste lote
+                    break
+                lote.append(proxima)
+
+            consultas = [t for t in lote if t.tipo in ('buscar', 'comparar')]
+            try:
+                if consultas:
+                    self._responder_consultas(consultas)
+            except Exception as e:
+                for t in consultas:
+                    if not t.futuro.done():
+                        t.futuro.set_exception(e)
+
+            for t in lote:
+                if t.tipo in ('buscar', 'comparar'):
+                    continue
+                try:
+                    t.futuro.set_result(self._executar_tarefa(t))
+                except Exception as e:
+                    t.futuro.set_exception(e)
+
+    def _responder_consultas(self, consultas):
+        caminhos = []
+        for t in consultas:
+            if t.tipo == 'buscar':
+                caminhos.append(t.dados['imagem'])
+            else:
+                caminhos += [t.dados['imagem1'], t.dados['imagem2']]
+        caminhos = list(dict.fromkeys(caminhos)) # sem repetidos, na ordem
+
+        vetores = self._obter_vetores(caminhos)
+        for t in consultas:
+            for c in (t.dados.get('imagem'), t.dados.get('imagem1'), t.dados.get('imagem2')):
+                if c is None:
+                    continue
+                if isinstance(vetores[c], Exception):
+                    t.futuro.set_exception(vetores[c])
+                    break
+                if not np.any(vetores[c]):
+                    t.futuro.set_exception(ValueError(f"Não foi possível ler a imagem {c}"))
+                    break
+
+        buscas = [t for t in consultas if t.tipo == 'buscar' and not t.futuro.done()]
+        if buscas:
+            top_max = max(t.dados['top'] for t in buscas)
+            matriz = np.stack([vetores[t.dados['imagem']] for t in buscas])
+            for t, resultados in zip(buscas, self.comparador.db.buscar_lote(matriz, top_k=top_max)):
+                resultados = resultados[:t.dados['top']]
+                t.futuro.set_result({'resultados': [
+                    {'id': r['id'], 'similaridade': float(r['similaridade']), 'distancia': float(r['distancia'])}
+                    for r in resultados
+                ]})
+
+        for t in consultas:
+            if t.tipo == 'comparar' and not t.futuro.done():
+                v1, v2 = vetores[t.dados['imagem1']], vetores[t.dados['imagem2']]
+                similaridade = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+                t.futuro.set_result({'similaridade': float(similaridade)})
+
+    def _obter_vetores(self, caminhos):
+        """
+        {caminho: vetor} das imagens do lote. Se a chamada em lote falha
+        (arquivo sumiu, sem permissão...), repete imagem a imagem e guarda
+        a exceção no lugar do vetor, para falhar só as consultas que a usam.
+        """
+        # num_workers=0: lotes pequenos, não compensa abrir processos do DataLoader
+        try:
+            return dict(zip(caminhos, self.comparador.obter_vetores(caminhos, num_workers=0)))
+        except Exception:
+            vetores = {}
+            for caminho in caminhos:
+                try:
+                    vetores[caminho] = self.comparador.obter_vetores([caminho], num_workers=0)[0]
+                except Exception as e:
+                    vetores[caminho] = e
+            return vetores
+
+    def _executar_tarefa(self, tarefa):
+        dados = tarefa.dados
+        if tarefa.tipo == 'indexar':
+            if dados.get('imagem'):
+                self.comparador.indexar_imagem(dados['imagem'])
+                return {'indexadas': 1}
+            relatorio = self.comparador.indexar_pasta(
+                dados['pasta'], incremental=dados.get('incremental', False),
+                recursivo=dados.get('recursivo', False)
+            )
+            return {'indexadas': relatorio['gravacao']['itens'], 'relatorio': relatorio}
+        if tarefa.tipo == 'saude':
+            return {'status': 'ok', 'banco': self.comparador.banco, 'itens': self.comparador.db.total()}
+        raise ValueError(f"Operação desconhecida: {tarefa.tipo}")
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    """POST /buscar, /comparar, /indexar com JSON; GET /saude."""
+    executor = None # definido em servir()
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _atender(self, tipo, dados):
+        try:
+            self._responder(200, self.executor.enviar(tipo, dados))
+        except (ValueError, KeyError, OSError) as e:
+            self._responder(400, {'erro': f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self._responder(500, {'erro': f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        if self.path != '/saude':
+            self._responder(404, {'erro': f"Rota desconhecida: {self.path}"})
+            return
+        self._atender('saude', {})
+
+    def do_POST(self):
+        tipo = self.path.strip('/')
+        if tipo not in ('buscar', 'comparar', 'indexar'):
+            self._responder(404, {'erro': f"Rota desconhecida: {self.path}"})
+            return
+        try:
+            tamanho = int(self.headers.get('Content-Length', 0))
+            dados = json.loads(self.rfile.read(tamanho) or b'{}')
+        except ValueError as e:
+            self._responder(400, {'erro': f"JSON inválido: {e}"})
+            return
+        self._atender(tipo, dados)
+
+    def log_message(self, formato, *args):
+        pass # Uma linha por consulta atrapalharia a saída do servidor
+
+
+def servir(comparador, host: str = '127.0.0.1', porta: int = PORTA_PADRAO,
+           espera_ms: float = 5.0, lote_max: int = 64):
+    """Atende consultas por HTTP até Ctrl+C, com o modelo e o índice já carregados."""
+    comparador.carregar()
+    executor = ExecutorDeConsultas(comparador, espera_ms=espera_ms, lote_max=lote_max)
+    manipulador = type('Manipulador', (_Manipulador,), {'executor': executor})
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    print(f">> Servidor ouvindo em http://{host}:{porta} (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        executor.encerrar()
@@ -1,4 +1,12 @@
+from .manifesto import ManifestoIndexacao
 from .matematica import SimilarityCalculator
-from .visualizacao import VisualizadorDeComparacao
 
-__all__ = ['SimilarityCalculator', 'VisualizadorDeComparacao']
+__all__ = ['ManifestoIndexacao', 'SimilarityCalculator', 'VisualizadorDeComparacao']
+
+
+def __getattr__(nome):
+    # matplotlib/seaborn levam ~1s para importar; só quando alguém for plotar
+    if nome == 'VisualizadorDeComparacao':
+        from .visualizacao import VisualizadorDeComparacao
+        return VisualizadorDeComparacao
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+
+def hash_arquivo(caminho: str, tamanho_bloco: int = 1 << 20) -> str:
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class ManifestoIndexacao:
+    """
+    Registro do que já foi indexado: caminho absoluto -> tamanho, mtime,
+    hash do conteúdo e id do embedding no banco.
+
+    Arquivos com mesmo tamanho e mtime são considerados iguais sem ler o
+    conteúdo; se só o mtime mudou mas o hash é o mesmo, a entrada é
+    atualizada sem reindexar.
+
+    Também serve para achar o embedding já indexado de um arquivo
+    (procurar), pelo caminho ou pelo conteúdo.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.entradas = {}
+        self._por_hash = None # hash -> id, montado sob demanda
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as f:
+                self.entradas = json.load(f)
+
+    def planejar(self, arquivos: list, pasta: str, recursivo: bool):
+        """
+        Compara os arquivos encontrados em `pasta` com o manifesto.
+
+        Retorna (pendentes, removidos): pendentes é a lista de
+        (caminho, hash) novos ou alterados e removidos são os caminhos do
+        manifesto, dentro de `pasta`, que não existem mais.
+        """
+        pendentes = []
+        encontrados = set()
+
+        for caminho in arquivos:
+            absoluto = os.path.abspath(caminho)
+            encontrados.add(absoluto)
+            info = os.stat(caminho)
+            entrada = self.entradas.get(absoluto)
+
+            if entrada and entrada['tamanho'] == info.st_size and entrada['mtime'] == info.st_mtime:
+                continue
+
+            conteudo = hash_arquivo(caminho)
+            if entrada and entrada['hash'] == conteudo:
+                entrada['tamanho'], entrada['mtime'] = info.st_size, info.st_mtime
+                continue
+            pendentes.append((caminho, conteudo))
+
+        raiz = os.path.abspath(pasta)
+        removidos = []
+        for absoluto in self.entradas:
+            if absoluto in encontrados:
+                continue
+            dentro = absoluto.startswith(raiz + os.sep) if recursivo else os.path.dirname(absoluto) == raiz
+            if dentro:
+                removidos.append(absoluto)
+        return pendentes, removidos
+
+    def registrar(self, caminho: str, conteudo: str, id_item: str):
+        info = os.stat(caminho)
+        self.entradas[os.path.abspath(caminho)] = {
+            'tamanho': info.st_size,
+            'mtime': info.st_mtime,
+            'hash': conteudo,
+            'id': id_item,
+        }
+        if self._por_hash is not None:
+            self._por_hash[conteudo] = id_item
+
+    def procurar(self, caminho: str):
+        """
+        (id, hash) do embedding já indexado com o conteúdo deste arquivo,
+        ou None. Se o arquivo está no manifesto com o mesmo tamanho e
+        mtime, nem é lido; senão, procura pelo hash (a mesma imagem em
+        outro caminho).
+        """
+        info = os.stat(caminho)
+        entrada = self.entradas.get(os.path.abspath(caminho))
+        if entrada and entrada['tamanho'] == info.st_size and entrada['mtime'] == info.st_mtime:
+            return entrada['id'], entrada['hash']
+
+        if self._por_hash is None:
+            self._por_hash = {e['hash']: e['id'] for e in self.entradas.values()}
+        conteudo = hash_arquivo(caminho)
+        if conteudo in self._por_hash:
+            return self._por_hash[conteudo], conteudo
+        return None
+
+    def id_de(self, caminho: str):
+        entrada = self.entradas.get(os.path.abspath(caminho))
+        return entrada['id'] if entrada else None
+
+    def remover(self, caminho: str):
+        entrada = self.entradas.pop(os.path.abspath(caminho), None)
+        if entrada and self._por_hash is not None and self._por_hash.get(entrada['hash']) == entrada['id']:
+            del self._por_hash[entrada['hash']]
+
+    def salvar(self):
+        """Grava o manifesto de forma atômica (temporário + os.replace)."""
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.entradas, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
@@ -22,7 +22,7 @@ class SimilarityCalculator:
         # É o comprimento da seta do vetor. Raiz quadrada da soma dos quadrados.
         norm_a = np.linalg.norm(vetor_a)
         norm_b = np.linalg.norm(vetor_b)
-        print(f"2. Tamanho do Vetor A: {norm_a:.4f }")
+        print(f"2. Tamanho do Vetor A: {norm_a:.4f}")
         print(f"3. Tamanho do Vetor B: {norm_b:.4f}")
 
         # Passo 3: Divisão final